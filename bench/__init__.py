@@ -0,0 +1 @@
+# 離線 benchmark（不會連線到外部服務）
@@ -0,0 +1,264 @@
+"""離線壓測：本機替身伺服器 + 假 Discord 頻道，直接驅動 Earthquake / News cog
+
+執行：python -m bench.bench_cogs [--reports 20 --window 60 --time-scale 10 --latency 0.05 --error-rate 0.05]
+
+- 解析：JSON 解碼、QuakeReport 擷取、訂閱比對、embed 建立的 CPU 時間與記憶體配置，
+  以及大量報告時原始 dict 與 QuakeReport 的常駐記憶體
+- 突發：window 秒內陸續發布 reports 份報告（以 time-scale 壓縮時間），
+  輪詢間隔照 AdaptivePollScheduler 的結果，量測發布 → 送出延遲與吞吐量
+- 公告：首頁完整下載解析 vs. 304 / 內容雜湊命中（含解析期間的 event loop 延遲），多則公告同時發布，
+  以及背景補抓內文後的全文搜尋
+  PARSE_POOL_MODE=process 可比較行程池
+整個流程不會連線到外部服務。
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import pytz
+
+# 必須在 import cog 之前設定（cog 在模組層讀取環境變數）
+os.environ.setdefault("NOTIFY_CHANNEL_ID", "1")
+os.environ.setdefault("CWA_API_KEY", "offline-bench")
+os.environ.setdefault("STATE_FLUSH_DELAY", "0.2")
+
+from bench.fake_discord import FakeBot, FakeChannel
+from bench.fixtures import make_cwa_payload, make_cwa_reports, make_news_items
+from bench.stand_in import StandInServer, report_key
+from utils.metrics import Histogram, Metrics
+
+ROUNDS = 200
+SUBSCRIPTIONS = 500  # 訂閱比對時的訂閱數量
+COUNTIES = ["臺北市", "新北市", "桃園市", "新竹市", "新竹縣", "苗栗縣", "臺中市", "彰化縣", "南投縣", "雲林縣",
+            "嘉義縣", "臺南市", "高雄市", "屏東縣", "宜蘭縣", "花蓮縣", "臺東縣"]
+
+
+def fmt_ms(seconds):
+    return "-" if seconds is None else f"{seconds * 1000:8.1f} ms"
+
+
+def print_histogram(name, histogram):
+    print(
+        f"{name:<28} n={histogram.count:<4} p50 {fmt_ms(histogram.percentile(0.5))}"
+        f"  p95 {fmt_ms(histogram.percentile(0.95))}  p99 {fmt_ms(histogram.percentile(0.99))}"
+    )
+
+
+def measure(name, func, rounds=ROUNDS):
+    func()  # 預熱
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    per_call = (time.perf_counter() - start) / rounds
+
+    tracemalloc.start()
+    func()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<28} {per_call * 1e6:9.1f} µs/次   峰值配置 {peak / 1024:8.1f} KB")
+
+
+# ---------- 解析 ----------
+def retained_kb(build):
+    """build() 的回傳值常駐佔用多少記憶體（KB）"""
+    tracemalloc.start()
+    value = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del value
+    return current / 1024
+
+
+def bench_parse(cog):
+    from utils import cwa_parser
+    from utils.quake_report import QuakeReport
+    from utils.quake_subscriptions import SubscriptionIndex
+
+    print(f"== 解析（單份報告，JSON 後端 {cwa_parser.JSON_BACKEND}） ==")
+    body = json.dumps(make_cwa_payload(make_cwa_reports(1)), ensure_ascii=False).encode("utf-8")
+    raw = json.loads(body)["records"]["Earthquake"][0]
+    eq = QuakeReport.from_dict(raw)
+    subs = SubscriptionIndex()
+    for i in range(SUBSCRIPTIONS):
+        subs.add(None, 1000 + i, COUNTIES[i % len(COUNTIES):][:3], ("all", "1級", "3級", "5弱")[i % 4])
+
+    measure("json.loads", lambda: json.loads(body))
+    measure(f"{cwa_parser.JSON_BACKEND}.loads", lambda: cwa_parser.loads(body))
+    measure("QuakeReport.from_dict", lambda: QuakeReport.from_dict(raw))
+    measure("decode_reports", lambda: cwa_parser.decode_reports(body))
+    measure(f"訂閱比對 ({SUBSCRIPTIONS} 筆)", lambda: list(subs.match(eq.counties)))
+    measure("build_embed", lambda: cog.build_embed(eq, ["新北市", "新竹市", "臺中市"]))
+
+    count = 2000
+    bulk = json.dumps(make_cwa_payload(make_cwa_reports(count)), ensure_ascii=False).encode("utf-8")
+    raw_kb = retained_kb(lambda: json.loads(bulk)["records"]["Earthquake"])
+    model_kb = retained_kb(lambda: cwa_parser.decode_reports(bulk)[0])
+    print(f"{count} 份報告常駐記憶體：原始 dict {raw_kb:8.1f} KB → QuakeReport {model_kb:8.1f} KB"
+          f"（{model_kb / raw_kb:.0%}）\n")
+
+
+def bot_parse_mode(cog):
+    stats = cog.bot.parse_pool.stats()
+    return f"{stats['mode']} × {stats['workers']}"
+
+
+# ---------- 地震突發 ----------
+async def bench_quake_burst(args, server, cog, channel):
+    print(f"== 地震突發：{args.window:.0f}s 內 {args.reports} 份報告（時間壓縮 {args.time_scale:g} 倍） ==")
+    # OriginTime 設在現在附近，quake_alert_latency_seconds 才有意義
+    now = datetime.now(pytz.timezone("Asia/Taipei")).replace(tzinfo=None, microsecond=0)
+    reports = make_cwa_reports(args.reports + 1, start_time=now - timedelta(seconds=args.reports + 1), step_seconds=1)
+    # 先處理一份基準報告，讓 cog 有增量抓取的起點
+    server.publish_report(reports[0])
+    await cog.poll_once()
+    channel.messages.clear()
+
+    window = args.window / args.time_scale
+    burst = reports[1:]
+
+    async def publisher():
+        for i, eq in enumerate(burst):
+            await asyncio.sleep(window / len(burst) if i else 0)
+            server.publish_report(eq, "E-A0015-001" if i % 2 else "E-A0016-001")
+
+    started = time.monotonic()
+    publish_task = asyncio.create_task(publisher())
+    polls = 0
+    deadline = started + window + args.drain / args.time_scale
+    delivered = {}
+    while time.monotonic() < deadline and len(delivered) < len(burst):
+        await cog.poll_once()
+        polls += 1
+        for sent_at, embed in channel.embeds:
+            no = embed.footer.text.rsplit(" ", 1)[-1]
+            delivered.setdefault(no, sent_at)
+        await asyncio.sleep(cog.current_interval / args.time_scale)
+    await publish_task
+    elapsed = time.monotonic() - started
+
+    latency = Histogram()
+    for eq in burst:
+        sent_at = delivered.get(str(eq["EarthquakeNo"]))
+        if sent_at is not None:
+            latency.observe((sent_at - server.published_at[report_key(eq)]) * args.time_scale)
+    print(f"送達 {len(delivered)}/{len(burst)} 份，{len(channel.messages)} 則訊息，輪詢 {polls} 次")
+    print(f"吞吐量 {len(delivered) / (elapsed * args.time_scale) * 60:.1f} 份/分鐘（換算回實際時間）")
+    print_histogram("發布 → 送出（實際時間）", latency)
+    print(f"排程狀態：{cog.scheduler.status_text()}\n")
+
+
+# ---------- 公告 ----------
+async def loop_lag_probe(histogram, tick=0.005):
+    """每 tick 秒醒來一次，記錄實際醒來比預期晚多少（event loop 被佔住的時間）"""
+    while True:
+        expected = time.perf_counter() + tick
+        await asyncio.sleep(tick)
+        histogram.observe(max(time.perf_counter() - expected, 0.0))
+
+
+async def bench_news(args, server, cog, channel):
+    print("== 公告 ==")
+    full, cached, lag = Histogram(), Histogram(), Histogram()
+    probe = asyncio.create_task(loop_lag_probe(lag))
+    for i in range(args.news_rounds):
+        cog.etag = cog.body_hash = None  # 強制完整下載 + 解析
+        start = time.perf_counter()
+        await cog.fetch_news()
+        full.observe(time.perf_counter() - start)
+        start = time.perf_counter()
+        await cog.fetch_news()
+        cached.observe(time.perf_counter() - start)
+    probe.cancel()
+    print_histogram("fetch_news 完整解析", full)
+    print_histogram("fetch_news 304", cached)
+    print_histogram(f"event loop 延遲 ({bot_parse_mode(cog)})", lag)
+
+    await cog.poll_once()  # 建立已看過集合
+    channel.messages.clear()
+    new_items = make_news_items(count=args.news_burst, start=9000)
+    for href, title in new_items:
+        server.publish_news(href, title)
+    start = time.monotonic()
+    await cog.poll_once()
+    sent = len(channel.embeds)
+    print(f"同時發布 {len(new_items)} 則公告：一次輪詢送出 {sent} 則 embed / {len(channel.messages)} 則訊息，"
+          f"{(time.monotonic() - start) * 1000:.1f} ms")
+
+    # 公告歷史：等背景補抓內文完成，再量測全文搜尋
+    if cog.body_task is not None:
+        await cog.body_task
+    search = Histogram()
+    for keywords in ("測試公告", "臨時維護", "補償 道具", "9005", "不存在的關鍵字"):
+        total, rows, elapsed = await cog.archive.query(keywords)
+        search.observe(elapsed)
+    print(f"公告歷史 {cog.archive.count()} 則，「補償 道具」符合 {(await cog.archive.query('補償 道具'))[0]} 則")
+    print_histogram("!newssearch 查詢", search)
+    print()
+
+
+async def run(args):
+    server = StandInServer(
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, throttle_rate=args.throttle_rate,
+    )
+    base_url = await server.start()
+    os.environ["CWA_API_BASE"] = f"{base_url}/api/v1/rest/datastore"
+    os.environ["NEWS_URL"] = f"{base_url}/web/index.aspx"
+
+    from cogs.earthquake import Earthquake
+    from cogs.news import News
+    from utils.http import create_http_session
+    from utils.state import StateStore
+
+    workdir = tempfile.mkdtemp(prefix="ffbot-bench-")
+    os.chdir(workdir)  # 狀態檔寫到暫存目錄
+    metrics = Metrics()
+    state = StateStore()
+    session = create_http_session()
+    channel = FakeChannel(int(os.environ["NOTIFY_CHANNEL_ID"]), send_latency=args.send_latency)
+    bot = FakeBot(state=state, metrics=metrics, http_session=session, channels=[channel], time_scale=args.time_scale)
+    try:
+        quake = Earthquake(bot)
+        bench_parse(quake)
+        await bench_quake_burst(args, server, quake, channel)
+        channel.messages.clear()
+        await bench_news(args, server, News(bot), channel)
+    finally:
+        await bot.dispatcher.close()
+        bot.parse_pool.close()
+        await session.close()
+        await state.close()
+        await server.close()
+
+    print("== 指標（bot.metrics） ==")
+    for name, labels, count, p50, p95, p99 in metrics.summary():
+        label = ",".join(f"{k}={v}" for k, v in labels.items())
+        print(f"{name}[{label}]".ljust(44) + f" n={count:<4} p50 {fmt_ms(p50)}  p95 {fmt_ms(p95)}  p99 {fmt_ms(p99)}")
+    for (name, labels), value in metrics.counter_values().items():
+        label = ",".join(f"{k}={v}" for k, v in labels)
+        print(f"{name}[{label}]".ljust(44) + f" {value}")
+    print(f"\n替身伺服器請求：{dict(server.requests)}，傳送 {server.bytes_sent / 1024:.1f} KB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ff_bot 離線壓測")
+    parser.add_argument("--reports", type=int, default=20, help="突發期間發布的報告數")
+    parser.add_argument("--window", type=float, default=60, help="突發期間長度（實際秒數）")
+    parser.add_argument("--drain", type=float, default=60, help="突發結束後最多再等幾秒（實際秒數）")
+    parser.add_argument("--time-scale", type=float, default=10, help="時間壓縮倍數")
+    parser.add_argument("--latency", type=float, default=0.02, help="替身伺服器固定延遲（秒）")
+    parser.add_argument("--jitter", type=float, default=0.02, help="替身伺服器隨機延遲上限（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="回 500 的比例")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="回 429 的比例")
+    parser.add_argument("--send-latency", type=float, default=0.05, help="假頻道 send 延遲（秒）")
+    parser.add_argument("--news-rounds", type=int, default=20)
+    parser.add_argument("--news-burst", type=int, default=12)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""比較公告解析的 CPU 與記憶體配置：完整解析 vs. 片段解析 vs. 內容雜湊命中
+
+執行：python -m bench.bench_news_parse
+
+優先使用錄下的官網首頁（bench/data/ffxiv_index.html，python -m bench.record_news_index 錄製），
+沒有時才用合成首頁；另外以版面變化（nav_news 搬位置、字樣出現在 script）確認 parse_news_page
+與完整解析結果一致（片段解析失敗時會退回部分解析）。
+"""
+import time
+import tracemalloc
+
+from bench.fixtures import RECORDED_INDEX, full_news_list, index_variants, load_recorded_index, make_index_html
+from utils.news_parser import body_hash, extract_latest_news, extract_latest_news_full, parse_news_page
+
+ROUNDS = 50
+
+
+def measure(name, func, arg):
+    func(arg)  # 預熱（含 bs4 延遲 import）
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        result = func(arg)
+    per_call = (time.perf_counter() - start) / ROUNDS
+
+    tracemalloc.start()
+    func(arg)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"{name:<24} {per_call * 1000:9.3f} ms/次   峰值配置 {peak / 1024:9.1f} KB")
+    return per_call, peak, result
+
+
+def main():
+    html = load_recorded_index()
+    if html is None:
+        print(f"⚠️ 沒有錄下的首頁（{RECORDED_INDEX}），改用合成首頁，倍數只代表合成版面\n")
+        html = make_index_html()
+        source = "合成"
+    else:
+        source = "錄下的官網首頁"
+    body = html.encode("utf-8")
+    print(f"{source}：{len(body) / 1024:.1f} KB，每項 {ROUNDS} 次\n")
+
+    full_time, full_peak, full_result = measure("完整解析 (舊版)", extract_latest_news_full, html)
+    fast_time, fast_peak, fast_result = measure("片段解析", extract_latest_news, html)
+    hash_time, hash_peak, _ = measure("內容雜湊（未變動）", body_hash, body)
+
+    assert full_result == fast_result, (full_result, fast_result)
+
+    print("\n版面變化（parse_news_page vs. 完整解析）")
+    for name, variant in index_variants(html).items():
+        data = variant.encode("utf-8")
+        start = time.perf_counter()
+        items = parse_news_page(data)
+        elapsed = time.perf_counter() - start
+        expected = full_news_list(variant)
+        assert expected, f"{name}：完整解析也找不到公告"
+        assert items == expected, (name, items[:3], expected[:3])
+        print(f"  {name:<20} {len(items)} 則一致，{elapsed * 1000:7.2f} ms")
+    print(
+        f"\n片段解析：CPU 快 {full_time / fast_time:.1f} 倍，配置少 {full_peak / max(fast_peak, 1):.1f} 倍"
+        f"\n內容未變動：CPU 快 {full_time / hash_time:.0f} 倍"
+    )
+
+
+if __name__ == "__main__":
+    main()
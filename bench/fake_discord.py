@@ -0,0 +1,57 @@
+"""離線驅動 cog 用的假 Discord 物件：只實作 cog 實際用到的部分"""
+import asyncio
+import time
+
+from utils.dispatcher import DISPATCH_CHANNEL_RATE, DISPATCH_GLOBAL_RATE, MessageDispatcher
+from utils.guild_settings import GuildSettingsStore
+from utils.parse_pool import ParsePool
+from utils.poller import PollScheduler
+
+
+class FakeChannel:
+    """記錄每次 send 的時間與內容，可模擬 Discord API 延遲"""
+
+    def __init__(self, channel_id, send_latency=0.0):
+        self.id = channel_id
+        self.send_latency = send_latency
+        self.messages = []  # (time.monotonic(), content, embeds)
+
+    async def send(self, content=None, *, embed=None, embeds=None, **kwargs):
+        if self.send_latency:
+            await asyncio.sleep(self.send_latency)
+        embeds = list(embeds or ([embed] if embed else []))
+        self.messages.append((time.monotonic(), content, embeds))
+
+    @property
+    def embeds(self):
+        """[(送出時間, embed), ...]"""
+        return [(sent_at, embed) for sent_at, _, embeds in self.messages for embed in embeds]
+
+
+class FakeBot:
+    """提供 cog 需要的 bot 屬性（state / metrics / pollers / dispatcher / guild_settings / http_session）與頻道查詢"""
+
+    def __init__(self, *, state, metrics, http_session, channels=(), time_scale=1.0):
+        self.state = state
+        self.metrics = metrics
+        self.pollers = PollScheduler(metrics)
+        self.guild_settings = GuildSettingsStore(state)
+        # 需在 event loop 內建立；時間壓縮時速率限制也一起放大，結果才能換算回實際時間
+        self.dispatcher = MessageDispatcher(
+            metrics,
+            channel_rate=DISPATCH_CHANNEL_RATE * time_scale,
+            global_rate=DISPATCH_GLOBAL_RATE * time_scale,
+        )
+        self.parse_pool = ParsePool(metrics)
+        self.http_session = http_session
+        self.channels = {channel.id: channel for channel in channels}
+        self.guilds = []
+
+    def get_channel(self, channel_id):
+        return self.channels.get(channel_id)
+
+    def get_guild(self, guild_id):
+        return None
+
+    async def wait_until_ready(self):
+        return None
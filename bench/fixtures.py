@@ -0,0 +1,134 @@
+"""benchmark 用的假資料產生器（結構參考 ffxiv.com.tw 首頁與氣象署 E-A0015-001 回應）"""
+import copy
+import json
+import os
+from datetime import datetime, timedelta
+
+from utils.news_parser import NEWS_BASE_URL, NEWS_MARKER, NEWS_SELECTOR, _to_result
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+ORIGIN_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def make_news_items(count=8, start=1):
+    return [
+        (f"/web/news/news_content.aspx?id=N{start + i:06d}", f"【公告】第 {start + i} 則測試公告")
+        for i in range(count)
+    ]
+
+
+def make_index_html(news_items=None, filler_blocks=400):
+    """產生約 150KB 的首頁 HTML，nav_news 區塊位於選單中段"""
+    if news_items is None:
+        news_items = make_news_items()
+    news_li = "".join(
+        f'<li><a href="{href}"><span class="date">2025/01/01</span><p>{title}</p></a></li>'
+        for href, title in news_items
+    )
+    menus = "".join(
+        f'<li class="nav_{name}"><a href="/web/{name}/">{name}</a>'
+        f'<div class="sub_nav"><ul>'
+        + "".join(f'<li><a href="/web/{name}/{i}.aspx"><p>{name} 子選單 {i}</p></a></li>' for i in range(6))
+        + "</ul></div></li>"
+        for name in ("about", "guide", "event")
+    )
+    filler = "".join(
+        f'<div class="block block_{i}"><h3 class="title">區塊 {i}</h3>'
+        f'<p class="desc">艾歐澤亞的冒險者們，這是第 {i} 段填充內容，用來模擬首頁的大量輪播、活動與攻略連結。</p>'
+        f'<ul class="links"><li><a href="/web/x/{i}-1.aspx">連結一</a></li><li><a href="/web/x/{i}-2.aspx">連結二</a></li></ul>'
+        f'<img src="/images/banner_{i}.jpg" alt="banner {i}"></div>'
+        for i in range(filler_blocks)
+    )
+    return (
+        "<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>FINAL FANTASY XIV</title>"
+        + "<script>var config = {\"a\": 1, \"b\": [1, 2, 3]};</script>" * 20
+        + "<link rel=\"stylesheet\" href=\"/css/main.css\"></head><body><header><nav><ul class=\"nav\">"
+        + menus
+        + f'<li class="nav_news"><a href="/web/news/">最新消息</a><div class="sub_nav"><ul>{news_li}</ul></div></li>'
+        + "</ul></nav></header><main>"
+        + filler
+        + "</main><footer><p>© SQUARE ENIX</p></footer></body></html>"
+    )
+
+
+def make_article_html(title):
+    """公告內文頁：導覽列 + 內文區塊"""
+    return (
+        "<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>FINAL FANTASY XIV</title>"
+        "<script>var tracking = true;</script></head><body><nav><ul><li>最新消息</li><li>遊戲指南</li></ul></nav>"
+        f'<div class="news_content"><h2>{title}</h2>'
+        "<p>親愛的光之戰士們，為提供更好的遊戲品質，伺服器將進行臨時維護。</p>"
+        "<p>維護期間將無法登入遊戲，維護結束後將發放補償道具，造成不便敬請見諒。</p></div>"
+        "<footer>© SQUARE ENIX</footer></body></html>"
+    )
+
+
+RECORDED_INDEX = os.path.join(DATA_DIR, "ffxiv_index.html")  # python -m bench.record_news_index 錄製
+
+
+def load_recorded_index():
+    """bench/data 內錄下的官網首頁 HTML；還沒錄製時回傳 None"""
+    if not os.path.exists(RECORDED_INDEX):
+        return None
+    with open(RECORDED_INDEX, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def full_news_list(html, base_url=NEWS_BASE_URL):
+    """參考答案：完整解析整個首頁取出的公告清單（有連結的項目）"""
+    from bs4 import BeautifulSoup
+
+    items = BeautifulSoup(html, "html.parser").select(NEWS_SELECTOR)
+    return [(title, link) for title, link in (_to_result(item, base_url) for item in items) if link]
+
+
+def index_variants(html):
+    """同一份首頁的版面變化：nav_news 區塊搬到頁尾、nav_news 字樣先出現在 script 裡（片段解析切錯位置）
+
+    回傳 {名稱: html}；變化後的公告清單應與原始首頁相同。
+    """
+    variants = {"原始": html}
+    start = html.find(NEWS_MARKER)
+    start = html.rfind("<li", 0, start)
+    end = html.find("</li>", html.find("</ul>", start)) + len("</li>")
+    if start >= 0 and end > start:
+        block = html[start:end]
+        moved = html[:start] + html[end:]
+        footer = moved.rfind("</body>")
+        variants["nav_news 移到頁尾"] = f"{moved[:footer]}<ul>{block}</ul>{moved[footer:]}"
+    head = html.find("<head>")
+    if head >= 0:
+        script = '<script>var current = "nav_news";</script>'
+        variants["nav_news 先出現在 script"] = html[:head + 6] + script + html[head + 6:]
+    return variants
+
+
+def load_recorded_payload(dataset="E-A0015-001"):
+    """bench/data 內錄下的氣象署回應（原始 JSON 結構）"""
+    with open(os.path.join(DATA_DIR, f"{dataset}.json"), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def make_cwa_reports(count=20, start_no=115001, start_time=None, step_seconds=3):
+    """以錄下的報告為樣板，產生 count 份編號、時間、規模都不同的報告（舊 → 新）"""
+    template = load_recorded_payload()["records"]["Earthquake"][0]
+    start_time = start_time or datetime(2025, 9, 21, 8, 14, 44)
+    colors = ("綠色", "黃色", "橘色", "紅色")
+    reports = []
+    for i in range(count):
+        eq = copy.deepcopy(template)
+        eq["EarthquakeNo"] = start_no + i
+        eq["ReportColor"] = colors[i % len(colors)]
+        info = eq["EarthquakeInfo"]
+        info["OriginTime"] = (start_time + timedelta(seconds=i * step_seconds)).strftime(ORIGIN_FORMAT)
+        info["EarthquakeMagnitude"]["MagnitudeValue"] = round(3.0 + (i % 40) / 10, 1)
+        reports.append(eq)
+    return reports
+
+
+def make_cwa_payload(reports, dataset="E-A0015-001"):
+    """把報告包成氣象署 API 的回應格式"""
+    payload = load_recorded_payload()
+    payload["result"]["resource_id"] = dataset
+    payload["records"]["Earthquake"] = list(reports)
+    return payload
@@ -0,0 +1,52 @@
+"""錄下 ffxiv.com.tw 首頁作為公告解析的 benchmark 樣本（bench/data/ffxiv_index.html）
+
+執行：python -m bench.record_news_index [--url https://www.ffxiv.com.tw/web/index.aspx]
+
+會移除 <script> / <style> 的內容與 data: 內嵌圖片以縮小檔案，其餘標籤與版面順序原樣保留，
+nav_news 在頁面中的位置、前後的選單與區塊都跟正式網站相同。錄下的首頁必須解析得出公告才會寫檔。
+"""
+import argparse
+import asyncio
+import re
+
+from bench.fixtures import RECORDED_INDEX, full_news_list
+from utils.http import create_http_session
+from utils.news_parser import NEWS_BASE_URL, parse_news_page
+
+SCRIPT_BODY = re.compile(r"(<(script|style)\b[^>]*>).*?(</\2>)", re.S | re.I)
+DATA_URI = re.compile(r"data:[\w/+.-]+;base64,[A-Za-z0-9+/=]+")
+
+
+def trim(html: str) -> str:
+    html = SCRIPT_BODY.sub(r"\1\3", html)
+    return DATA_URI.sub("data:,", html)
+
+
+async def record(url):
+    session = create_http_session()
+    try:
+        async with session.get(url) as resp:
+            if resp.status != 200:
+                raise SystemExit(f"❌ HTTP {resp.status}")
+            body = await resp.read()
+            charset = resp.charset or "utf-8"
+    finally:
+        await session.close()
+
+    html = trim(body.decode(charset, errors="replace"))
+    items = parse_news_page(html.encode("utf-8"))
+    if not items or items != full_news_list(html):
+        raise SystemExit("❌ 錄下的首頁解析不出公告（或與完整解析不符），未寫檔")
+    with open(RECORDED_INDEX, "w", encoding="utf-8") as f:
+        f.write(html)
+    print(f"✅ 已寫入 {RECORDED_INDEX}：{len(body) / 1024:.1f} KB → {len(html.encode()) / 1024:.1f} KB，公告 {len(items)} 則")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="錄下官網首頁作為 benchmark 樣本")
+    parser.add_argument("--url", default=f"{NEWS_BASE_URL}/web/index.aspx")
+    asyncio.run(record(parser.parse_args().url))
+
+
+if __name__ == "__main__":
+    main()
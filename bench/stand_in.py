@@ -0,0 +1,123 @@
+"""本機替身伺服器：模擬氣象署 datastore API 與 ffxiv.com.tw 首頁 / 公告內文
+
+- 回應內容來自 bench/fixtures（錄下的 JSON 結構 / 產生的首頁 HTML）
+- 可設定延遲、抖動、5xx 與 429 的注入比例
+- publish_report / publish_news 在執行中加入新資料，用來模擬突發事件
+"""
+import asyncio
+import hashlib
+import random
+import socket
+import time
+from collections import Counter
+
+from aiohttp import web
+
+from bench.fixtures import make_article_html, make_cwa_payload, make_index_html, make_news_items
+
+
+def report_key(eq):
+    return f"{eq['EarthquakeNo']}@{eq['EarthquakeInfo']['OriginTime']}"
+
+
+class StandInServer:
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, throttle_rate=0.0, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate        # 回 500 的比例
+        self.throttle_rate = throttle_rate  # 回 429 的比例
+        self.random = random.Random(seed)
+        self.reports = {}                   # dataset -> [報告]
+        self.published_at = {}              # report_key -> time.monotonic()
+        self.news_items = make_news_items()
+        self._index_cache = None
+        self.requests = Counter()           # (路徑種類, 狀態碼) -> 次數
+        self.bytes_sent = 0
+        self._runner = None
+        self.base_url = None
+
+    # ---------- 資料 ----------
+    def publish_report(self, eq, dataset="E-A0015-001"):
+        self.reports.setdefault(dataset, []).append(eq)
+        self.published_at[report_key(eq)] = time.monotonic()
+
+    def publish_news(self, href, title):
+        self.news_items.insert(0, (href, title))
+        self.published_at[href] = time.monotonic()
+        self._index_cache = None
+
+    def index_html(self):
+        if self._index_cache is None:
+            body = make_index_html(self.news_items).encode("utf-8")
+            self._index_cache = (body, '"' + hashlib.md5(body).hexdigest() + '"')
+        return self._index_cache
+
+    # ---------- 處理請求 ----------
+    async def _inject(self, kind):
+        """模擬網路延遲與錯誤，需要回錯誤時回傳 Response"""
+        delay = self.latency + self.random.uniform(0, self.jitter)
+        if delay:
+            await asyncio.sleep(delay)
+        roll = self.random.random()
+        if roll < self.error_rate:
+            return self._respond(kind, web.Response(status=500, text="stand-in error"))
+        if roll < self.error_rate + self.throttle_rate:
+            return self._respond(kind, web.Response(status=429, headers={"Retry-After": "1"}))
+        return None
+
+    def _respond(self, kind, response):
+        self.requests[(kind, response.status)] += 1
+        self.bytes_sent += len(response.body or b"")
+        return response
+
+    async def handle_datastore(self, request):
+        error = await self._inject("cwa")
+        if error is not None:
+            return error
+        dataset = request.match_info["dataset"]
+        reports = self.reports.get(dataset, [])
+        time_from = request.query.get("timeFrom")
+        if time_from:
+            reports = [eq for eq in reports if eq["EarthquakeInfo"]["OriginTime"].replace(" ", "T") >= time_from]
+        reports = sorted(reports, key=lambda eq: eq["EarthquakeInfo"]["OriginTime"], reverse=True)
+        reports = reports[:int(request.query.get("limit", "1"))]
+        return self._respond("cwa", web.json_response(make_cwa_payload(reports, dataset)))
+
+    async def handle_index(self, request):
+        error = await self._inject("news")
+        if error is not None:
+            return error
+        body, etag = self.index_html()
+        if request.headers.get("If-None-Match") == etag:
+            return self._respond("news", web.Response(status=304, headers={"ETag": etag}))
+        return self._respond("news", web.Response(
+            body=body, content_type="text/html", charset="utf-8", headers={"ETag": etag},
+        ))
+
+    async def handle_article(self, request):
+        error = await self._inject("article")
+        if error is not None:
+            return error
+        news_id = request.query.get("id", "")
+        title = next((t for href, t in self.news_items if href.endswith(f"id={news_id}")), "公告")
+        body = make_article_html(title)
+        return self._respond("article", web.Response(text=body, content_type="text/html", charset="utf-8"))
+
+    # ---------- 啟動 / 關閉 ----------
+    async def start(self, host="127.0.0.1", port=0):
+        """啟動伺服器並回傳 base URL（port=0 時自動挑選空閒埠）"""
+        app = web.Application()
+        app.router.add_get("/api/v1/rest/datastore/{dataset}", self.handle_datastore)
+        app.router.add_get("/web/index.aspx", self.handle_index)
+        app.router.add_get("/web/news/news_content.aspx", self.handle_article)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind((host, port))
+        await web.SockSite(self._runner, sock).start()
+        self.base_url = f"http://{host}:{sock.getsockname()[1]}"
+        return self.base_url
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
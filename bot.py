@@ -1,14 +1,29 @@
 import discord
 from discord.ext import commands
 import os
+import ast
 import asyncio
 from dotenv import load_dotenv
+import importlib
+import itertools
 import logging
+import time
 
 load_dotenv()
 
+from utils.dispatcher import MessageDispatcher
+from utils.guild_settings import GuildSettingsStore
+from utils.http import create_http_session
+from utils.log_pipeline import setup_logging
+from utils.member_cache import MemberLookup
+from utils.metrics import Metrics, RateLimitCounter, start_exporters, stop_exporters
+from utils.parse_pool import ParsePool
+from utils.poller import PollScheduler
+from utils.state import StateStore
+
 # ---------- 日誌設定 ----------
-logging.basicConfig(level=logging.INFO)
+# 紀錄先進有上限的佇列，由背景執行緒輸出（JSON lines），重複訊息會合併 / 取樣
+log_pipeline = setup_logging()
 logger = logging.getLogger("discord")
 
 # ---------- Intents ----------
@@ -18,13 +33,80 @@ intents.guilds = True
 intents.reactions = True
 intents.message_content = True
 
+# ---------- 成員快取 ----------
+# full：discord.py 預設，啟動時載入所有成員並常駐記憶體
+# lru ：不在啟動時 chunk，只保留最近用到的成員（MemberLookup），記憶體不隨成員數成長
+MEMBER_CACHE_MODE = os.getenv("MEMBER_CACHE_MODE", "full").lower()
+MEMBER_LRU_SIZE = int(os.getenv("MEMBER_LRU_SIZE", "2000"))
+if MEMBER_CACHE_MODE == "lru":
+    member_options = {
+        "chunk_guilds_at_startup": False,
+        "member_cache_flags": discord.MemberCacheFlags.none(),
+    }
+else:
+    member_options = {}
+
+# ---------- 分片 ----------
+# SHARD_MODE=auto 時改用 AutoShardedBot；多個行程分攤時每個行程設定自己的 SHARD_IDS，
+# 例如 SHARD_COUNT=4，行程 A：SHARD_IDS=0-1、行程 B：SHARD_IDS=2-3
+SHARD_MODE = os.getenv("SHARD_MODE", "off").lower()
+SHARD_COUNT = int(os.getenv("SHARD_COUNT") or 0)   # 0 = 由 Discord 建議
+SHARD_IDS = os.getenv("SHARD_IDS", "")
+
+
+def parse_shard_ids(text):
+    """"0-3" / "0,2,5" / "0-1,4" → [0, 1, 2, 3] ...，空字串回傳 None（全部分片）"""
+    ids = []
+    for part in filter(None, (p.strip() for p in text.split(","))):
+        start, _, end = part.partition("-")
+        ids.extend(range(int(start), int(end or start) + 1))
+    return sorted(set(ids)) or None
+
+
+def shard_label(ids):
+    """[0, 1, 2, 5] → "0-2_5"，同一組分片不論 SHARD_IDS 怎麼寫都得到同一個名稱"""
+    ranges = []
+    for _, group in itertools.groupby(enumerate(ids), key=lambda item: item[1] - item[0]):
+        group = [shard for _, shard in group]
+        ranges.append(f"{group[0]}-{group[-1]}" if len(group) > 1 else str(group[0]))
+    return "_".join(ranges)
+
+
+shard_ids = None
+if SHARD_MODE == "auto":
+    shard_ids = parse_shard_ids(SHARD_IDS)
+    if shard_ids and not SHARD_COUNT:
+        raise RuntimeError("設定 SHARD_IDS 時必須同時設定 SHARD_COUNT")
+    shard_options = {"shard_count": SHARD_COUNT or None, "shard_ids": shard_ids}
+    bot_class = commands.AutoShardedBot
+else:
+    shard_options = {}
+    bot_class = commands.Bot
+
+# ---------- 狀態檔目錄 ----------
+# 多個行程分攤分片時，每個行程的 JSON 狀態檔（公告已讀、訂閱、倒數、伺服器設定…）必須分開，
+# 否則彼此覆寫；未設定 STATE_DIR 時依 SHARD_IDS 自動放到 state/shards-0-1 這類目錄。
+# 歷史資料庫（SQLite）內容與分片無關，各行程共用同一個檔案即可。
+# 每個行程都會各自輪詢氣象署，CWA_DAILY_QUOTA 需依行程數分配。
+STATE_DIR = os.getenv("STATE_DIR") or (os.path.join("state", f"shards-{shard_label(shard_ids)}") if shard_ids else "")
+
 # ---------- Bot ----------
-bot = commands.Bot(command_prefix="!", intents=intents)
+bot = bot_class(command_prefix="!", intents=intents, **member_options, **shard_options)
+bot.member_cache = MemberLookup(capacity=MEMBER_LRU_SIZE)
+bot.member_cache_mode = MEMBER_CACHE_MODE
+bot.log_pipeline = log_pipeline
+# 全 Bot 共用的指標（迴圈 / HTTP / 發送耗時、計數），!stats 與 Prometheus 匯出共用
+bot.metrics = Metrics()
+RateLimitCounter(bot.metrics).install()
+# 輪詢型 cog（PollerCog）共用：錯開起始時間、限制同時對外請求數、健康狀態
+bot.pollers = PollScheduler(bot.metrics)
 
 # ---------- on_ready ----------
 @bot.event
 async def on_ready():
     logger.info(f"✅ Bot 已登入為 {bot.user} (ID: {bot.user.id})")
+    if isinstance(bot, commands.AutoShardedBot):
+        logger.info(f"🧩 分片 {sorted(bot.shards)} / 共 {bot.shard_count}，本行程 {len(bot.guilds)} 個伺服器")
     command_names = [c for c in bot.all_commands]
     logger.info(f"目前可用指令: {command_names}")
     logger.info("📌 所有 cog 的第一次檢查將在各自 loop 中自動執行")
@@ -37,35 +119,117 @@ async def reload_cog(ctx, cog_name: str):
         if f"cogs.{cog_name}" in bot.extensions:
             await bot.unload_extension(f"cogs.{cog_name}")
             logger.info(f"🔄 已卸載模組 {cog_name}")
+        start = time.perf_counter()
         await bot.load_extension(f"cogs.{cog_name}")
-        await ctx.send(f"✅ 已重載模組 `{cog_name}` 並初始化完成")
-        logger.info(f"🔄 已重載模組 {cog_name} 並初始化完成")
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        await ctx.send(f"✅ 已重載模組 `{cog_name}` 並初始化完成（{elapsed_ms:.0f} ms）")
+        logger.info(f"🔄 已重載模組 {cog_name} 並初始化完成（{elapsed_ms:.1f} ms）")
     except Exception as e:
         await ctx.send(f"❌ 重載 `{cog_name}` 失敗: {e}")
         logger.error(f"重載 {cog_name} 發生錯誤: {e}")
 
 # ---------- 非同步載入所有 Cog ----------
+COG_LOAD_WARN_MS = float(os.getenv("COG_LOAD_WARN_MS", "500"))  # 單一 cog 超過此時間就警告
+
+
+def cog_imports(cog_name):
+    """cog 檔案最上層 import 的模組名稱（只讀語法樹，不執行 cog 本身）"""
+    with open(os.path.join("cogs", f"{cog_name}.py"), encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    names = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.append(node.module)
+    return names
+
+
+def preload_dependencies(cog_name):
+    """在背景執行緒先 import cog 用到的套件與 utils 模組，回傳秒數
+
+    load_extension 每次都會重新執行 cog 模組本身，先 import cog 沒有用；
+    但它 import 的模組會留在 sys.modules，之後 load_extension 直接沿用。
+    """
+    start = time.perf_counter()
+    for name in cog_imports(cog_name):
+        importlib.import_module(name)
+    return time.perf_counter() - start
+
+
+async def load_one_cog(cog_name, timings):
+    start = time.perf_counter()
+    try:
+        await bot.load_extension(f"cogs.{cog_name}")
+        logger.info(f"📦 已載入功能模組: {cog_name}.py")
+    except commands.errors.CommandRegistrationError as e:
+        logger.warning(f"⚠️ Cog {cog_name} 指令重複，跳過: {e}")
+    except Exception as e:
+        logger.error(f"❌ 載入 {cog_name}.py 失敗: {e}")
+    timings[cog_name]["load"] = time.perf_counter() - start
+
+
 async def load_cogs():
+    started = time.perf_counter()
     cogs_folder = "./cogs"
-    for filename in os.listdir(cogs_folder):
-        if filename.endswith(".py"):
-            cog_name = filename[:-3]
-            try:
-                await bot.load_extension(f"cogs.{cog_name}")
-                logger.info(f"📦 已載入功能模組: {filename}")
-            except commands.errors.CommandRegistrationError as e:
-                logger.warning(f"⚠️ Cog {cog_name} 指令重複，跳過: {e}")
-            except Exception as e:
-                logger.error(f"❌ 載入 {filename} 失敗: {e}")
+    cog_names = [filename[:-3] for filename in sorted(os.listdir(cogs_folder)) if filename.endswith(".py")]
+
+    # 1. 各 cog 用到的模組在執行緒中同時 import，共用的套件只載入一次
+    results = await asyncio.gather(
+        *(asyncio.to_thread(preload_dependencies, name) for name in cog_names), return_exceptions=True
+    )
+    timings = {}
+    for name, result in zip(cog_names, results):
+        if isinstance(result, BaseException):
+            # 交給 load_extension 載入時再報錯
+            logger.warning(f"⚠️ 預先載入 {name}.py 的相依模組失敗: {result}")
+            result = 0.0
+        timings[name] = {"preload": result, "load": 0.0}
+
+    # 2. 各 cog 彼此沒有相依，load_extension（執行 cog 模組 + setup）同時進行
+    await asyncio.gather(*(load_one_cog(name, timings) for name in cog_names))
+
+    # 3. 啟動時間報告：preload 是相依模組的 import，load 是 load_extension 實際花費的時間
+    for name, t in timings.items():
+        total_ms = (t["preload"] + t["load"]) * 1000
+        line = f"⏱️ {name:<16} preload {t['preload'] * 1000:7.1f} ms  load {t['load'] * 1000:7.1f} ms"
+        if total_ms > COG_LOAD_WARN_MS:
+            logger.warning(f"{line}  ⚠️ 超過 {COG_LOAD_WARN_MS:.0f} ms")
+        else:
+            logger.info(line)
+    logger.info(f"⏱️ 所有 cog 載入共 {(time.perf_counter() - started) * 1000:.1f} ms")
 
 # ---------- 非同步主程式 ----------
 async def main():
-    await load_cogs()
-    logger.info("📌 所有 cog 已載入完成，Bot 將開始啟動")
+    # 全 Bot 共用一個 HTTP client，所有 cog 透過 bot.http_session 取用
+    bot.http_session = create_http_session()
+    # 全 Bot 共用的 JSON 狀態儲存（記憶體讀取、背景合併寫檔）
+    bot.state = StateStore(directory=STATE_DIR)
+    if STATE_DIR:
+        logger.info(f"💾 狀態檔目錄：{STATE_DIR}")
+    # 各伺服器設定（通知頻道、地震縣市、公告開關），以 guild id 索引常駐記憶體
+    bot.guild_settings = GuildSettingsStore(bot.state)
+    # 全 Bot 共用的訊息出口：依 lane 排優先順序、合併 embed、避開速率限制
+    bot.dispatcher = MessageDispatcher(bot.metrics)
+    # HTML / JSON 解析的工作池（PARSE_POOL_MODE=thread|process），解析不占用 event loop
+    bot.parse_pool = ParsePool(bot.metrics)
+    exporters = await start_exporters(bot.metrics)
     try:
-        await bot.start(os.getenv("DISCORD_TOKEN"))
+        # async with 會先完成 bot 的非同步初始化，cog 載入時同時起跑的 task 可以安全地 wait_until_ready
+        async with bot:
+            await load_cogs()
+            logger.info("📌 所有 cog 已載入完成，Bot 將開始啟動")
+            await bot.start(os.getenv("DISCORD_TOKEN"))
     except Exception as e:
         logger.error(f"❌ Bot 啟動發生錯誤: {e}")
+    finally:
+        await bot.dispatcher.close()
+        bot.parse_pool.close()
+        await stop_exporters(exporters)
+        await bot.http_session.close()
+        logger.info("🌐 共用 HTTP client 已關閉")
+        await bot.state.close()
+        logger.info("💾 狀態檔已全部寫入")
 
 # ---------- 啟動 ----------
 if __name__ == "__main__":
@@ -73,3 +237,5 @@ if __name__ == "__main__":
         asyncio.run(main())
     except KeyboardInterrupt:
         print("✅ 程式已手動停止")
+    finally:
+        log_pipeline.stop()
@@ -1,121 +1,296 @@
 import discord
-from discord.ext import commands, tasks
-from datetime import datetime, date, time
-import json
+from discord.ext import commands
+from datetime import datetime, date, time, timedelta
+import asyncio
 import os
 import pytz
 import logging
+from utils.timer_heap import TimerHeap
 
 CONFIG_FILE = "countdown.json"
-CHANNEL_ID = int(os.getenv("NOTIFY_CHANNEL_ID"))
+CHANNEL_ID = int(os.getenv("NOTIFY_CHANNEL_ID") or 0)  # 舊版全域通知頻道（選用）
 TARGET_HOUR = 10
 TARGET_MINUTE = 0
+MAX_SLEEP = 6 * 3600  # 單次最長睡眠秒數（避免主機休眠後時間漂移）
+RETRY_DELAY = 60      # 發送發生非預期錯誤時，幾秒後重試
+LEGACY_ID = 1         # !setdate 操作的「FFXIV EA開服」倒數
+LEGACY_NAME = "FFXIV EA開服"
 tz = pytz.timezone("Asia/Taipei")
-logger = logging.getLogger("discord")
+logger = logging.getLogger(f"discord.{__name__}")
 
 
 class Countdown(commands.Cog):
+    """多組倒數：每組有自己的頻道、目標日期、每日發送時間
+
+    所有倒數的下一次發送時間放在同一個 TimerHeap，只有一個排程 task
+    睡到最早到期的那一組，新增 / 刪除都是 O(log n)。
+    """
+
     def __init__(self, bot):
         self.bot = bot
-        self.target_date = None
-        self.last_sent_date = None
+        self.countdowns = {}   # id -> 倒數設定 dict
+        self.next_id = LEGACY_ID + 1
+        self.timers = TimerHeap()
         self.prompted_for_date = False
+        self.countdown_task = None
+        self.wake = asyncio.Event()  # 設定變更時喚醒排程重新計算
+        self._state_doc = None
+        self.metrics = bot.metrics
         self.load_data()
         logger.info(f"✅ {self.__class__.__name__} 模組已初始化")
 
     def cog_unload(self):
-        if self.countdown_loop.is_running():
-            self.countdown_loop.cancel()
-            logger.info(f"🛑 {self.__class__.__name__} 倒數 loop 已取消")
+        if self.countdown_task and not self.countdown_task.done():
+            self.countdown_task.cancel()
+            logger.info(f"🛑 {self.__class__.__name__} 倒數排程已取消")
 
-    # 載入設定
+    # 載入設定（StateStore 只在檔案 mtime 變動時才重新解析）
     def load_data(self):
-        if os.path.exists(CONFIG_FILE):
-            try:
-                with open(CONFIG_FILE, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    target_date_str = data.get("target_date")
-                    last_sent_str = data.get("last_sent_date")
-                    if target_date_str:
-                        self.target_date = datetime.strptime(target_date_str, "%Y-%m-%d").date()
-                    if last_sent_str:
-                        self.last_sent_date = datetime.strptime(last_sent_str, "%Y-%m-%d").date()
-            except Exception as e:
-                logger.error(f"❌ 讀取設定檔失敗: {e}")
-        else:
-            logger.warning(f"⚠️ 設定檔不存在，啟動後會提示設定目標日期")
+        if not self.bot.state.exists(CONFIG_FILE):
+            if self._state_doc is None:
+                logger.warning(f"⚠️ 設定檔不存在，啟動後會提示設定目標日期")
+                self._state_doc = {}
+            return
+        data = self.bot.state.get(CONFIG_FILE)
+        if data is self._state_doc:
+            return
+        self._state_doc = data
+        try:
+            entries = data.get("countdowns")
+            if entries is None:
+                # 舊版格式：只有一組 target_date / last_sent_date
+                entries = []
+                if data.get("target_date"):
+                    entries.append(self.make_entry(
+                        LEGACY_ID, None, CHANNEL_ID, LEGACY_NAME, data["target_date"],
+                        last_sent_date=data.get("last_sent_date"),
+                    ))
+            self.countdowns = {entry["id"]: entry for entry in entries}
+            self.next_id = max([data.get("next_id", 0), LEGACY_ID + 1, *(i + 1 for i in self.countdowns)])
+        except Exception as e:
+            logger.error(f"❌ 讀取設定檔失敗: {e}")
+        self.rebuild_timers()
 
     def save_data(self):
-        data = {
-            "target_date": self.target_date.strftime("%Y-%m-%d") if self.target_date else None,
-            "last_sent_date": self.last_sent_date.strftime("%Y-%m-%d") if self.last_sent_date else None
+        data = {"next_id": self.next_id, "countdowns": list(self.countdowns.values())}
+        self._state_doc = data
+        self.bot.state.set(CONFIG_FILE, data)
+
+    @staticmethod
+    def make_entry(entry_id, guild_id, channel_id, name, target_date, hour=TARGET_HOUR, minute=TARGET_MINUTE,
+                   last_sent_date=None):
+        return {
+            "id": entry_id,
+            "guild_id": guild_id,
+            "channel_id": channel_id,
+            "name": name,
+            "target_date": target_date,
+            "hour": hour,
+            "minute": minute,
+            "last_sent_date": last_sent_date,
         }
-        try:
-            with open(CONFIG_FILE, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=4)
-        except Exception as e:
-            logger.error(f"❌ 儲存設定檔失敗: {e}")
 
-    @commands.command(name="setdate")
-    async def set_date_countdown(self, ctx, date_str: str):
+    # ---------- 排程 ----------
+    def next_fire_time(self, entry, now):
+        """下一次發送時間；今天的發送時間已過但還沒發送（停機、延遲）則立即補發，已結束回傳 None"""
+        target_date = datetime.strptime(entry["target_date"], "%Y-%m-%d").date()
+        fire_time = time(entry["hour"], entry["minute"])
+        today = now.date()
+        sent_today = entry.get("last_sent_date") == today.strftime("%Y-%m-%d")
+        if today > target_date or (today == target_date and sent_today):
+            return None
+        fire_today = tz.localize(datetime.combine(today, fire_time))
+        if now < fire_today:
+            return fire_today
+        if not sent_today:
+            return now
+        return tz.localize(datetime.combine(today + timedelta(days=1), fire_time))
+
+    def schedule(self, entry, now=None):
         try:
-            new_date = datetime.strptime(date_str, "%Y-%m-%d").date()
-            self.target_date = new_date
-            self.last_sent_date = None
-            self.prompted_for_date = False
-            self.save_data()
-            days_left = (self.target_date - date.today()).days
-            await ctx.send(f"✅ 目標日期已設定為 {new_date}（剩下 {days_left} 天）")
-        except ValueError:
-            await ctx.send("❌ 日期格式錯誤，請使用 YYYY-MM-DD")
+            fire_at = self.next_fire_time(entry, now or datetime.now(tz))
+        except (KeyError, TypeError, ValueError) as e:
+            # 手動修改 JSON 造成欄位錯誤：只停這一組，修正檔案後重新載入即恢復
+            logger.error(f"❌ 倒數 #{entry.get('id')} 設定錯誤，無法排程: {e}")
+            fire_at = None
+        if fire_at is None:
+            self.timers.cancel(entry["id"])
+        else:
+            self.timers.push(entry["id"], fire_at)
+
+    def rebuild_timers(self):
+        self.timers.clear()
+        now = datetime.now(tz)
+        for entry in self.countdowns.values():
+            self.schedule(entry, now)
+        self.wake.set()
 
-    @tasks.loop(minutes=1, reconnect=True)
-    async def countdown_loop(self):
+    async def countdown_scheduler(self):
+        """只睡到最早到期的倒數，中間不做任何事"""
+        logger.info(f"🔄 倒數排程準備啟動，等待 bot ready...")
         await self.bot.wait_until_ready()
+        logger.info(f"🔄 倒數排程已啟動")
+        while True:
+            try:
+                # 🔄 外部手動修改 JSON 時（mtime 變動）才會重新解析
+                self.load_data()
+                if not self.countdowns:
+                    await self.prompt_for_date()
+                self.wake.clear()
+
+                top = self.timers.peek()
+                now = datetime.now(tz)
+                if top is None:
+                    # 沒有待發送的倒數，等指令喚醒
+                    await self.wake.wait()
+                    continue
+
+                delay = (top[0] - now).total_seconds()
+                if delay > 0:
+                    logger.info(
+                        f"⏰ 下一次倒數訊息：{top[0]}（共 {len(self.timers)} 組排程中）", extra={"sample": "countdown_next"}
+                    )
+                    try:
+                        await asyncio.wait_for(self.wake.wait(), timeout=min(delay, MAX_SLEEP))
+                    except asyncio.TimeoutError:
+                        pass
+                    # 被喚醒或睡眠分段結束都重新計算
+                    continue
+
+                self.metrics.inc("polls_total", loop="countdown")
+                with self.metrics.timer("loop_seconds", loop="countdown"):
+                    for entry_id in self.timers.pop_due(now):
+                        entry = self.countdowns.get(entry_id)
+                        if not entry:
+                            continue
+                        # 已經從 heap 取出，發送失敗也要重新排程，否則這組倒數會停到重啟為止
+                        try:
+                            await self.send_countdown(entry, now)
+                        except Exception as e:
+                            logger.error(f"❌ 倒數 #{entry_id} 發送時發生錯誤，{RETRY_DELAY} 秒後重試: {e}")
+                            self.metrics.inc("loop_errors_total", loop="countdown")
+                            self.timers.push(entry_id, now + timedelta(seconds=RETRY_DELAY))
+                            continue
+                        self.schedule(entry, now)
+                    self.save_data()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ 倒數排程發生錯誤: {e}")
+                self.metrics.inc("loop_errors_total", loop="countdown")
+                await asyncio.sleep(60)
+
+    async def prompt_for_date(self):
+        if self.prompted_for_date or not CHANNEL_ID:
+            return
         channel = self.bot.get_channel(CHANNEL_ID)
         if not channel:
             logger.warning(f"⚠️ 找不到頻道 ID={CHANNEL_ID}")
             return
+        await self.bot.dispatcher.send(channel, "countdown", "⚠️ 目標日期尚未設定，請使用指令 `!setdate YYYY-MM-DD`")
+        self.prompted_for_date = True
+
+    async def send_countdown(self, entry, now):
+        today = now.date()
+        target_date = datetime.strptime(entry["target_date"], "%Y-%m-%d").date()
+        channel = self.bot.get_channel(entry["channel_id"])
+        try:
+            if not channel:
+                # 分片時其他行程負責的伺服器不在本行程快取中，不算錯誤
+                if entry.get("guild_id") is None or self.bot.get_guild(entry["guild_id"]):
+                    logger.warning(f"⚠️ 找不到頻道 ID={entry['channel_id']}")
+            elif today < target_date:
+                days_left = (target_date - today).days
+                await self.bot.dispatcher.send(channel, "countdown", f"📅 距離 {entry['name']} 還有 {days_left} 天")
+            elif today == target_date:
+                await self.bot.dispatcher.send(channel, "countdown", f"🎉 耶！{entry['name']}啦！")
+        except discord.HTTPException as e:
+            logger.error(f"❌ 倒數 #{entry['id']} 發送失敗: {e}")
 
+        entry["last_sent_date"] = today.strftime("%Y-%m-%d")
+        logger.info(f"✅ 倒數 #{entry['id']} {entry['name']} 訊息已發送，日期：{today}")
+
+    def put_entry(self, entry):
+        """加入新增或重設日期的倒數；今天的發送時間已過就從明天開始，不當成漏發立即補送"""
         now = datetime.now(tz)
-        logger.info(f"⏰ EA開服倒數檢查中：{now}, 目標日期={self.target_date}, 最後發送訊息時間={self.last_sent_date}")
+        if now >= tz.localize(datetime.combine(now.date(), time(entry["hour"], entry["minute"]))):
+            entry["last_sent_date"] = now.strftime("%Y-%m-%d")
+        self.countdowns[entry["id"]] = entry
+        self.schedule(entry, now)
+        self.save_data()
+        self.prompted_for_date = False
+        self.wake.set()
 
-        # 🔄 每次檢查時重新讀 JSON，避免外部手動修改後 bot 不知道
-        self.load_data()
+    # ---------- 指令 ----------
+    @commands.command(name="setdate")
+    async def set_date_countdown(self, ctx, date_str: str):
+        try:
+            new_date = datetime.strptime(date_str, "%Y-%m-%d").date()
+        except ValueError:
+            await ctx.send("❌ 日期格式錯誤，請使用 YYYY-MM-DD")
+            return
+        guild_channel = self.bot.guild_settings.notify_channel(ctx.guild.id) if ctx.guild else None
+        channel_id = guild_channel or CHANNEL_ID or ctx.channel.id
+        entry = self.countdowns.get(LEGACY_ID) or self.make_entry(LEGACY_ID, None, channel_id, LEGACY_NAME, None)
+        entry["target_date"] = new_date.strftime("%Y-%m-%d")
+        entry["last_sent_date"] = None
+        self.put_entry(entry)
+        days_left = (new_date - date.today()).days
+        await ctx.send(f"✅ 目標日期已設定為 {new_date}（剩下 {days_left} 天）")
+
+    @commands.group(name="countdown", invoke_without_command=True)
+    async def countdown_group(self, ctx):
+        await ctx.send("用法：`!countdown add YYYY-MM-DD HH:MM 名稱`、`!countdown list`、`!countdown remove <編號>`")
 
-        if not self.target_date:
-            if not self.prompted_for_date:
-                await channel.send("⚠️ 目標日期尚未設定，請使用指令 `!setdate YYYY-MM-DD`")
-                self.prompted_for_date = True
+    @countdown_group.command(name="add")
+    @commands.has_permissions(manage_guild=True)
+    async def countdown_add(self, ctx, date_str: str, time_str: str, *, name: str):
+        try:
+            target_date = datetime.strptime(date_str, "%Y-%m-%d").date()
+            fire_time = datetime.strptime(time_str, "%H:%M").time()
+        except ValueError:
+            await ctx.send("❌ 格式錯誤，請使用 `!countdown add YYYY-MM-DD HH:MM 名稱`")
             return
-        self.prompted_for_date = False
+        entry = self.make_entry(
+            self.next_id, ctx.guild.id if ctx.guild else None, ctx.channel.id, name,
+            target_date.strftime("%Y-%m-%d"), fire_time.hour, fire_time.minute,
+        )
+        self.next_id += 1
+        self.put_entry(entry)
+        days_left = (target_date - date.today()).days
+        await ctx.send(f"✅ 已新增倒數 #{entry['id']}：{name} {target_date}（剩下 {days_left} 天，每天 {time_str} 提醒）")
 
-        # ✅ 僅在「10:00整」發送，避免過了時間就一直觸發
-        if now.hour >= TARGET_HOUR and now.minute == TARGET_MINUTE:
-            if self.last_sent_date != now.date():
-                if now.date() < self.target_date:
-                    days_left = (self.target_date - now.date()).days
-                    await channel.send(f"📅 距離 FFXIV EA開服 還有 {days_left} 天")
-                elif now.date() == self.target_date:
-                    await channel.send("🎉 耶！FFXIV EA開服啦！")
-
-                self.last_sent_date = now.date()
-                self.save_data()
-                logger.info(f"✅ 倒數訊息已發送，日期：{self.last_sent_date}")
-
-    @countdown_loop.before_loop
-    async def before_countdown_loop(self):
-        logger.info(f"🔄 倒數 loop 準備啟動，等待 bot ready...")
-        await self.bot.wait_until_ready()
-        logger.info(f"🔄 倒數 loop 已啟動")
+    @countdown_group.command(name="list")
+    async def countdown_list(self, ctx):
+        guild_id = ctx.guild.id if ctx.guild else None
+        entries = [e for e in self.countdowns.values() if e["guild_id"] in (guild_id, None)]
+        if not entries:
+            await ctx.send("📭 目前沒有倒數")
+            return
+        lines = []
+        for e in sorted(entries, key=lambda e: e["target_date"]):
+            status = "" if e["id"] in self.timers else "（已結束）"
+            lines.append(
+                f"#{e['id']} {e['name']} {e['target_date']} 每天 {e['hour']:02d}:{e['minute']:02d} <#{e['channel_id']}>{status}"
+            )
+        await ctx.send("\n".join(lines))
 
-    @countdown_loop.error
-    async def countdown_loop_error(self, error):
-        logger.error(f"❌ 倒數 loop 發生錯誤: {error}")
+    @countdown_group.command(name="remove")
+    @commands.has_permissions(manage_guild=True)
+    async def countdown_remove(self, ctx, entry_id: int):
+        entry = self.countdowns.get(entry_id)
+        guild_id = ctx.guild.id if ctx.guild else None
+        if not entry or entry["guild_id"] not in (guild_id, None):
+            await ctx.send(f"❌ 找不到倒數 #{entry_id}")
+            return
+        del self.countdowns[entry_id]
+        self.timers.cancel(entry_id)
+        self.save_data()
+        self.wake.set()
+        await ctx.send(f"🗑️ 已移除倒數 #{entry_id} {entry['name']}")
 
 
 async def setup(bot):
     cog = Countdown(bot)
     await bot.add_cog(cog)
-    if not cog.countdown_loop.is_running():
-        cog.countdown_loop.start()
+    cog.countdown_task = asyncio.create_task(cog.countdown_scheduler())
@@ -1,246 +1,520 @@
 import discord
-from discord.ext import commands, tasks
+from discord.ext import commands
 from datetime import datetime, timedelta
-import aiohttp
-import json
+import asyncio
+import functools
+import itertools
 import os
 import pytz
+import re
 import logging
+import time
+from utils.adaptive_poll import AdaptivePollScheduler
+from utils.cache import SingleFlight, TTLCache
+from utils.cwa_parser import decode_reports
+from utils.metrics import QUAKE_LATENCY_BUCKETS
+from utils.parse_pool import ParseError
+from utils.poller import PollerCog
+from utils.quake_archive import QuakeArchive
+from utils.quake_subscriptions import (
+    ALWAYS, INTENSITY_LEVELS, INTENSITY_RANK, SubscriptionIndex, normalize_county, parse_intensity,
+)
 
 CONFIG_FILE = "earthquake_last.json"
 USAGE_FILE = "earthquake_usage.json"
-CHANNEL_ID = int(os.getenv("NOTIFY_CHANNEL_ID"))
+SUBSCRIPTION_FILE = "earthquake_subscriptions.json"
+CHANNEL_ID = int(os.getenv("NOTIFY_CHANNEL_ID") or 0)  # 舊版全域通知頻道（選用），各伺服器改用 !guildset
 API_KEY = os.getenv("CWA_API_KEY")  # 你在環境變數設定的授權碼
-CHECK_INTERVAL = 5
-TARGET_CITIES = ["新北市", "新竹市", "臺中市"]
+# 可覆寫為本機替身伺服器（bench/stand_in.py）做離線壓測
+CWA_API_BASE = os.getenv("CWA_API_BASE", "https://opendata.cwa.gov.tw/api/v1/rest/datastore")
+# 顯著有感地震報告 + 小區域有感地震報告，每次輪詢同時抓取
+EQ_DATASETS = ("E-A0015-001", "E-A0016-001")
+LEGACY_DATASET = "E-A0015-001"  # 舊版設定檔的 last_eq_no 只記錄這個資料集
+EQ_BATCH_LIMIT = int(os.getenv("EQ_BATCH_LIMIT", "20"))  # 增量模式每個資料集最多抓幾筆
+RECENT_KEYS_LIMIT = 100   # 記住最近處理過的報告數量，避免重送
+EQ_DELIVERY_RETRIES = int(os.getenv("EQ_DELIVERY_RETRIES", "3"))  # 報告完全送不出去時，之後幾次輪詢重送
+EQ_CACHE_TTL = float(os.getenv("EQ_CACHE_TTL", "300"))  # 最新報告快取秒數（輪詢成功時會自動延長）
+CHECK_INTERVAL = 5  # 啟動時的第一個間隔，之後由 AdaptivePollScheduler 動態調整
+CWA_DAILY_QUOTA = int(os.getenv("CWA_DAILY_QUOTA", "20000"))       # 每日請求次數額度（0 = 不限）
+CWA_DAILY_BYTES = int(os.getenv("CWA_DAILY_BYTES", "0"))           # 每日下載位元組額度（0 = 不限）
+EQ_MIN_INTERVAL = float(os.getenv("EQ_MIN_INTERVAL", "2"))         # 新報告後的最短間隔
+EQ_QUIET_INTERVAL = float(os.getenv("EQ_QUIET_INTERVAL", "10"))    # 平靜時最長間隔
+EQ_MAX_INTERVAL = float(os.getenv("EQ_MAX_INTERVAL", "120"))       # 連續錯誤時最長間隔
+TARGET_CITIES = ["新北市", "新竹市", "臺中市"]  # 預設訂閱（NOTIFY_CHANNEL_ID）關注的縣市
+HISTORY_LIMIT = 10        # !eqhistory 最多列出幾筆
+HISTORY_UNITS = {"h": "hours", "d": "days", "w": "weeks"}
 tz = pytz.timezone("Asia/Taipei")
-logger = logging.getLogger("discord")
+logger = logging.getLogger(f"discord.{__name__}")
+
+
+def parse_history_args(args):
+    """!eqhistory 參數 → QuakeArchive.query 的條件
+
+    "7d" / "24h" / "2w" 時間範圍、"mag>5" / "mag>=5" 規模條件、"4級" / "5弱" 震度門檻，其餘視為縣市。
+    無法辨識時拋出 ValueError。
+    """
+    filters = {}
+    for arg in args:
+        duration = re.fullmatch(r"(\d+)([hdw])", arg.lower())
+        magnitude = re.fullmatch(r"(?:mag|m)(>=?)(\d+(?:\.\d+)?)", arg.lower())
+        level = parse_intensity(arg)
+        if duration:
+            delta = timedelta(**{HISTORY_UNITS[duration.group(2)]: int(duration.group(1))})
+            filters["since"] = (datetime.now(tz) - delta).strftime("%Y-%m-%d %H:%M:%S")
+        elif magnitude:
+            filters["magnitude"] = (magnitude.group(1), float(magnitude.group(2)))
+        elif level and level != ALWAYS:
+            filters["min_rank"] = INTENSITY_RANK[level]
+        elif "county" not in filters:
+            filters["county"] = normalize_county(arg)
+        else:
+            raise ValueError(arg)
+    if "min_rank" in filters and "county" not in filters:
+        raise ValueError("震度門檻需要搭配縣市")
+    return filters
+
 
+class Earthquake(PollerCog):
+    source = "earthquake"
+    poll_interval = CHECK_INTERVAL
+    # 地震不能停太久，冷卻（含加倍後）不超過最長輪詢間隔
+    breaker_cooldown = EQ_MAX_INTERVAL
+    breaker_max_cooldown = EQ_MAX_INTERVAL
 
-class Earthquake(commands.Cog):
     def __init__(self, bot):
-        self.bot = bot
+        super().__init__(bot)
         self.last_eq_no = None
+        # 每個資料集各自的水位線 {dataset: 已處理報告中最新的 OriginTime}，增量抓取的起點
+        # 兩個資料集的發布時間互不相關，共用一條會漏掉較晚發布但 OriginTime 較早的報告
+        self.watermarks = {}
+        self.recent_keys = []         # 最近處理過的報告 key（編號@時間）
+        self.delivery_failures = {}   # 報告 key -> 完全送不出去的次數
         self.usage = {"date": "", "count": 0, "flow": 0}  # 紀錄每日使用量
         self.load_last_eq()
         self.load_usage()
+        self.subscriptions = self.load_subscriptions()
+        self.scheduler = AdaptivePollScheduler(
+            tz,
+            daily_quota=CWA_DAILY_QUOTA,
+            daily_bytes=CWA_DAILY_BYTES,
+            min_interval=EQ_MIN_INTERVAL,
+            quiet_interval=EQ_QUIET_INTERVAL,
+            max_interval=EQ_MAX_INTERVAL,
+            usage=self.usage,
+            requests_per_poll=len(EQ_DATASETS),  # 每次輪詢每個資料集各一個請求
+        )
+        # 最新報告快取：QuakeReport.key -> {"report", "embed"}，!eq 與輪詢共用
+        self.report_cache = TTLCache(ttl=EQ_CACHE_TTL)
+        self.inflight = SingleFlight()
+        # 處理過的報告都寫入歷史資料庫，!eqhistory 直接查本機索引
+        self.archive = QuakeArchive()
         logger.info(f"✅ {self.__class__.__name__} 模組已初始化")
 
-    def cog_unload(self):
-        if self.earthquake_loop.is_running():
-            self.earthquake_loop.cancel()
-            logger.info("🛑 Earthquake loop 已取消")
+    async def cog_unload(self):
+        await super().cog_unload()
+        self.save_usage()
+        await asyncio.to_thread(self.archive.close)
 
     def load_last_eq(self):
-        if os.path.exists(CONFIG_FILE):
-            with open(CONFIG_FILE, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                self.last_eq_no = data.get("last_eq_no")
-        else:
-            self.last_eq_no = None
-
-    def save_last_eq(self, eq_no):
-        self.last_eq_no = eq_no
-        with open(CONFIG_FILE, "w", encoding="utf-8") as f:
-            json.dump({"last_eq_no": eq_no}, f, ensure_ascii=False, indent=2)
+        data = self.bot.state.get(CONFIG_FILE)
+        self.last_eq_no = data.get("last_eq_no")
+        self.watermarks = dict(data.get("watermarks") or {})
+        if not self.watermarks and data.get("last_origin_time"):
+            # 舊版設定檔只有一條共用的 last_origin_time
+            self.watermarks = dict.fromkeys(EQ_DATASETS, data["last_origin_time"])
+        self.recent_keys = data.get("recent_keys", [])
+
+    def save_last_eq(self, reports, watermarks):
+        """記錄這一批已處理的報告（reports 需依 OriginTime 由舊到新），並推進抓取成功的資料集水位線"""
+        changed = bool(reports)
+        for eq in reports:
+            if eq.key not in self.recent_keys:
+                self.recent_keys.append(eq.key)
+        for dataset, origin_time in watermarks.items():
+            if dataset not in self.watermarks or origin_time > self.watermarks[dataset]:
+                self.watermarks[dataset] = origin_time
+                changed = True
+        if not changed:
+            return
+        self.recent_keys = self.recent_keys[-RECENT_KEYS_LIMIT:]
+        if reports and LEGACY_DATASET in self.watermarks:
+            # 舊版的 last_eq_no 在 LEGACY_DATASET 有水位線之前都要保留給 fetch_new_reports 比對
+            self.last_eq_no = reports[-1].eq_no
+        self.bot.state.set(CONFIG_FILE, {
+            "last_eq_no": self.last_eq_no,
+            "watermarks": self.watermarks,
+            "recent_keys": self.recent_keys,
+        })
+
+    def load_subscriptions(self):
+        if self.bot.state.exists(SUBSCRIPTION_FILE):
+            return SubscriptionIndex(self.bot.state.get(SUBSCRIPTION_FILE).get("subscriptions", []))
+        # 沒有訂閱檔時沿用舊設定：NOTIFY_CHANNEL_ID 收到所有報告，顯示 TARGET_CITIES 震度
+        index = SubscriptionIndex()
+        if CHANNEL_ID:
+            index.add(None, CHANNEL_ID, TARGET_CITIES, ALWAYS)
+        return index
+
+    def save_subscriptions(self):
+        self.bot.state.set(SUBSCRIPTION_FILE, {"subscriptions": self.subscriptions.to_list()})
 
     def load_usage(self):
-        if os.path.exists(USAGE_FILE):
-            with open(USAGE_FILE, "r", encoding="utf-8") as f:
-                self.usage = json.load(f)
-        else:
-            self.usage = {"date": "", "count": 0, "flow": 0}
+        self.usage = self.bot.state.get(USAGE_FILE, default={"date": "", "count": 0, "flow": 0})
 
     def save_usage(self):
-        with open(USAGE_FILE, "w", encoding="utf-8") as f:
-            json.dump(self.usage, f, ensure_ascii=False, indent=2)
-
-    async def fetch_earthquake(self):
-        # 使用最新顯著有感地震報告 API
-        url = f"https://opendata.cwa.gov.tw/api/v1/rest/datastore/E-A0015-001?Authorization={API_KEY}&sort=-OriginTime&limit=1"
+        # 寫入由 StateStore 合併後在背景執行，每次請求都呼叫也不會阻塞 event loop
+        self.usage = self.scheduler.usage
+        self.bot.state.set(USAGE_FILE, self.usage)
+
+    async def fetch_earthquake(self, dataset="E-A0015-001", since=None, limit=1):
+        """抓取單一資料集的報告清單 [QuakeReport, ...]；since 為 OriginTime 字串時只抓該時間之後（含）的報告
+
+        失敗只記錄並回傳 None，不計入輪詢健康狀態（!eq 指令也走這裡），由輪詢端依所有資料集的結果判斷。
+        """
+        url = f"{CWA_API_BASE}/{dataset}"
+        params = {"Authorization": API_KEY, "sort": "-OriginTime", "limit": str(limit)}
+        if since:
+            # OriginTime 格式為 "YYYY-MM-DD hh:mm:ss"，timeFrom 需要 "YYYY-MM-DDThh:mm:ss"
+            params["timeFrom"] = since.replace(" ", "T")
+        nbytes = 0
+        start = time.perf_counter()
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url) as resp:
-                    if resp.status != 200:
-                        logger.error(f"❌ 地震資料抓取失敗，HTTP {resp.status}")
-                        return None
-                    data = await resp.json()
-                    return data
+            async with self.fetch_slot(), self.bot.http_session.get(url, params=params) as resp:
+                body = await resp.read()
+                nbytes = len(body)
+                self.metrics.inc("http_responses_total", source="cwa", status=resp.status)
+                if resp.status != 200:
+                    logger.error(f"❌ 地震資料抓取失敗 ({dataset})，HTTP {resp.status}")
+                    return None
+            # JSON 解碼與欄位擷取在工作池進行，不占用 fetch slot 也不卡 event loop
+            reports, rejected = await self.bot.parse_pool.run("cwa_reports", decode_reports, body)
+            if rejected:
+                logger.warning(f"⚠️ {dataset} 有 {rejected} 筆報告格式錯誤，已略過")
+                self.metrics.inc("cwa_reports_rejected_total", rejected, dataset=dataset)
+            return reports
+        except ParseError as e:
+            logger.error(f"❌ 地震資料解析失敗 ({dataset}): {e}")
+            return None
         except Exception as e:
-            logger.error(f"❌ 抓取地震資料發生錯誤: {e}")
+            logger.error(f"❌ 抓取地震資料發生錯誤 ({dataset}): {e}")
+            self.metrics.inc("http_errors_total", source="cwa")
             return None
+        finally:
+            self.metrics.observe("http_request_seconds", time.perf_counter() - start, source="cwa")
+            # 每一次實際送出的請求都計入額度
+            self.scheduler.record_request(nbytes)
+            self.save_usage()
 
-    @tasks.loop(seconds=CHECK_INTERVAL, reconnect=True)
-    async def earthquake_loop(self):
-        await self.bot.wait_until_ready()
-        channel = self.bot.get_channel(CHANNEL_ID)
-        if not channel:
-            logger.warning("⚠️ 找不到頻道 ID")
-            return
+    @staticmethod
+    def merge_reports(results):
+        """合併各資料集的報告清單（抓取失敗為 None），去重後依 OriginTime 由舊到新排序"""
+        merged = {}
+        for reports in results:
+            for eq in reports or ():
+                merged[eq.key] = eq
+        return sorted(merged.values(), key=lambda eq: eq.origin_time)
+
+    async def fetch_reports(self, limit=1):
+        """同時抓取所有資料集的最新 limit 筆報告"""
+        results = await asyncio.gather(*(self.fetch_earthquake(dataset, limit=limit) for dataset in EQ_DATASETS))
+        return self.merge_reports(results)
+
+    async def fetch_new_reports(self):
+        """增量抓取各資料集水位線之後的新報告
+
+        回傳 (新報告, 只記錄不發送的報告, {dataset: 本次抓到的報告})。
+        第三項只包含抓取成功的資料集，處理完後由 next_watermarks 算出新的水位線；
+        抓取失敗的資料集水位線不動，下一輪從原本的位置重抓。
+        """
+        results = await asyncio.gather(*(
+            # 沒有起點（第一次啟動）只看最新一筆當起點；水位線為 "" 代表抓過但當時沒有任何報告
+            self.fetch_earthquake(dataset, since=self.watermarks.get(dataset),
+                                  limit=EQ_BATCH_LIMIT if dataset in self.watermarks else 1)
+            for dataset in EQ_DATASETS
+        ))
+        failed = [dataset for dataset, reports in zip(EQ_DATASETS, results) if reports is None]
+        if len(failed) == len(EQ_DATASETS):
+            # 全部失敗才算這次輪詢失敗（斷路器、錯誤退避）；只壞一個時另一個資料集的警報照常以原本間隔輪詢
+            self.mark_failure(f"所有資料集抓取失敗 {failed}")
+        elif failed:
+            logger.warning(f"⚠️ {failed} 抓取失敗，水位線不動，下一輪重抓")
+        fetched = {dataset: reports for dataset, reports in zip(EQ_DATASETS, results) if reports is not None}
+
+        candidates, seeded = [], []
+        for dataset, reports in zip(EQ_DATASETS, results):
+            if not reports:
+                continue
+            if dataset in self.watermarks:
+                candidates.extend(reports)
+            elif dataset == LEGACY_DATASET and self.last_eq_no is not None:
+                # 舊版設定檔只有這個資料集的 last_eq_no：編號不同代表停機期間有新報告
+                for eq in reports:
+                    (candidates if eq.eq_no != self.last_eq_no else seeded).append(eq)
+            else:
+                # 沒有水位線（第一次啟動、新加入的資料集）：最新一筆只當起點，不當成新報告發送
+                seeded.extend(reports)
+
+        latest = self.merge_reports(results)
+        if latest:
+            self.cache_report(latest[-1])
+        seen = set(self.recent_keys)
+        return [eq for eq in self.merge_reports([candidates]) if eq.key not in seen], seeded, fetched
+
+    @staticmethod
+    def next_watermarks(fetched, retry_keys=()):
+        """各資料集新的水位線：本次抓到的最新 OriginTime；有報告要重送時停在最早那一份（timeFrom 含該時間）
+
+        水位線為 "" 代表抓取成功但當時沒有任何報告。
+        """
+        watermarks = {}
+        for dataset, reports in fetched.items():
+            retry = [eq.origin_time for eq in reports if eq.key in retry_keys]
+            watermarks[dataset] = min(retry) if retry else max((eq.origin_time for eq in reports), default="")
+        return watermarks
+
+    def cache_report(self, eq):
+        """放入（或延長）最新報告快取，回傳快取項目"""
+        entry = self.report_cache.get(eq.key)
+        if entry is None:
+            entry = {"report": eq, "embed": self.build_embed(eq, TARGET_CITIES)}
+        self.report_cache.set(eq.key, entry)  # 重新寫入即延長期限並標記為最新
+        return entry
+
+    async def get_latest_report(self):
+        """取得最新報告快取；快取失效時同時間只發一次 API 請求"""
+        entry = self.report_cache.latest()
+        if entry is not None:
+            self.metrics.inc("cache_requests_total", cache="eq_latest", result="hit")
+            return entry
+        self.metrics.inc("cache_requests_total", cache="eq_latest", result="miss")
+        return await self.inflight.do("latest", self._refresh_latest)
+
+    async def _refresh_latest(self):
+        reports = await self.fetch_reports(limit=1)
+        if not reports:
+            return None
+        return self.cache_report(reports[-1])
+
+    async def poll(self):
+        return await self.check_earthquake()
 
+    def next_interval(self, new_data):
+        # 依本次結果與剩餘額度決定下一次間隔
+        return self.scheduler.on_result(new_report=new_data, error=self.poll_failed)
+
+    async def check_earthquake(self):
+        """檢查一次最新地震，有發送新報告回傳 True"""
         # 每天重置使用量
-        today = datetime.now(tz).strftime("%Y-%m-%d")
-        if self.usage.get("date") != today:
-            self.usage = {"date": today, "count": 0, "flow": 0}
+        if self.scheduler.roll_day():
             self.save_usage()
 
-        data = await self.fetch_earthquake()
-        if not data:
-            logger.info("⏰ 未抓到地震資料")
-            return
+        new_reports, seeded, fetched = await self.fetch_new_reports()
+        if not new_reports:
+            # 抓到的都處理過了，仍推進水位線（例如第一次啟動）
+            self.save_last_eq(seeded, self.next_watermarks(fetched))
+            logger.info(f"⏰ 檢查中：沒有新地震報告, last_sent={self.last_eq_no}", extra={"sample": "eq_idle"})
+            return False
+
+        logger.info(f"⏰ 檢查中：{len(new_reports)} 筆新地震報告 {[eq.eq_no for eq in new_reports]}")
+
+        # 縣市震度在解碼時已建好（QuakeReport.counties），透過反向索引找出要通知的訂閱（!eqsub + 各伺服器預設），依頻道彙整
+        # 分片時只通知本行程負責的伺服器
+        guild_index = self.bot.guild_settings.quake_index()
+        outbox = {}
+        for eq in new_reports:
+            embeds_by_counties = {}  # 相同縣市清單的訂閱共用同一個 embed
+            cached = self.report_cache.get(eq.key)
+            if cached is not None:
+                embeds_by_counties[tuple(TARGET_CITIES)] = cached["embed"]
+            notified = set()  # 同一頻道同一份報告只送一次
+            for sub in itertools.chain(self.subscriptions.match(eq.counties), guild_index.match(eq.counties)):
+                if sub["channel_id"] in notified or not self.is_local_guild(sub["guild_id"]):
+                    continue
+                notified.add(sub["channel_id"])
+                counties = tuple(sub["counties"])
+                embed = embeds_by_counties.get(counties)
+                if embed is None:
+                    embed = embeds_by_counties[counties] = self.build_embed(eq, counties)
+                outbox.setdefault(sub["channel_id"], []).append((eq, embed))
+
+        # 交給 dispatcher 走最優先的 quake lane；同頻道的多份報告會合併成最少的訊息（每則最多 10 個 embed）
+        deliveries = []
+        for channel_id, items in outbox.items():
+            channel = self.get_cached_channel(channel_id)
+            if not channel:
+                logger.warning(f"⚠️ 找不到頻道 ID={channel_id}")
+                continue
+            for eq, embed in items:
+                future = self.bot.dispatcher.send(channel, "quake", embed=embed)
+                future.add_done_callback(functools.partial(self.on_alert_delivered, channel_id, eq))
+                deliveries.append((eq, future))
+        results = await asyncio.gather(*(future for _, future in deliveries), return_exceptions=True)
+
+        # 至少送達一個頻道（或本來就沒有要送的頻道）才算處理完；全部失敗的報告不記錄，下一輪重抓重送
+        delivered = {eq.key for (eq, _), result in zip(deliveries, results) if not isinstance(result, BaseException)}
+        retry_keys = set()
+        for eq in {eq.key: eq for eq, _ in deliveries}.values():
+            if eq.key in delivered:
+                self.delivery_failures.pop(eq.key, None)
+                continue
+            failures = self.delivery_failures[eq.key] = self.delivery_failures.get(eq.key, 0) + 1
+            if failures <= EQ_DELIVERY_RETRIES:
+                logger.warning(f"⚠️ 地震報告 {eq.eq_no} 全部發送失敗，下一輪重送（第 {failures} 次）")
+                retry_keys.add(eq.key)
+            else:
+                logger.error(f"❌ 地震報告 {eq.eq_no} 重送 {EQ_DELIVERY_RETRIES} 次仍失敗，放棄")
+                self.metrics.inc("quake_alerts_dropped_total")
+                del self.delivery_failures[eq.key]
+
+        processed = [eq for eq in new_reports if eq.key not in retry_keys]
+        self.save_last_eq(self.merge_reports([seeded, processed]), self.next_watermarks(fetched, retry_keys))
+        await self.archive_reports(processed)
+
+        logger.info(f"✅ 地震訊息已發送 ({len(processed)} 筆報告, {len(outbox)} 個頻道)")
+        return True
+
+    async def archive_reports(self, reports):
+        """寫入歷史資料庫；失敗只記錄，不影響輪詢"""
+        try:
+            with self.metrics.timer("archive_seconds", archive="quake", op="add"):
+                await self.archive.add(reports)
+        except Exception as e:
+            logger.error(f"❌ 地震報告寫入歷史資料庫失敗: {e}")
 
-        eq_list = data.get("records", {}).get("Earthquake", [])
-        if not eq_list:
-            logger.info("⏰ Earthquake list 為空")
+    def on_alert_delivered(self, channel_id, eq, future):
+        """送出後記錄地震發生（OriginTime）到訊息送出的端對端延遲；頻道失效就移出快取"""
+        if future.cancelled():
             return
-
-        latest_eq = eq_list[0]
-        eq_no = latest_eq.get("EarthquakeNo")
-        epicenter_info = latest_eq.get("EarthquakeInfo", {}).get("Epicenter", {})
-        location_text = epicenter_info.get("Location", "")
-
-        logger.info(f"⏰ 檢查中：最新地震編號={eq_no}, 震央={location_text}, last_sent={self.last_eq_no}")
-
-        # 判斷是否已發送過
-        if eq_no == self.last_eq_no:
-            logger.info("⚠️ 已發送過此地震訊息，跳過")
+        error = future.exception()
+        if error is not None:
+            if isinstance(error, (discord.NotFound, discord.Forbidden)):
+                self.forget_channel(channel_id)
             return
+        self.metrics.observe(
+            "quake_alert_latency_seconds", (datetime.now(tz) - eq.origin_at).total_seconds(),
+            buckets=QUAKE_LATENCY_BUCKETS,
+        )
 
-        # 取得各城市震度資訊
-        intensity_info = latest_eq.get("Intensity", {}).get("ShakingArea", [])
-        city_intensity = {}
-        
-        for area in intensity_info:
-            county_names = area.get("CountyName", "")
-            area_value = area.get("AreaIntensity")
-            for c in county_names.split("、"):
-                c = c.strip()
-                for target in TARGET_CITIES:
-                    if target.replace("台","臺") == c.replace("台","臺"):
-                        city_intensity[target] = area_value
-        
+    def build_embed(self, eq, counties=TARGET_CITIES):
+        """將一筆地震報告（QuakeReport）轉成 embed，欄位顯示 counties 的震度"""
         # 取得報告顏色
-        report_color_name = latest_eq.get("ReportColor", "綠色")
+        report_color_name = eq.color or "綠色"
         color_map = {
             "綠色": 0x00FF00,
             "黃色": 0xFFFF00,
             "紅色": 0xFF0000
         }
-        embed_color = color_map.get(report_color_name, 0xFF4500)
-        
-        # 取得地震圖
-        report_image = latest_eq.get("ReportImageURI", "")
-        
+        embed_color = color_map.get(report_color_name, 0xFF4500)  # 預設橘色
+
         # 建立 embed 訊息
         embed = discord.Embed(
             title=f"🌏 地震速報 ({report_color_name})",
             description=(
-                f"震央：{location_text}\n"
-                f"規模：{latest_eq.get('EarthquakeInfo', {}).get('EarthquakeMagnitude', {}).get('MagnitudeValue')} "
-                f"{latest_eq.get('EarthquakeInfo', {}).get('EarthquakeMagnitude', {}).get('MagnitudeType')}"
+                f"震央：{eq.location}\n"
+                f"規模：{eq.magnitude_text()}"
             ),
-            url=latest_eq.get("Web", ""),
+            url=eq.web,
             color=embed_color
         )
-        
-        for city in TARGET_CITIES:
-            intensity = city_intensity.get(city, "無感")
-            embed.add_field(name=f"{city}震度", value=intensity, inline=True)
-        
-        if report_image:
-            embed.set_image(url=report_image)
-        
-        embed.set_footer(text=f"來源: 中央氣象署 | 編號 {eq_no}")
-        await channel.send(embed=embed)
-        self.save_last_eq(eq_no)
-
-        # 更新使用量
-        self.usage["count"] += 1
-        self.usage["flow"] += 1
-        self.save_usage()
 
-        logger.info("✅ 地震訊息已發送")
+        for city in counties:
+            intensity = eq.counties.get(normalize_county(city), "無感")
+            embed.add_field(name=f"{city}震度", value=intensity, inline=True)
 
-    @earthquake_loop.before_loop
-    async def before_earthquake_loop(self):
-        logger.info("🔄 Earthquake loop 準備啟動，等待 bot ready...")
-        await self.bot.wait_until_ready()
-        logger.info("🔄 Earthquake loop 已啟動")
+        # 地震圖
+        if eq.image:
+            embed.set_image(url=eq.image)
 
-    @earthquake_loop.error
-    async def earthquake_loop_error(self, error):
-        logger.error(f"❌ Earthquake loop 發生錯誤: {error}")
+        embed.set_footer(text=f"來源: 中央氣象署 | 編號 {eq.eq_no}")
+        return embed
 
     @commands.command(name="eq")
     async def debug_earthquake(self, ctx):
-        """手動測試抓最新地震"""
-        data = await self.fetch_earthquake()
-        if not data:
+        """顯示最新地震（優先使用輪詢快取）"""
+        entry = await self.get_latest_report()
+        if not entry:
             await ctx.send("❌ 未抓到地震資料")
             return
 
-        eq_list = data.get("records", {}).get("Earthquake", [])
-        if not eq_list:
-            await ctx.send("❌ Earthquake list 為空")
-            return
+        await self.bot.dispatcher.send(ctx.channel, "debug", embed=entry["embed"])
+        await self.bot.dispatcher.send(ctx.channel, "debug", f"📊 {self.scheduler.status_text()}")
 
-        latest_eq = eq_list[0]
-        eq_no = latest_eq.get("EarthquakeNo")
-        epicenter_info = latest_eq.get("EarthquakeInfo", {}).get("Epicenter", {})
-        location_text = epicenter_info.get("Location", "")
-
-        # 取得報告顏色
-        report_color_name = latest_eq.get("ReportColor", "綠色")
-
-        # 根據報告顏色設定 embed 顏色
-        color_map = {
-            "綠色": 0x00FF00,
-            "黃色": 0xFFFF00,
-            "紅色": 0xFF0000
-        }
-        embed_color = color_map.get(report_color_name, 0xFF4500)  # 預設橘色
-
-        # 取得各城市震度資訊
-        intensity_info = latest_eq.get("Intensity", {}).get("ShakingArea", [])
-        city_intensity = {}
-
-        for area in intensity_info:
-            county_names = area.get("CountyName", "")
-            area_value = area.get("AreaIntensity")
-            for c in county_names.split("、"):
-                c = c.strip()
-                for target in TARGET_CITIES:
-                    if target.replace("台","臺") == c.replace("台","臺"):
-                        city_intensity[target] = area_value
-
-        # 取得地震圖
-        report_image = latest_eq.get("ReportImageURI", "")
+    @commands.command(name="eqhistory")
+    async def eq_history(self, ctx, *args: str):
+        """查詢本機地震歷史：!eqhistory 新竹市 7d / !eqhistory mag>5 / !eqhistory 花蓮縣 5弱 30d"""
+        try:
+            filters = parse_history_args(args)
+        except ValueError as e:
+            await ctx.send(
+                f"❌ 無法辨識參數 `{e}`，用法：`!eqhistory [縣市] [震度] [7d|24h|2w] [mag>5]`"
+            )
+            return
+        total, rows, elapsed = await self.archive.query(**filters, limit=HISTORY_LIMIT)
+        self.metrics.observe("archive_seconds", elapsed, archive="quake", op="query")
+        if not rows:
+            await ctx.send("📭 歷史資料庫中沒有符合條件的地震")
+            return
 
-        # 建立 embed 訊息
+        county = filters.get("county")
+        lines = []
+        for row in rows:
+            magnitude = f"M{row['magnitude']:.1f}" if row["magnitude"] is not None else "M?"
+            line = f"`{row['origin_time'][:16]}` {magnitude} {row['location']}"
+            if county:
+                line += f"｜{county} {row['county_intensity']}"
+            lines.append(f"[{line}]({row['web']})" if row["web"] else line)
+        conditions = "、".join(args) or "全部"
         embed = discord.Embed(
-            title=f"🌏 地震速報 ({report_color_name})",
-            description=(
-                f"震央：{location_text}\n"
-                f"規模：{latest_eq.get('EarthquakeInfo', {}).get('EarthquakeMagnitude', {}).get('MagnitudeValue')} "
-                f"{latest_eq.get('EarthquakeInfo', {}).get('EarthquakeMagnitude', {}).get('MagnitudeType')}"
-            ),
-            url=latest_eq.get("Web", ""),
-            color=embed_color
+            title=f"🗂️ 地震歷史（{conditions}）",
+            description="\n".join(lines)[:4096],
+            color=0x4682B4,
         )
-
-        for city in TARGET_CITIES:
-            intensity = city_intensity.get(city, "無感")
-            embed.add_field(name=f"{city}震度", value=intensity, inline=True)
-
-        if report_image:
-            embed.set_image(url=report_image)
-
-        embed.set_footer(text=f"來源: 中央氣象署 | 編號 {eq_no}")
-        await ctx.send(embed=embed)
+        embed.set_footer(text=f"共 {total} 筆，顯示最新 {len(rows)} 筆｜本機查詢 {elapsed * 1000:.1f} ms")
+        await self.bot.dispatcher.send(ctx.channel, "debug", embed=embed)
+
+    # ---------- 訂閱管理 ----------
+    @commands.group(name="eqsub", invoke_without_command=True)
+    @commands.has_permissions(manage_guild=True)
+    async def eq_subscription(self, ctx):
+        """地震訂閱：!eqsub add <震度|all> <縣市...> / list / remove <編號>"""
+        await ctx.send("用法：`!eqsub add <震度|all> <縣市...>`、`!eqsub list`、`!eqsub remove <編號>`")
+
+    @eq_subscription.command(name="add")
+    async def eq_subscription_add(self, ctx, min_intensity: str, *counties: str):
+        level = parse_intensity(min_intensity)
+        if not level or not counties:
+            await ctx.send(f"❌ 格式錯誤，震度可用 all 或 {'、'.join(INTENSITY_LEVELS)}")
+            return
+        guild_id = ctx.guild.id if ctx.guild else None
+        sub = self.subscriptions.add(guild_id, ctx.channel.id, counties, level)
+        self.save_subscriptions()
+        await ctx.send(f"✅ 已新增訂閱 #{sub['id']}：{'、'.join(sub['counties'])}（門檻 {level}）")
+
+    @eq_subscription.command(name="list")
+    async def eq_subscription_list(self, ctx):
+        guild_id = ctx.guild.id if ctx.guild else None
+        subs = [sub for sub in self.subscriptions.to_list() if sub["guild_id"] in (guild_id, None)]
+        if not subs:
+            await ctx.send("📭 目前沒有地震訂閱")
+            return
+        lines = [
+            f"#{sub['id']} <#{sub['channel_id']}> {'、'.join(sub['counties'])}（門檻 {sub['min_intensity']}）"
+            for sub in subs
+        ]
+        await ctx.send("\n".join(lines))
+
+    @eq_subscription.command(name="remove")
+    async def eq_subscription_remove(self, ctx, sub_id: int):
+        sub = self.subscriptions.subscriptions.get(sub_id)
+        guild_id = ctx.guild.id if ctx.guild else None
+        if not sub or sub["guild_id"] not in (guild_id, None):
+            await ctx.send(f"❌ 找不到訂閱 #{sub_id}")
+            return
+        self.subscriptions.remove(sub_id)
+        self.save_subscriptions()
+        await ctx.send(f"🗑️ 已移除訂閱 #{sub_id}")
 
 
 async def setup(bot):
-    cog = Earthquake(bot)
-    await bot.add_cog(cog)
-    if not cog.earthquake_loop.is_running():
-        cog.earthquake_loop.start()
+    # 輪詢由 PollerCog.cog_load 啟動
+    await bot.add_cog(Earthquake(bot))
@@ -0,0 +1,68 @@
+import discord
+from discord.ext import commands
+import logging
+from utils.guild_settings import DEFAULT_QUAKE_CITIES
+from utils.quake_subscriptions import INTENSITY_LEVELS, normalize_county, parse_intensity
+
+logger = logging.getLogger(f"discord.{__name__}")
+
+
+class GuildSettings(commands.Cog):
+    """各伺服器設定：通知頻道、地震關注縣市與門檻、公告開關（存於 bot.guild_settings）"""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.store = bot.guild_settings
+        logger.info(f"✅ {self.__class__.__name__} 模組已初始化")
+
+    def describe(self, guild_id):
+        entry = self.store.get(guild_id)
+        channel = f"<#{entry['notify_channel_id']}>" if entry["notify_channel_id"] else "未設定"
+        cities = "、".join(self.store.quake_cities(entry))
+        return (
+            f"通知頻道：{channel}\n"
+            f"地震縣市：{cities}（門檻 {entry['quake_min_intensity']}）\n"
+            f"公告通知：{'開啟' if entry['news'] else '關閉'}"
+        )
+
+    @commands.group(name="guildset", invoke_without_command=True)
+    @commands.guild_only()
+    @commands.has_permissions(manage_guild=True)
+    async def guildset(self, ctx):
+        """!guildset channel <#頻道> / cities <縣市...> / intensity <震度|all> / news <on|off>"""
+        await ctx.send(
+            f"⚙️ 本伺服器設定\n{self.describe(ctx.guild.id)}\n"
+            "用法：`!guildset channel <#頻道>`、`!guildset cities <縣市...>`、"
+            "`!guildset intensity <震度|all>`、`!guildset news <on|off>`"
+        )
+
+    @guildset.command(name="channel")
+    async def guildset_channel(self, ctx, channel: discord.TextChannel):
+        self.store.update(ctx.guild.id, notify_channel_id=channel.id)
+        await ctx.send(f"✅ 通知頻道已設定為 {channel.mention}")
+        logger.info(f"⚙️ 伺服器 {ctx.guild.id} 通知頻道 → {channel.id}")
+
+    @guildset.command(name="cities")
+    async def guildset_cities(self, ctx, *counties: str):
+        cities = [normalize_county(c) for c in counties] or None
+        self.store.update(ctx.guild.id, quake_cities=cities)
+        await ctx.send(f"✅ 地震關注縣市：{'、'.join(cities or DEFAULT_QUAKE_CITIES)}")
+
+    @guildset.command(name="intensity")
+    async def guildset_intensity(self, ctx, min_intensity: str):
+        level = parse_intensity(min_intensity)
+        if not level:
+            await ctx.send(f"❌ 格式錯誤，震度可用 all 或 {'、'.join(INTENSITY_LEVELS)}")
+            return
+        self.store.update(ctx.guild.id, quake_min_intensity=level)
+        await ctx.send(f"✅ 地震通知門檻：{level}")
+
+    @guildset.command(name="news")
+    async def guildset_news(self, ctx, switch: str):
+        enabled = switch.lower() in ("on", "true", "1", "開")
+        self.store.update(ctx.guild.id, news=enabled)
+        await ctx.send(f"✅ 公告通知已{'開啟' if enabled else '關閉'}")
+
+
+async def setup(bot):
+    await bot.add_cog(GuildSettings(bot))
@@ -1,119 +1,283 @@
 import discord
-from discord.ext import commands, tasks
+from discord.ext import commands
 from datetime import datetime
+import asyncio
 import logging
 import os
-import aiohttp
-from bs4 import BeautifulSoup
-import json
 import pytz
+import time
+from urllib.parse import urljoin
+from utils.cache import SeenSet
+from utils.news_archive import NewsArchive
+from utils.news_parser import body_hash, extract_article_text, parse_news_page
+from utils.parse_pool import ParseError
+from utils.poller import PollerCog
 
-CHANNEL_ID = int(os.getenv("NOTIFY_CHANNEL_ID"))
-logger = logging.getLogger("discord")
+CHANNEL_ID = int(os.getenv("NOTIFY_CHANNEL_ID") or 0)  # 舊版全域通知頻道（選用），各伺服器改用 !guildset
+logger = logging.getLogger(f"discord.{__name__}")
 DATA_FILE = "latest_news.json"
+NEWS_URL = os.getenv("NEWS_URL", "https://www.ffxiv.com.tw/web/index.aspx")  # 可覆寫為本機替身伺服器
+NEWS_SITE = urljoin(NEWS_URL, "/").rstrip("/")  # 公告相對連結的網站根目錄
+SEEN_LIMIT = 500          # 已看過集合的上限
+NEWS_FETCH_BODY = os.getenv("NEWS_FETCH_BODY", "1") == "1"                  # 是否補抓公告內文供 !newssearch 搜尋
+NEWS_BODY_CONCURRENCY = int(os.getenv("NEWS_BODY_CONCURRENCY", "2"))        # 同時抓取內文的數量
+NEWS_BODY_BATCH = int(os.getenv("NEWS_BODY_BATCH", "10"))                   # 每次輪詢後最多補抓幾則
+NEWS_BODY_MAX_ATTEMPTS = int(os.getenv("NEWS_BODY_MAX_ATTEMPTS", "3"))      # 內文抓取失敗幾次後放棄
+SEARCH_LIMIT = 8          # !newssearch 最多列出幾筆
 tz = pytz.timezone("Asia/Taipei")
 
 
-class News(commands.Cog):
+class News(PollerCog):
+    source = "news"
+    poll_interval = 60
+
     def __init__(self, bot):
-        self.bot = bot
-        self.latest_url = self.load_latest_url()
+        super().__init__(bot)
+        self.latest_url = None
+        self.seen = SeenSet(max_size=SEEN_LIMIT)  # 已公告過的 URL（雜湊）
+        self.seeded = False  # seen 清單是否已由輪詢用整份首頁清單建立過
+        self._state_doc = None
+        self.load_state()
+        # 條件式請求與內容雜湊：首頁沒變時不重新解析
+        self.etag = None
+        self.last_modified = None
+        self.body_hash = None
+        self.last_result = []
+        # 看過的公告都寫入歷史資料庫（標題 + 內文全文索引），!newssearch 不用重新爬網站
+        self.archive = NewsArchive()
+        self.archived_hash = None   # 最後一次寫入資料庫的首頁內容雜湊
+        self.body_task = None
         logger.info(f"✅ {self.__class__.__name__} 模組已初始化")
 
-    def cog_unload(self):
-        if self.news_loop.is_running():
-            self.news_loop.cancel()
-            logger.info("🛑 News loop 已取消")
+    def load_state(self):
+        """讀取 latest_news.json；檔案沒被外部修改時直接沿用記憶體內容"""
+        doc = self.bot.state.get(DATA_FILE, default={"latest_url": None, "seen": []})
+        if doc is self._state_doc:
+            return
+        self._state_doc = doc
+        self.latest_url = doc.get("latest_url")
+        self.seen = SeenSet(doc.get("seen", []), max_size=SEEN_LIMIT)
+        # 沒有 seeded 欄位的檔案：已有 seen 清單就是輪詢建立的
+        self.seeded = doc.get("seeded", bool(len(self.seen)))
 
-    def load_latest_url(self):
-        if not os.path.exists(DATA_FILE):
-            with open(DATA_FILE, "w", encoding="utf-8") as f:
-                json.dump({"latest_url": None}, f, ensure_ascii=False, indent=2)
-            return None
-        with open(DATA_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            return data.get("latest_url")
+    async def cog_unload(self):
+        await super().cog_unload()
+        if self.body_task and not self.body_task.done():
+            self.body_task.cancel()
+        await asyncio.to_thread(self.archive.close)
 
-    def save_latest_url(self, url):
-        with open(DATA_FILE, "w", encoding="utf-8") as f:
-            json.dump({"latest_url": url}, f, ensure_ascii=False, indent=2)
+    def save_state(self):
+        self.bot.state.update(DATA_FILE, latest_url=self.latest_url, seen=self.seen.to_list(), seeded=self.seeded)
 
-    async def fetch_latest_news(self):
-        url = "https://www.ffxiv.com.tw/web/index.aspx"
+    async def fetch_news(self):
+        """抓取首頁公告清單 [(title, link), ...]（新 → 舊），失敗回傳空清單"""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        start = time.perf_counter()
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url) as resp:
-                    html = await resp.text()
-            soup = BeautifulSoup(html, "html.parser")
-            latest_item = soup.select_one(".nav_news .sub_nav ul li a p")
-            if latest_item:
-                link_tag = latest_item.parent
-                link = link_tag.get("href", "")
-                title = latest_item.get_text(strip=True)
-                if link.startswith("/"):
-                    link = "https://www.ffxiv.com.tw" + link
-                return title, link
+            async with self.fetch_slot(), self.bot.http_session.get(NEWS_URL, headers=headers) as resp:
+                self.metrics.inc("http_responses_total", source="ffxiv", status=resp.status)
+                if resp.status == 304:
+                    self.metrics.inc("cache_requests_total", cache="news_page", result="not_modified")
+                    return self.last_result
+                if resp.status != 200:
+                    logger.error(f"❌ 抓取最新公告失敗，HTTP {resp.status}")
+                    self.mark_failure(f"HTTP {resp.status}")
+                    return []
+                body = await resp.read()
+                charset = resp.charset or "utf-8"
+                self.etag = resp.headers.get("ETag")
+                self.last_modified = resp.headers.get("Last-Modified")
+            self.metrics.observe("http_request_seconds", time.perf_counter() - start, source="ffxiv")
+
+            # 伺服器不支援條件式請求時，內容雜湊相同也跳過解析
+            digest = body_hash(body)
+            if digest == self.body_hash:
+                self.metrics.inc("cache_requests_total", cache="news_page", result="hash_hit")
+                return self.last_result
+            self.metrics.inc("cache_requests_total", cache="news_page", result="miss")
+
+            # BeautifulSoup 解析丟到工作池，首頁再大也不會卡住 event loop
+            items = await self.bot.parse_pool.run("news_page", parse_news_page, body, charset, NEWS_SITE)
+            if items:
+                self.body_hash = digest
+                self.last_result = items
+            return items
+        except ParseError as e:
+            logger.error(f"❌ 解析最新公告失敗: {e}")
+            self.mark_failure(e)
         except Exception as e:
             logger.error(f"❌ 抓取最新公告時發生錯誤: {e}")
-        return None, None
+            self.metrics.inc("http_errors_total", source="ffxiv")
+            self.mark_failure(e)
+        return []
+
+    async def fetch_latest_news(self):
+        items = await self.fetch_news()
+        return items[0] if items else (None, None)
+
+    def build_embed(self, title, url):
+        embed = discord.Embed(
+            title="📰 最新公告",
+            description=title,
+            url=url,
+            color=0xFFD700
+        )
+        embed.set_footer(text="資料來源: FFXIV 繁體中文版官方網站")
+        return embed
+
+    def collect_unseen(self, items):
+        """比對已看過集合，回傳尚未公告的項目（舊 → 新），並標記為已看過"""
+        if not self.seeded:
+            # 第一次使用 seen 清單：目前清單全部視為已看過，只沿用舊版規則判斷最新一則
+            # （用明確的 seeded 旗標判斷，!news 先加入一則網址也不會讓整份清單被當成新公告）
+            unseen = [items[0]] if items[0][1] != self.latest_url else []
+            self.seeded = True
+        else:
+            unseen = [item for item in reversed(items) if item[1] not in self.seen]
+        for _, link in reversed(items):
+            self.seen.add(link)
+        self.latest_url = items[0][1]
+        return unseen
+
+    async def poll(self):
+        return await self.check_news()
+
+    async def check_news(self):
+        """檢查一次首頁公告，有發送新公告回傳 True"""
+        channels = self.target_channels()
+        if not channels:
+            return False
+
+        # 🔄 外部手動修改 JSON 時（mtime 變動）才會重新解析
+        self.load_state()
+
+        items = await self.fetch_news()
+        logger.info(f"⏰ 正在檢查最新公告, 最新 URL={self.latest_url}", extra={"sample": "news_poll"})
+        if not items:
+            return False
 
-    @tasks.loop(minutes=1, reconnect=True)
-    async def news_loop(self):
-        await self.bot.wait_until_ready()
-        channel = self.bot.get_channel(CHANNEL_ID)
-        if not channel:
+        await self.archive_items(items)
+        before = (self.latest_url, len(self.seen), self.seeded)
+        unseen = self.collect_unseen(items)
+        if unseen or (self.latest_url, len(self.seen), self.seeded) != before:
+            self.save_state()
+        if not unseen:
+            return False
+
+        # 由舊到新排入 news lane，dispatcher 會把多則公告合併成一則訊息（每則最多 10 個 embed）
+        embeds = [self.build_embed(title, link) for title, link in unseen]
+        await asyncio.gather(
+            *(self.bot.dispatcher.send(channel, "news", embed=embed) for channel in channels for embed in embeds),
+            return_exceptions=True,
+        )
+        logger.info(f"✅ 發送最新公告 {len(unseen)} 則到 {len(channels)} 個頻道：{[link for _, link in unseen]}")
+        return True
+
+    # ---------- 歷史資料庫 ----------
+    async def archive_items(self, items):
+        """首頁內容有變時寫入資料庫，並在背景補抓還沒有內文的公告；失敗只記錄，不影響輪詢"""
+        if self.body_hash is not None and self.body_hash == self.archived_hash:
             return
-    
-        # 🔄 每次檢查時重新讀 JSON，避免外部手動修改後 bot 不知道
-        self.latest_url = self.load_latest_url()
-    
-        title, latest = await self.fetch_latest_news()
-        logger.info(f"⏰ 正在檢查最新公告, 最新 URL={self.latest_url}")
-    
-        if latest and latest != self.latest_url:
-            self.latest_url = latest
-            self.save_latest_url(latest)
-            embed = discord.Embed(
-                title="📰 最新公告",
-                description=title,
-                url=latest,
-                color=0xFFD700
-            )
-            embed.set_footer(text="資料來源: FFXIV 繁體中文版官方網站")
-            await channel.send(embed=embed)
-            logger.info(f"✅ 發送最新公告：{latest}")
-
-    @news_loop.before_loop
-    async def before_news_loop(self):
-        logger.info(f"🔄 News loop 準備啟動，等待 bot ready...")
-        await self.bot.wait_until_ready()
-        logger.info(f"🔄 News loop 已啟動")
-
-    @news_loop.error
-    async def news_loop_error(self, error):
-        logger.error(f"❌ News loop 發生錯誤: {error}")
+        try:
+            with self.metrics.timer("archive_seconds", archive="news", op="add"):
+                added = await self.archive.add(items, datetime.now(tz).strftime("%Y-%m-%d %H:%M:%S"))
+            self.archived_hash = self.body_hash
+            if added:
+                logger.info(f"🗂️ 公告歷史資料庫新增 {added} 則")
+        except Exception as e:
+            logger.error(f"❌ 公告寫入歷史資料庫失敗: {e}")
+            return
+        if NEWS_FETCH_BODY and (self.body_task is None or self.body_task.done()):
+            self.body_task = asyncio.create_task(self.fetch_bodies())
+
+    async def fetch_bodies(self):
+        """分批補抓內文直到沒有待抓的公告；執行期間新加入的公告也會接著抓，失敗的這一輪不再重試"""
+        limit = asyncio.Semaphore(NEWS_BODY_CONCURRENCY)
+        tried = set()
+        while True:
+            pending = [
+                (news_id, url)
+                for news_id, url in await self.archive.pending(NEWS_BODY_BATCH + len(tried), NEWS_BODY_MAX_ATTEMPTS)
+                if news_id not in tried
+            ][:NEWS_BODY_BATCH]
+            if not pending:
+                return
+            tried.update(news_id for news_id, _ in pending)
+            await asyncio.gather(*(self.fetch_body(limit, news_id, url) for news_id, url in pending))
+
+    async def fetch_body(self, limit, news_id, url):
+        """抓一則公告內文（每則只抓一次，失敗最多重試 NEWS_BODY_MAX_ATTEMPTS 次）"""
+        try:
+            # 只用自己的並行上限，不占 bot.pollers 的 fetch slot，背景補抓不會拖慢地震輪詢
+            async with limit:
+                async with self.bot.http_session.get(url) as resp:
+                    self.metrics.inc("http_responses_total", source="ffxiv_article", status=resp.status)
+                    if resp.status != 200:
+                        raise RuntimeError(f"HTTP {resp.status}")
+                    body = await resp.read()
+                    charset = resp.charset or "utf-8"
+                text = await self.bot.parse_pool.run("news_article", extract_article_text, body, charset)
+            await self.archive.store_body(news_id, text, datetime.now(tz).strftime("%Y-%m-%d %H:%M:%S"))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"⚠️ 公告內文抓取失敗 {url}: {e}")
+            self.metrics.inc("http_errors_total", source="ffxiv_article")
+            await self.archive.body_failed(news_id)
+
+    def target_channels(self):
+        """開啟公告通知、且在本行程分片上的伺服器頻道（加上舊版 NOTIFY_CHANNEL_ID）"""
+        targets = [(None, CHANNEL_ID)] if CHANNEL_ID else []
+        targets += self.bot.guild_settings.news_channels()
+        channels = {}
+        for guild_id, channel_id in targets:
+            if not self.is_local_guild(guild_id):
+                continue
+            channel = self.get_cached_channel(channel_id)
+            if channel is not None:
+                channels[channel_id] = channel
+        return list(channels.values())
 
     @commands.command(name="news")
     async def debug_news(self, ctx):
         title, latest = await self.fetch_latest_news()
         if latest:
-            if latest != self.latest_url:
+            if latest not in self.seen:
+                self.seen.add(latest)
                 self.latest_url = latest
-                self.save_latest_url(latest)
-            embed = discord.Embed(
-                title="📰 最新公告",
-                description=title,
-                url=latest,
-                color=0xFFD700
-            )
-            embed.set_footer(text="資料來源: FFXIV 繁體中文版官方網站")
-            await ctx.send(embed=embed)
+                self.save_state()
+            await self.bot.dispatcher.send(ctx.channel, "debug", embed=self.build_embed(title, latest))
         else:
             await ctx.send("❌ 沒找到最新公告")
 
 
+    @commands.command(name="newssearch")
+    async def news_search(self, ctx, *, keywords: str):
+        """搜尋公告歷史（標題與內文）：!newssearch 維護 / !newssearch 臨時維護 補償"""
+        total, rows, elapsed = await self.archive.query(keywords, limit=SEARCH_LIMIT)
+        self.metrics.observe("archive_seconds", elapsed, archive="news", op="query")
+        if not rows:
+            await ctx.send(f"📭 公告歷史中找不到「{keywords}」")
+            return
+        lines = []
+        for row in rows:
+            line = f"`{row['first_seen'][:10]}` [{row['title']}]({row['url']})"
+            if row["excerpt"]:
+                line += f"\n　{row['excerpt']}"
+            lines.append(line)
+        embed = discord.Embed(
+            title=f"🔎 公告搜尋：{keywords}",
+            description="\n".join(lines)[:4096],
+            color=0xFFD700,
+        )
+        embed.set_footer(text=f"共 {total} 則，顯示最相關的 {len(rows)} 則｜本機查詢 {elapsed * 1000:.1f} ms")
+        await self.bot.dispatcher.send(ctx.channel, "debug", embed=embed)
+
+
 async def setup(bot):
-    cog = News(bot)
-    await bot.add_cog(cog)
-    if not cog.news_loop.is_running():
-        cog.news_loop.start()
+    # 輪詢由 PollerCog.cog_load 啟動
+    await bot.add_cog(News(bot))
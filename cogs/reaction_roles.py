@@ -1,53 +1,141 @@
 import discord
+import asyncio
 import os
 import logging
 import traceback
 from discord.ext import commands
+from utils.role_queue import RoleAssignmentQueue
+from utils.role_sync import RoleReconciler
 
 
 
-# 從 .env 讀取設定並轉型成 int
-SERVER_ID = int(os.getenv("SERVER_ID"))
-CHANNEL_ID = int(os.getenv("WELCOME_CHANNEL_ID"))
-MESSAGE_ID = int(os.getenv("REACTION_ROLES_MESSAGE_ID"))
-logger = logging.getLogger("discord")
+# 從 .env 讀取設定（只在沒有 reaction_roles.json 時當作預設綁定）
+SERVER_ID = int(os.getenv("SERVER_ID") or 0)
+CHANNEL_ID = int(os.getenv("WELCOME_CHANNEL_ID") or 0)
+MESSAGE_ID = int(os.getenv("REACTION_ROLES_MESSAGE_ID") or 0)
+CONFIG_FILE = "reaction_roles.json"
+ROLE_DEBOUNCE = float(os.getenv("ROLE_DEBOUNCE", "1.5"))  # 同一成員靜止多久後才送出變更
+ROLE_WORKERS = int(os.getenv("ROLE_WORKERS", "2"))         # 同時送出的身分組請求上限
+logger = logging.getLogger(f"discord.{__name__}")
 
-# 表情 → 角色對應
+# 預設的表情 → 角色對應
 REACTIONROLE_MAP = {
     ("FF_01", 1403316910518435850): 1405806092121931858,
     ("FF_02", 1403321377561378837): 1405806687926878220,
     ("FF_03", 1403321429310832670): 1405806808047681586,
 }
 
+
+def default_bindings():
+    if not MESSAGE_ID:
+        return []
+    return [
+        {
+            "guild_id": SERVER_ID,
+            "channel_id": CHANNEL_ID,
+            "message_id": MESSAGE_ID,
+            "emoji_name": name,
+            "emoji_id": emoji_id,
+            "role_id": role_id,
+        }
+        for (name, emoji_id), role_id in REACTIONROLE_MAP.items()
+    ]
+
+
+def build_index(bindings):
+    """message_id -> {"guild_id", "channel_id", "roles": {(emoji_name, emoji_id): role_id}}"""
+    index = {}
+    for b in bindings:
+        entry = index.setdefault(b["message_id"], {
+            "guild_id": b["guild_id"],
+            "channel_id": b["channel_id"],
+            "roles": {},
+        })
+        entry["roles"][(b["emoji_name"], b["emoji_id"])] = b["role_id"]
+    return index
+
+
 class ReactionRoles(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.role_queue = None
+        self.reconciler = None
+        self.startup_sync_done = False
+        self.bindings = []
+        self.index = {}
+        self.load_bindings()
         logger.info(f"✅ {self.__class__.__name__} 模組已初始化")
 
+    async def cog_load(self):
+        # 大量成員同時切換表情時，合併成每人一次 member.edit，並限制並行數
+        self.role_queue = RoleAssignmentQueue(self.bot, debounce=ROLE_DEBOUNCE, workers=ROLE_WORKERS)
+        self.reconciler = RoleReconciler(self.bot, self.role_queue)
+
+    def cog_unload(self):
+        if self.role_queue:
+            self.role_queue.close()
+            logger.info("🛑 身分組佇列已停止")
+
+    # ---------- 綁定設定 ----------
+    def load_bindings(self):
+        if self.bot.state.exists(CONFIG_FILE):
+            bindings = self.bot.state.get(CONFIG_FILE).get("bindings", [])
+        else:
+            bindings = default_bindings()
+        self.swap_bindings(bindings)
+
+    def swap_bindings(self, bindings):
+        """先建好新索引再一次替換，事件處理永遠只會看到完整的索引"""
+        index = build_index(bindings)
+        self.bindings = bindings
+        self.index = index
+        logger.info(f"🔖 身分組綁定已載入：{len(index)} 則訊息、{len(bindings)} 個表情")
+
+    def save_bindings(self, bindings):
+        self.bot.state.set(CONFIG_FILE, {"bindings": bindings})
+        self.swap_bindings(bindings)
+
+    def resolve_role(self, payload: discord.RawReactionActionEvent):
+        """回傳 (guild_id, role_id)，非綁定訊息或表情回傳 None（無關的反應只會查一次 dict）"""
+        entry = self.index.get(payload.message_id)
+        if entry is None:
+            return None
+        role_id = entry["roles"].get((payload.emoji.name, payload.emoji.id))
+        if role_id is None:
+            return None
+        return entry["guild_id"], role_id
+
     @commands.Cog.listener()
-    async def on_raw_reaction_add(self, payload: discord.RawReactionActionEvent):
+    async def on_ready(self):
+        """上線後補正一次離線期間的表情變動（只補發，不移除；上次中斷則續跑）"""
+        if self.startup_sync_done or not self.index:
+            return
+        self.startup_sync_done = True
+        checkpoint = self.reconciler.load_checkpoint()
+        if not checkpoint.get("finished") and checkpoint.get("remove_missing"):
+            # 中斷的是 !rr sync full：自動續跑會移除身分組，保留進度留給管理員用 !rr sync resume 決定
+            logger.warning("⚠️ 上次的完整補正（含移除）未完成，啟動時不自動續跑，請使用 !rr sync resume")
+            return
+        asyncio.create_task(self.run_sync(resume=True))
+
+    async def run_sync(self, remove_missing=False, resume=False, progress=None):
         try:
-            if payload.message_id != MESSAGE_ID or payload.channel_id != CHANNEL_ID:
-                return
-
-            emoji_key = (payload.emoji.name, payload.emoji.id)
-            role_id = REACTIONROLE_MAP.get(emoji_key)
-
-            if role_id:
-                guild = self.bot.get_guild(SERVER_ID)
-                if not guild:
-                    return
-
-                try:
-                    member = guild.get_member(payload.user_id) or await guild.fetch_member(payload.user_id)
-                except discord.NotFound:
-                    return
-
-                role = guild.get_role(role_id)
+            await self.reconciler.run(self.index, remove_missing=remove_missing, resume=resume, progress=progress)
+        except Exception as e:
+            logger.error(f"❌ 身分組補正發生錯誤: {e}")
+            traceback.print_exc()
 
-                if role and member and not member.bot:
-                    await member.add_roles(role)
-                    logger.info(f"➕ 已分配身分組 {role.name} 給 {member.display_name}")
+    @commands.Cog.listener()
+    async def on_raw_reaction_add(self, payload: discord.RawReactionActionEvent):
+        try:
+            target = self.resolve_role(payload)
+            if target and payload.user_id != self.bot.user.id:
+                guild_id, role_id = target
+                if payload.member is not None:
+                    # 事件本身就帶有成員資料，放進 LRU 省下之後的查詢
+                    self.bot.member_cache.remember(payload.member)
+                self.role_queue.request(guild_id, payload.user_id, role_id, add=True)
+                logger.debug(f"➕ 排入身分組 {role_id} 給 {payload.user_id}")
 
         except Exception as e:
             logger.error(f"分配身分組時發生錯誤: {e}")
@@ -56,32 +144,90 @@ class ReactionRoles(commands.Cog):
     @commands.Cog.listener()
     async def on_raw_reaction_remove(self, payload: discord.RawReactionActionEvent):
         try:
-            if payload.message_id != MESSAGE_ID or payload.channel_id != CHANNEL_ID:
-                return
-
-            emoji_key = (payload.emoji.name, payload.emoji.id)
-            role_id = REACTIONROLE_MAP.get(emoji_key)
-
-            if role_id:
-                guild = self.bot.get_guild(SERVER_ID)
-                if not guild:
-                    return
-
-                try:
-                    member = guild.get_member(payload.user_id) or await guild.fetch_member(payload.user_id)
-                except discord.NotFound:
-                    return
-
-                role = guild.get_role(role_id)
-
-                if role and member:
-                    await member.remove_roles(role)
-                    logger.info(f"➖ 已移除身分組 {role.name} 從 {member.display_name}")
+            target = self.resolve_role(payload)
+            if target:
+                guild_id, role_id = target
+                self.role_queue.request(guild_id, payload.user_id, role_id, add=False)
+                logger.debug(f"➖ 排入移除身分組 {role_id} 從 {payload.user_id}")
 
         except Exception as e:
             logger.error(f"移除身分組發生錯誤: {e}")
             traceback.print_exc()
 
+    # ---------- 管理指令 ----------
+    @commands.group(name="rr", invoke_without_command=True)
+    @commands.guild_only()  # 子指令都用到 ctx.guild，私訊中直接拒絕
+    @commands.has_permissions(manage_roles=True)
+    async def reaction_roles_group(self, ctx):
+        await ctx.send(
+            "用法：`!rr list`、`!rr reload`、`!rr bind <#頻道> <訊息ID> <表情> <@身分組>`、`!rr unbind <訊息ID> <表情>`、"
+            "`!rr sync [full|resume|status]`"
+        )
+
+    @reaction_roles_group.command(name="sync")
+    async def reaction_roles_sync(self, ctx, mode: str = ""):
+        """比對表情與身分組並補正差異；full 連同沒按表情的人一起移除，resume 從上次中斷處繼續"""
+        if mode == "status":
+            await ctx.send(self.reconciler.status_text())
+            return
+        if self.reconciler.running:
+            await ctx.send("⚠️ 補正已在執行中，可用 `!rr sync status` 查看進度")
+            return
+        status = await ctx.send("🔄 身分組補正開始...")
+        await self.run_sync(remove_missing=(mode == "full"), resume=(mode == "resume"),
+                            progress=lambda text: status.edit(content=text))
+
+    @reaction_roles_group.command(name="list")
+    async def reaction_roles_list(self, ctx):
+        bindings = [b for b in self.bindings if b["guild_id"] == ctx.guild.id]
+        if not bindings:
+            await ctx.send("📭 目前沒有身分組綁定")
+            return
+        lines = [
+            f"訊息 {b['message_id']} (<#{b['channel_id']}>)：{b['emoji_name']} → <@&{b['role_id']}>"
+            for b in bindings
+        ]
+        await ctx.send("\n".join(lines), allowed_mentions=discord.AllowedMentions.none())
+
+    @reaction_roles_group.command(name="reload")
+    async def reaction_roles_reload(self, ctx):
+        """重新讀取 reaction_roles.json（外部修改後不必重啟或 !re）"""
+        self.load_bindings()
+        await ctx.send(f"🔄 已重新載入 {len(self.index)} 則訊息、{len(self.bindings)} 個表情綁定")
+
+    @reaction_roles_group.command(name="bind")
+    async def reaction_roles_bind(self, ctx, channel: discord.TextChannel, message_id: int, emoji: str,
+                                  role: discord.Role):
+        partial = discord.PartialEmoji.from_str(emoji)
+        bindings = [
+            b for b in self.bindings
+            if not (b["message_id"] == message_id and (b["emoji_name"], b["emoji_id"]) == (partial.name, partial.id))
+        ]
+        bindings.append({
+            "guild_id": ctx.guild.id,
+            "channel_id": channel.id,
+            "message_id": message_id,
+            "emoji_name": partial.name,
+            "emoji_id": partial.id,
+            "role_id": role.id,
+        })
+        self.save_bindings(bindings)
+        await ctx.send(f"✅ 已綁定 {emoji} → {role.name}（訊息 {message_id}）")
+
+    @reaction_roles_group.command(name="unbind")
+    async def reaction_roles_unbind(self, ctx, message_id: int, emoji: str):
+        partial = discord.PartialEmoji.from_str(emoji)
+        bindings = [
+            b for b in self.bindings
+            if not (b["guild_id"] == ctx.guild.id and b["message_id"] == message_id
+                    and (b["emoji_name"], b["emoji_id"]) == (partial.name, partial.id))
+        ]
+        if len(bindings) == len(self.bindings):
+            await ctx.send("❌ 找不到這個綁定")
+            return
+        self.save_bindings(bindings)
+        await ctx.send(f"🗑️ 已解除綁定 {emoji}（訊息 {message_id}）")
+
 # Cog 載入入口
 async def setup(bot):
     await bot.add_cog(ReactionRoles(bot))
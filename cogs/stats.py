@@ -0,0 +1,115 @@
+import discord
+from discord.ext import commands
+import logging
+import os
+
+logger = logging.getLogger(f"discord.{__name__}")
+
+
+def current_rss_mb():
+    """目前常駐記憶體（Linux 讀 /proc，其他平台回傳 None）"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def format_seconds(value):
+    if value is None:
+        return "-"
+    return f"{value * 1000:.0f}ms" if value < 1 else f"{value:.1f}s"
+
+
+def format_labels(labels):
+    return ",".join(str(v) for _, v in sorted(labels.items()))
+
+
+class Stats(commands.Cog):
+    """Bot 執行狀態"""
+
+    def __init__(self, bot):
+        self.bot = bot
+        logger.info(f"✅ {self.__class__.__name__} 模組已初始化")
+
+    @commands.Cog.listener()
+    async def on_raw_member_remove(self, payload: discord.RawMemberRemoveEvent):
+        self.bot.member_cache.forget(payload.guild_id, payload.user.id)
+
+    @commands.command(name="stats")
+    async def stats_command(self, ctx):
+        """顯示成員快取、記憶體、延遲分佈與計數"""
+        cache = self.bot.member_cache.stats()
+        cached_members = sum(len(g.members) for g in self.bot.guilds)
+        total_members = sum(g.member_count or 0 for g in self.bot.guilds)
+        rss = current_rss_mb()
+
+        embed = discord.Embed(title="📊 Bot 狀態", color=0x5865F2)
+        embed.add_field(
+            name="成員快取",
+            value=(
+                f"模式：{self.bot.member_cache_mode}\n"
+                f"discord.py 快取：{cached_members} / {total_members} 人\n"
+                f"LRU：{cache['size']} / {cache['capacity']}\n"
+                f"命中率：{cache['hit_rate']:.1%}（{cache['hits']} / {cache['hits'] + cache['misses']}）\n"
+                f"查詢次數：{cache['lookups']}"
+            ),
+            inline=False,
+        )
+        if rss is not None:
+            embed.add_field(name="記憶體", value=f"RSS {rss:.1f} MB", inline=False)
+        if isinstance(self.bot, commands.AutoShardedBot):
+            shards = "、".join(f"#{sid} {shard.latency * 1000:.0f}ms" for sid, shard in sorted(self.bot.shards.items()))
+            embed.add_field(
+                name="分片",
+                value=f"共 {self.bot.shard_count} 個，本行程 {len(self.bot.guilds)} 個伺服器：{shards}",
+                inline=False,
+            )
+        health = self.bot.pollers.health()
+        if health:
+            embed.add_field(name="輪詢來源", value="\n".join(h.status_text() for h in health), inline=False)
+        dispatch = self.bot.dispatcher.stats()
+        pending = "、".join(f"{lane} {count}" for lane, count in dispatch["pending"].items()) or "無"
+        embed.add_field(
+            name="訊息派送",
+            value=f"已送出 {dispatch['sent']} 則｜合併 {dispatch['coalesced']} 則｜排隊中：{pending}",
+            inline=False,
+        )
+        parse = self.bot.parse_pool.stats()
+        embed.add_field(
+            name="解析工作池",
+            value=(
+                f"{parse['mode']} × {parse['workers']}｜執行中 {parse['in_flight']}｜完成 {parse['completed']}｜"
+                f"過大拒絕 {parse['rejected']}｜逾時 {parse['timeouts']}"
+            ),
+            inline=False,
+        )
+        pipeline = getattr(self.bot, "log_pipeline", None)
+        if pipeline is not None:
+            logs = pipeline.stats()
+            embed.add_field(
+                name="日誌",
+                value=f"佇列 {logs['queued']}｜合併略過 {logs['suppressed']}｜佇列滿丟棄 {logs['dropped']}",
+                inline=False,
+            )
+
+        metrics = self.bot.metrics
+        latency_lines = [
+            f"`{name}[{format_labels(labels)}]` n={count} "
+            f"p50 {format_seconds(p50)} / p95 {format_seconds(p95)} / p99 {format_seconds(p99)}"
+            for name, labels, count, p50, p95, p99 in metrics.summary()
+        ]
+        if latency_lines:
+            embed.add_field(name="延遲", value="\n".join(latency_lines)[:1024], inline=False)
+        counter_lines = [
+            f"`{name}[{format_labels(dict(labels))}]` {value}"
+            for (name, labels), value in metrics.counter_values().items()
+        ]
+        if counter_lines:
+            embed.add_field(name="計數", value="\n".join(counter_lines)[:1024], inline=False)
+        await ctx.send(embed=embed)
+
+
+async def setup(bot):
+    await bot.add_cog(Stats(bot))
@@ -0,0 +1,91 @@
+"""一次性匯入歷史地震報告到 EQ_ARCHIVE_FILE（!eqhistory 使用的資料庫）
+
+從已下載的氣象署 JSON 檔匯入：
+    python eq_backfill.py files E-A0015-001_2023.json E-A0016-001_2023.json
+從氣象署 API 分頁抓取（會消耗 CWA 額度，建議在 Bot 停機時執行）：
+    python eq_backfill.py api --since 2024-01-01 [--until 2024-12-31] [--page 100]
+
+已存在的報告會略過，可以重複執行。
+"""
+import argparse
+import asyncio
+import sys
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from cogs.earthquake import API_KEY, CWA_API_BASE, EQ_DATASETS
+from utils.cwa_parser import decode_reports, loads, parse_reports
+from utils.http import create_http_session
+from utils.quake_archive import EQ_ARCHIVE_FILE, QuakeArchive
+
+
+def import_files(archive, paths):
+    added = 0
+    for path in paths:
+        with open(path, "rb") as f:
+            body = f.read()
+        # 也接受直接存成報告清單的檔案
+        data = loads(body)
+        reports, rejected = parse_reports(data) if isinstance(data, list) else decode_reports(body)
+        count = archive.add_many(reports)
+        print(f"📥 {path}：{len(reports)} 筆，新增 {count} 筆" + (f"，略過格式錯誤 {rejected} 筆" if rejected else ""))
+        added += count
+    return added
+
+
+async def import_api(archive, since, until=None, page=100):
+    if not API_KEY:
+        raise SystemExit("❌ 需要設定 CWA_API_KEY")
+    added = 0
+    session = create_http_session()
+    try:
+        for dataset in EQ_DATASETS:
+            offset = 0
+            while True:
+                params = {
+                    "Authorization": API_KEY, "sort": "OriginTime", "limit": str(page), "offset": str(offset),
+                    "timeFrom": f"{since}T00:00:00",
+                }
+                if until:
+                    params["timeTo"] = f"{until}T23:59:59"
+                async with session.get(f"{CWA_API_BASE}/{dataset}", params=params) as resp:
+                    if resp.status != 200:
+                        raise SystemExit(f"❌ {dataset} HTTP {resp.status}")
+                    reports, rejected = decode_reports(await resp.read())
+                count = archive.add_many(reports)
+                print(f"📥 {dataset} offset {offset}：{len(reports)} 筆，新增 {count} 筆")
+                added += count
+                if len(reports) + rejected < page:
+                    break
+                offset += page
+    finally:
+        await session.close()
+    return added
+
+
+def main():
+    parser = argparse.ArgumentParser(description="匯入歷史地震報告")
+    sub = parser.add_subparsers(dest="source", required=True)
+    files = sub.add_parser("files", help="從氣象署 JSON 檔匯入")
+    files.add_argument("paths", nargs="+")
+    api = sub.add_parser("api", help="從氣象署 API 分頁抓取")
+    api.add_argument("--since", required=True, help="起始日期 YYYY-MM-DD")
+    api.add_argument("--until", help="結束日期 YYYY-MM-DD")
+    api.add_argument("--page", type=int, default=100, help="每次請求筆數")
+    args = parser.parse_args()
+
+    archive = QuakeArchive()
+    try:
+        if args.source == "files":
+            added = import_files(archive, args.paths)
+        else:
+            added = asyncio.run(import_api(archive, args.since, args.until, args.page))
+        print(f"✅ 共新增 {added} 筆，{EQ_ARCHIVE_FILE} 目前 {archive.count()} 筆")
+    finally:
+        archive.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
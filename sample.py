@@ -2,6 +2,7 @@ import discord
 from discord.ext import commands
 import logging
 import os
+from utils.poller import PollerCog
 
 CHANNEL_ID = int(os.getenv("LAB_CHANNEL_ID"))
 # 從 .env 讀取設定並轉型成 int
@@ -9,8 +10,8 @@ GUILD_ID = int(os.getenv("LAB_GUILD_ID"))
 CHANNEL_ID = int(os.getenv("LAB_CHANNEL_ID"))
 MESSAGE_ID = int(os.getenv("LAB_MESSAGE_ID"))
 
-# 建立 logger
-logger = logging.getLogger("discord")
+# 建立 logger（每個 cog 一個名稱，JSON 日誌會帶 cog 欄位）
+logger = logging.getLogger(f"discord.{__name__}")
 logger.setLevel(logging.INFO)
 
 class TemplateCog(commands.Cog):
@@ -38,7 +39,43 @@ class TemplateCog(commands.Cog):
         await ctx.send("🏓 Pong!")
         logger.info(f"指令 ping 被 {ctx.author} 呼叫")
 
+class TemplatePoller(PollerCog):
+    """輪詢型模組模板：只需設定 source / poll_interval 並實作 poll()
+
+    等待 bot ready、錯開起始時間、不重疊執行、斷路器與指標都由 PollerCog 處理，
+    不需要自己寫 tasks.loop / before_loop / error / cog_unload。
+    """
+
+    source = "template"
+    poll_interval = 300
+
+    def __init__(self, bot: commands.Bot):
+        super().__init__(bot)
+        self.last_seen = None
+        logger.info(f"✅ {self.__class__.__name__} 模組已初始化")
+
+    async def poll(self):
+        """抓取一次資料，有新內容並已發送回傳 True"""
+        try:
+            async with self.fetch_slot(), self.bot.http_session.get("https://example.com/feed") as resp:
+                if resp.status != 200:
+                    self.mark_failure(f"HTTP {resp.status}")
+                    return False
+                data = await resp.text()
+        except Exception as e:
+            self.mark_failure(e)
+            return False
+
+        if data == self.last_seen:
+            return False
+        self.last_seen = data
+        channel = self.get_cached_channel(CHANNEL_ID)
+        if channel:
+            await self.bot.dispatcher.send(channel, "news", "📢 有新內容")
+        return True
+
 # Cog 載入函式
 async def setup(bot: commands.Bot):
     await bot.add_cog(TemplateCog(bot))
     logger.info(f"📦 {TemplateCog.__name__} 已加入 Bot")
+    # 輪詢型模組：await bot.add_cog(TemplatePoller(bot))（輪詢由 cog_load 自動啟動）
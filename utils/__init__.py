@@ -0,0 +1 @@
+# 共用工具模組（非 Cog，bot.py 不會當成擴充載入）
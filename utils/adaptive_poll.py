@@ -0,0 +1,150 @@
+import random
+import time
+from datetime import datetime, timedelta
+
+
+class AdaptivePollScheduler:
+    """依每日額度動態調整輪詢間隔
+
+    - 每一次真正送出的 API 請求都計入次數與位元組（usage 的 count / flow）
+    - 額度換算出「平均每次可用間隔」作為基準，間隔不會低於此值以免提前用完額度
+      （一次輪詢送出 requests_per_poll 個請求，例如同時抓兩個資料集，基準間隔隨之加倍）
+    - 剛抓到新報告後的一段時間內以最短間隔輪詢（後續報告、修正報告常成串出現）
+    - 資料沒變或 API 出錯時逐步拉長間隔，並加上抖動避免與其他客戶端同步
+    """
+
+    def __init__(
+        self,
+        tz,
+        daily_quota: int,
+        daily_bytes: int = 0,
+        min_interval: float = 2.0,
+        quiet_interval: float = 10.0,
+        max_interval: float = 120.0,
+        burst_window: float = 600.0,
+        jitter: float = 0.1,
+        usage: dict = None,
+        requests_per_poll: int = 1,
+    ):
+        self.tz = tz
+        self.daily_quota = daily_quota          # 每日請求次數上限（0 = 不限）
+        self.daily_bytes = daily_bytes          # 每日下載位元組上限（0 = 不限）
+        self.min_interval = min_interval        # 新報告後的最短間隔
+        self.quiet_interval = quiet_interval    # 資料沒變時最多退避到的間隔
+        self.max_interval = max_interval        # 連續錯誤時最多退避到的間隔
+        self.burst_window = burst_window        # 新報告後維持最短間隔的秒數
+        self.jitter = jitter
+        self.requests_per_poll = max(requests_per_poll, 1)  # 每次輪詢實際送出的請求數
+        self.usage = usage or {"date": "", "count": 0, "flow": 0}
+        self.quiet_streak = 0
+        self.error_streak = 0
+        self.last_new_report = None             # monotonic 時間
+        self.current_interval = min_interval
+        self.roll_day()
+
+    # ---------- 額度 ----------
+    def roll_day(self) -> bool:
+        """跨日時重置使用量，有重置回傳 True"""
+        today = datetime.now(self.tz).strftime("%Y-%m-%d")
+        if self.usage.get("date") != today:
+            self.usage = {"date": today, "count": 0, "flow": 0}
+            return True
+        return False
+
+    def record_request(self, nbytes: int = 0):
+        """每次送出 API 請求後呼叫（不論成功與否）"""
+        self.roll_day()
+        self.usage["count"] = self.usage.get("count", 0) + 1
+        self.usage["flow"] = self.usage.get("flow", 0) + nbytes
+
+    def remaining_requests(self):
+        if not self.daily_quota:
+            return None
+        return max(self.daily_quota - self.usage.get("count", 0), 0)
+
+    def remaining_bytes(self):
+        if not self.daily_bytes:
+            return None
+        return max(self.daily_bytes - self.usage.get("flow", 0), 0)
+
+    def seconds_left_today(self) -> float:
+        now = datetime.now(self.tz)
+        tomorrow = (now + timedelta(days=1)).date()
+        midnight = self.tz.localize(datetime.combine(tomorrow, datetime.min.time()))
+        return max((midnight - now).total_seconds(), 1.0)
+
+    def budget_interval(self) -> float:
+        """以剩餘額度平均分配到今天剩下的時間，得出可持續的最短輪詢間隔"""
+        seconds_left = self.seconds_left_today()
+        interval = 0.0
+
+        remaining = self.remaining_requests()
+        if remaining is not None:
+            polls = remaining / self.requests_per_poll
+            if polls < 1:
+                return seconds_left
+            interval = max(interval, seconds_left / polls)
+
+        remaining_bytes = self.remaining_bytes()
+        if remaining_bytes is not None:
+            count = self.usage.get("count", 0)
+            avg_bytes = self.usage.get("flow", 0) / count if count else 0
+            if avg_bytes:
+                affordable = remaining_bytes / (avg_bytes * self.requests_per_poll)
+                if affordable < 1:
+                    return seconds_left
+                interval = max(interval, seconds_left / affordable)
+
+        return interval
+
+    # ---------- 間隔計算 ----------
+    def on_result(self, new_report: bool = False, error: bool = False) -> float:
+        """回報本次輪詢結果，回傳下一次應等待的秒數"""
+        if error:
+            self.error_streak += 1
+        else:
+            self.error_streak = 0
+            if new_report:
+                self.quiet_streak = 0
+                self.last_new_report = time.monotonic()
+            else:
+                self.quiet_streak += 1
+
+        self.current_interval = self.next_interval()
+        return self.current_interval
+
+    def in_burst(self) -> bool:
+        return (
+            self.last_new_report is not None
+            and time.monotonic() - self.last_new_report < self.burst_window
+        )
+
+    def next_interval(self) -> float:
+        floor = max(self.min_interval, self.budget_interval())
+
+        if self.error_streak:
+            # 指數退避：2、4、8... 倍，最多 max_interval
+            interval = self.min_interval * (2 ** min(self.error_streak, 10))
+            interval = min(max(interval, floor), max(self.max_interval, floor))
+        elif self.in_burst():
+            interval = floor
+        else:
+            # 資料沒變時緩慢拉長，最多 quiet_interval
+            interval = self.min_interval * (1.25 ** min(self.quiet_streak, 20))
+            interval = min(max(interval, floor), max(self.quiet_interval, floor))
+
+        spread = interval * self.jitter
+        return max(self.min_interval, interval + random.uniform(-spread, spread))
+
+    def rate_per_minute(self) -> float:
+        return 60.0 / self.current_interval if self.current_interval else 0.0
+
+    def status_text(self) -> str:
+        remaining = self.remaining_requests()
+        remaining_text = "不限" if remaining is None else f"{remaining}/{self.daily_quota}"
+        flow_kb = self.usage.get("flow", 0) / 1024
+        mode = "錯誤退避" if self.error_streak else ("密集" if self.in_burst() else "一般")
+        return (
+            f"輪詢間隔 {self.current_interval:.1f}s（約 {self.rate_per_minute():.1f} 次/分，{mode}）｜"
+            f"今日請求 {self.usage.get('count', 0)} 次、{flow_kb:.0f} KB｜剩餘額度 {remaining_text}"
+        )
@@ -0,0 +1,89 @@
+import asyncio
+import hashlib
+import time
+
+
+class TTLCache:
+    """簡單的 TTL 快取，另外記住最後一次寫入的 key（取「最新一筆」用）"""
+
+    def __init__(self, ttl: float, max_size: int = 128):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._data = {}  # key -> (expires_at, value)，dict 依插入順序
+        self.latest_key = None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        item = self._data.get(key)
+        if item is None or item[0] < time.monotonic():
+            self.misses += 1
+            return None
+        self.hits += 1
+        return item[1]
+
+    def set(self, key, value, ttl: float = None):
+        self._data.pop(key, None)
+        self._data[key] = (time.monotonic() + (ttl or self.ttl), value)
+        self.latest_key = key
+        while len(self._data) > self.max_size:
+            self._data.pop(next(iter(self._data)))
+
+    def latest(self):
+        return self.get(self.latest_key) if self.latest_key is not None else None
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SeenSet:
+    """有上限的「已看過」集合：O(1) 查詢，超過上限時淘汰最久沒出現的項目
+
+    只存 URL 等字串的短雜湊，方便直接序列化到 JSON。
+    """
+
+    def __init__(self, items=(), max_size: int = 500):
+        self.max_size = max_size
+        self._items = {}  # dict 當作有序集合使用
+        for item in items:
+            self._items[item] = None
+        self._trim()
+
+    @staticmethod
+    def key(value: str) -> str:
+        return hashlib.blake2b(value.encode("utf-8"), digest_size=8).hexdigest()
+
+    def __contains__(self, value: str) -> bool:
+        return self.key(value) in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+    def add(self, value: str):
+        key = self.key(value)
+        self._items.pop(key, None)  # 再次出現就移到最新
+        self._items[key] = None
+        self._trim()
+
+    def _trim(self):
+        while len(self._items) > self.max_size:
+            self._items.pop(next(iter(self._items)))
+
+    def to_list(self):
+        return list(self._items)
+
+
+class SingleFlight:
+    """同一個 key 同時只會有一個請求在跑，其他呼叫者等待同一個結果"""
+
+    def __init__(self):
+        self._inflight = {}
+
+    async def do(self, key, func, *args, **kwargs):
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func(*args, **kwargs))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # shield：單一呼叫者被取消時不影響其他等待者
+        return await asyncio.shield(task)
@@ -0,0 +1,54 @@
+import json
+
+from utils.quake_report import MalformedReport, QuakeReport
+
+# 有安裝 orjson 時改用它解碼（快數倍），沒有就用標準函式庫
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_BACKEND = "orjson" if orjson else "json"
+
+
+class MalformedPayload(ValueError):
+    """API 回應不是預期的 records.Earthquake 結構"""
+
+
+def loads(body):
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+def decode_reports(body: bytes):
+    """氣象署地震報告 API 回應 → ([QuakeReport, ...], 略過的壞報告數)
+
+    所有格式檢查都在這裡：整份回應結構不對拋出 MalformedPayload；
+    單筆報告缺欄位只略過該筆，不影響同一批的其他報告。
+    在解析工作池中執行（bot.parse_pool），回傳值可以 pickle。
+    """
+    try:
+        data = loads(body)
+    except ValueError as e:
+        raise MalformedPayload(f"JSON 解碼失敗: {e}") from None
+    records = data.get("records") if isinstance(data, dict) else None
+    if not isinstance(records, dict):
+        raise MalformedPayload("缺少 records")
+    raw_reports = records.get("Earthquake")
+    if raw_reports is None:
+        return [], 0
+    if not isinstance(raw_reports, list):
+        raise MalformedPayload("records.Earthquake 不是陣列")
+    return parse_reports(raw_reports)
+
+
+def parse_reports(raw_reports):
+    """[報告 dict, ...] → ([QuakeReport, ...], 略過的壞報告數)"""
+    reports, rejected = [], 0
+    for eq in raw_reports:
+        try:
+            reports.append(QuakeReport.from_dict(eq))
+        except MalformedReport:
+            rejected += 1
+    return reports, rejected
@@ -0,0 +1,235 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import time
+
+import discord
+
+logger = logging.getLogger("discord")
+
+# 數字越小越優先
+LANES = {"quake": 0, "news": 1, "countdown": 2, "debug": 3}
+EMBEDS_PER_MESSAGE = 10
+DISPATCH_WORKERS = int(os.getenv("DISPATCH_WORKERS", "4"))              # 同時送出的頻道數上限
+DISPATCH_CHANNEL_BURST = int(os.getenv("DISPATCH_CHANNEL_BURST", "5"))  # Discord：每頻道 5 則 / 5 秒
+DISPATCH_CHANNEL_RATE = float(os.getenv("DISPATCH_CHANNEL_RATE", "1"))
+DISPATCH_GLOBAL_RATE = float(os.getenv("DISPATCH_GLOBAL_RATE", "40"))   # Discord 全域 50 次/秒，保留餘裕
+
+
+class TokenBucket:
+    """令牌桶：rate 個/秒補充，最多存 capacity 個；429 時以 block() 暫停"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def ready_at(self, now) -> float:
+        """可以再送出的時間（monotonic）"""
+        self._refill(now)
+        if self.blocked_until > now:
+            return self.blocked_until
+        if self.tokens >= 1:
+            return now
+        return now + (1 - self.tokens) / self.rate
+
+    def take(self, now):
+        self._refill(now)
+        self.tokens -= 1
+
+    def block(self, seconds):
+        self.blocked_until = time.monotonic() + seconds
+        self.tokens = 0
+
+
+class _Outgoing:
+    __slots__ = ("priority", "seq", "lane", "channel", "content", "embeds", "future", "queued_at")
+
+    def __init__(self, priority, seq, lane, channel, content, embeds, future):
+        self.priority = priority
+        self.seq = seq
+        self.lane = lane
+        self.channel = channel
+        self.content = content
+        self.embeds = embeds
+        self.future = future
+        self.queued_at = time.monotonic()
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+    @property
+    def mergeable(self):
+        return self.content is None and self.embeds
+
+
+def _consume_exception(future):
+    # 沒有人 await 的 future 失敗時不要再噴 "exception was never retrieved"（錯誤已由 dispatcher 記錄）
+    if not future.cancelled():
+        future.exception()
+
+
+class MessageDispatcher:
+    """全 Bot 共用的訊息出口（bot.dispatcher）
+
+    - 依 lane 排優先順序：quake > news > countdown > debug，高優先的訊息永遠先送
+    - 同一頻道同一 lane 排隊中的純 embed 訊息合併成一則（最多 10 個 embed）
+    - 每個頻道、全域各有令牌桶，預先避開 Discord 的速率限制；遇到 429 依 retry_after 暫停該頻道
+    - 固定數量的 worker，多頻道同時送出但有上限；同一頻道一次只送一則，保持順序
+    """
+
+    def __init__(self, metrics, workers: int = DISPATCH_WORKERS, channel_rate: float = DISPATCH_CHANNEL_RATE,
+                 channel_burst: int = DISPATCH_CHANNEL_BURST, global_rate: float = DISPATCH_GLOBAL_RATE):
+        self.metrics = metrics
+        self.channel_rate = channel_rate
+        self.channel_burst = channel_burst
+        self.pending = {}      # channel_id -> [_Outgoing]（heap）
+        self.buckets = {}      # channel_id -> TokenBucket
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.busy = set()      # 正在送出的頻道
+        self.sent = 0
+        self.coalesced = 0
+        self._seq = itertools.count()
+        self._wake = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(workers)]
+
+    def send(self, channel, lane: str, content=None, *, embed=None, embeds=None) -> asyncio.Future:
+        """排入一則訊息，回傳 Future（送出後得到 Message；可以 await，也可以不理它）"""
+        if embed is not None:
+            embeds = [embed]
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(_consume_exception)
+        item = _Outgoing(LANES.get(lane, len(LANES)), next(self._seq), lane, channel, content, list(embeds or ()), future)
+        heapq.heappush(self.pending.setdefault(channel.id, []), item)
+        self._wake.set()
+        return future
+
+    # ---------- 排程 ----------
+    def _bucket(self, channel_id):
+        bucket = self.buckets.get(channel_id)
+        if bucket is None:
+            bucket = self.buckets[channel_id] = TokenBucket(self.channel_rate, self.channel_burst)
+        return bucket
+
+    def _pick(self, now):
+        """回傳 (頻道 id, None) 或 (None, 最早可送出的時間)"""
+        best, wake_at = None, None
+        for channel_id, heap in self.pending.items():
+            if channel_id in self.busy or not heap:
+                continue
+            ready = max(self._bucket(channel_id).ready_at(now), self.global_bucket.ready_at(now))
+            if ready > now:
+                wake_at = ready if wake_at is None else min(wake_at, ready)
+            elif best is None or heap[0] < self.pending[best][0]:
+                best = channel_id
+        return best, wake_at
+
+    async def _next_channel(self):
+        while True:
+            self._wake.clear()
+            now = time.monotonic()
+            channel_id, wake_at = self._pick(now)
+            if channel_id is not None:
+                return channel_id
+            if wake_at is None:
+                await self._wake.wait()
+                continue
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=wake_at - now)
+            except asyncio.TimeoutError:
+                pass
+
+    def _take_batch(self, heap):
+        """取出最優先的一則；純 embed 的話把同 lane 後面排隊的 embed 一起併入"""
+        batch = [heapq.heappop(heap)]
+        head = batch[0]
+        if head.mergeable:
+            count = len(head.embeds)
+            while (
+                heap and heap[0].lane == head.lane and heap[0].mergeable
+                and count + len(heap[0].embeds) <= EMBEDS_PER_MESSAGE
+            ):
+                item = heapq.heappop(heap)
+                count += len(item.embeds)
+                batch.append(item)
+        return batch
+
+    async def _worker(self):
+        while True:
+            channel_id = await self._next_channel()
+            self.busy.add(channel_id)
+            try:
+                await self._deliver(channel_id)
+            except Exception as e:
+                logger.error(f"❌ 訊息派送發生錯誤 (頻道 {channel_id}): {e}")
+            finally:
+                self.busy.discard(channel_id)
+                if not self.pending.get(channel_id):
+                    self.pending.pop(channel_id, None)
+                self._wake.set()
+
+    async def _deliver(self, channel_id):
+        heap = self.pending.get(channel_id)
+        if not heap:
+            return
+        batch = self._take_batch(heap)
+        head = batch[0]
+        now = time.monotonic()
+        self._bucket(channel_id).take(now)
+        self.global_bucket.take(now)
+        for item in batch:
+            self.metrics.observe("dispatch_queue_seconds", now - item.queued_at, lane=item.lane)
+        if len(batch) > 1:
+            self.coalesced += len(batch) - 1
+            self.metrics.inc("dispatch_coalesced_total", len(batch) - 1, lane=head.lane)
+
+        embeds = [embed for item in batch for embed in item.embeds]
+        try:
+            if head.mergeable:
+                message = await self.metrics.send(head.channel, head.lane, embeds=embeds)
+            else:
+                message = await self.metrics.send(head.channel, head.lane, head.content, embeds=embeds)
+        except discord.HTTPException as e:
+            if e.status == 429:
+                # 放回佇列（保留原本順序），該頻道暫停 retry_after 秒
+                retry_after = float(getattr(e, "retry_after", None) or 1.0)
+                self._bucket(channel_id).block(retry_after)
+                self.metrics.inc("dispatch_ratelimited_total", lane=head.lane)
+                for item in batch:
+                    heapq.heappush(heap, item)
+                logger.warning(f"⚠️ 頻道 {channel_id} 遇到 429，{retry_after:.1f}s 後重送")
+                return
+            logger.error(f"❌ 發送 {head.lane} 訊息到頻道 {channel_id} 失敗: {e}")
+            for item in batch:
+                if not item.future.done():
+                    item.future.set_exception(e)
+            return
+        self.sent += 1
+        for item in batch:
+            if not item.future.done():
+                item.future.set_result(message)
+
+    # ---------- 狀態 ----------
+    def stats(self) -> dict:
+        by_lane = {}
+        for heap in self.pending.values():
+            for item in heap:
+                by_lane[item.lane] = by_lane.get(item.lane, 0) + 1
+        return {"pending": by_lane, "sent": self.sent, "coalesced": self.coalesced}
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        for heap in self.pending.values():
+            for item in heap:
+                item.future.cancel()
+        self.pending.clear()
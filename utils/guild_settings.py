@@ -0,0 +1,94 @@
+import logging
+
+from utils.quake_subscriptions import ALWAYS, SubscriptionIndex, normalize_county
+
+logger = logging.getLogger("discord")
+
+SETTINGS_FILE = "guild_settings.json"
+DEFAULT_QUAKE_CITIES = ["新北市", "新竹市", "臺中市"]
+DEFAULTS = {
+    "notify_channel_id": None,   # 地震 / 公告通知頻道，未設定則不發送
+    "quake_cities": None,        # None = DEFAULT_QUAKE_CITIES
+    "quake_min_intensity": ALWAYS,
+    "news": True,
+}
+
+
+class GuildSettingsStore:
+    """各伺服器的設定（bot.guild_settings），存在 guild_settings.json
+
+    - 以 guild id 為索引常駐記憶體；檔案被外部修改時（mtime 變動）才重新載入
+    - 由設定衍生的索引（地震訂閱、公告頻道）只在設定變更後重建一次
+    """
+
+    def __init__(self, state):
+        self.state = state
+        self.guilds = {}       # guild_id -> 設定 dict
+        self._doc = None
+        self._quake_index = None
+        self._news_channels = None
+        self.reload()
+
+    def reload(self):
+        doc = self.state.get(SETTINGS_FILE, default={"guilds": {}})
+        if doc is self._doc:
+            return
+        self._doc = doc
+        self.guilds = {int(guild_id): {**DEFAULTS, **entry} for guild_id, entry in doc.get("guilds", {}).items()}
+        self._invalidate()
+
+    def _invalidate(self):
+        self._quake_index = None
+        self._news_channels = None
+
+    def save(self):
+        doc = {"guilds": {str(guild_id): entry for guild_id, entry in self.guilds.items()}}
+        self._doc = doc
+        self.state.set(SETTINGS_FILE, doc)
+
+    # ---------- 讀寫 ----------
+    def get(self, guild_id: int) -> dict:
+        self.reload()
+        return self.guilds.get(guild_id) or dict(DEFAULTS)
+
+    def update(self, guild_id: int, **fields) -> dict:
+        self.reload()
+        entry = self.guilds.setdefault(guild_id, dict(DEFAULTS))
+        entry.update(fields)
+        self._invalidate()
+        self.save()
+        return entry
+
+    def notify_channel(self, guild_id: int):
+        return self.get(guild_id)["notify_channel_id"]
+
+    @staticmethod
+    def quake_cities(entry) -> list:
+        return entry["quake_cities"] or DEFAULT_QUAKE_CITIES
+
+    # ---------- 衍生索引 ----------
+    def quake_index(self) -> SubscriptionIndex:
+        """每個有設定通知頻道的伺服器一筆預設地震訂閱（id 為 guild id）"""
+        self.reload()
+        if self._quake_index is None:
+            self._quake_index = SubscriptionIndex(
+                {
+                    "id": guild_id,
+                    "guild_id": guild_id,
+                    "channel_id": entry["notify_channel_id"],
+                    "counties": [normalize_county(c) for c in self.quake_cities(entry)],
+                    "min_intensity": entry["quake_min_intensity"],
+                }
+                for guild_id, entry in self.guilds.items() if entry["notify_channel_id"]
+            )
+        return self._quake_index
+
+    def news_channels(self) -> list:
+        """[(guild_id, channel_id), ...]：開啟公告通知的伺服器"""
+        self.reload()
+        if self._news_channels is None:
+            self._news_channels = [
+                (guild_id, entry["notify_channel_id"])
+                for guild_id, entry in self.guilds.items() if entry["news"] and entry["notify_channel_id"]
+            ]
+        return self._news_channels
@@ -0,0 +1,43 @@
+import aiohttp
+import os
+import logging
+
+logger = logging.getLogger("discord")
+
+# ---------- 連線池設定（可由 .env 覆寫） ----------
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", "20"))            # 全部主機的連線上限
+HTTP_LIMIT_PER_HOST = int(os.getenv("HTTP_LIMIT_PER_HOST", "4"))     # 單一主機的連線上限
+HTTP_DNS_TTL = int(os.getenv("HTTP_DNS_TTL", "300"))                 # DNS 快取秒數
+HTTP_KEEPALIVE = float(os.getenv("HTTP_KEEPALIVE", "60"))            # 閒置連線保留秒數
+HTTP_TOTAL_TIMEOUT = float(os.getenv("HTTP_TOTAL_TIMEOUT", "15"))    # 單次請求總逾時
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5")) # 建立連線逾時
+
+USER_AGENT = "ff_bot (+https://github.com/yuan53082/ff_bot)"
+
+
+def create_http_session() -> aiohttp.ClientSession:
+    """建立全 Bot 共用的 HTTP client
+
+    連線會保持 keep-alive 重複使用，輪詢時不必每次重新做 DNS / TCP / TLS 握手。
+    必須在 event loop 執行中呼叫，並在關閉 Bot 時 close()。
+    """
+    connector = aiohttp.TCPConnector(
+        limit=HTTP_POOL_LIMIT,
+        limit_per_host=HTTP_LIMIT_PER_HOST,
+        ttl_dns_cache=HTTP_DNS_TTL,
+        use_dns_cache=True,
+        keepalive_timeout=HTTP_KEEPALIVE,
+    )
+    timeout = aiohttp.ClientTimeout(
+        total=HTTP_TOTAL_TIMEOUT,
+        connect=HTTP_CONNECT_TIMEOUT,
+    )
+    session = aiohttp.ClientSession(
+        connector=connector,
+        timeout=timeout,
+        headers={"User-Agent": USER_AGENT},
+    )
+    logger.info(
+        f"🌐 共用 HTTP client 已建立 (limit={HTTP_POOL_LIMIT}, per_host={HTTP_LIMIT_PER_HOST}, dns_ttl={HTTP_DNS_TTL}s)"
+    )
+    return session
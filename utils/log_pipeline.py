@@ -0,0 +1,165 @@
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()             # json：一行一個 JSON；text：傳統格式
+LOG_FILE = os.getenv("LOG_FILE")                                  # 另外寫入檔案（選用）
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))        # 佇列滿時丟棄，不阻塞 event loop
+LOG_DEDUP_WINDOW = float(os.getenv("LOG_DEDUP_WINDOW", "60"))     # 相同訊息在此秒數內只記一次
+LOG_SAMPLE_INTERVAL = float(os.getenv("LOG_SAMPLE_INTERVAL", "300"))  # extra={"sample": key} 的訊息每 key 多久記一次
+DEDUP_KEYS_LIMIT = 1024
+
+# LogRecord 內建欄位，其餘（extra=...）才輸出成 JSON 欄位
+_RESERVED = set(logging.makeLogRecord({}).__dict__) | {"message", "asctime", "sample", "suppressed"}
+
+
+class RateLimitFilter(logging.Filter):
+    """在 event loop 端先過濾，減少進入佇列的量
+
+    - extra={"sample": key}：例行的「沒有變化」訊息，每個 key 每 sample_interval 秒只留一筆
+    - 其他 WARNING 以下的訊息：完全相同的內容在 dedup_window 秒內只留第一筆
+    - ERROR / CRITICAL 一律放行，重複發生的真實錯誤不會被合併
+    放行時以 record.suppressed 帶上期間被略過的筆數。任何執行緒都可能記錄日誌，狀態以 lock 保護。
+    """
+
+    def __init__(self, dedup_window=LOG_DEDUP_WINDOW, sample_interval=LOG_SAMPLE_INTERVAL):
+        super().__init__()
+        self.dedup_window = dedup_window
+        self.sample_interval = sample_interval
+        self._last = OrderedDict()  # key -> [上次放行時間, 期間略過筆數]
+        self._lock = threading.Lock()
+        self.suppressed = 0
+
+    def filter(self, record):
+        sample = getattr(record, "sample", None)
+        if sample is not None:
+            key, window = ("sample", record.name, sample), self.sample_interval
+        elif record.levelno <= logging.WARNING:
+            key, window = (record.name, record.levelno, record.getMessage()), self.dedup_window
+        else:
+            return True
+        if window <= 0:
+            return True
+
+        now = time.monotonic()
+        with self._lock:
+            state = self._last.get(key)
+            if state is not None and now - state[0] < window:
+                state[1] += 1
+                self.suppressed += 1
+                return False
+            if state is not None and state[1]:
+                record.suppressed = state[1]
+            self._last[key] = [now, 0]
+            self._last.move_to_end(key)
+            while len(self._last) > DEDUP_KEYS_LIMIT:
+                self._last.popitem(last=False)
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """放進有上限的佇列，滿了就丟棄並計數（寫檔 / journald 變慢時不拖累 event loop）"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record):
+        # 在呼叫端先把訊息與例外格式化成字串，背景執行緒只負責輸出
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """一行一個 JSON：ts / level / logger / cog / msg，以及 extra 帶入的欄位"""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+        }
+        if record.name.startswith("discord.cogs."):
+            entry["cog"] = record.name[len("discord.cogs."):]
+        entry["msg"] = record.getMessage()
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            entry["suppressed"] = suppressed
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-8s %(name)s: %(message)s")
+
+    def format(self, record):
+        text = super().format(record)
+        suppressed = getattr(record, "suppressed", 0)
+        return f"{text}（期間略過 {suppressed} 筆相同訊息）" if suppressed else text
+
+
+class LogPipeline:
+    """root logger → 過濾 → 佇列 → 背景執行緒（QueueListener）→ stderr / 檔案"""
+
+    def __init__(self):
+        formatter = JsonFormatter() if LOG_FORMAT == "json" else TextFormatter()
+        handlers = [logging.StreamHandler(sys.stderr)]
+        if LOG_FILE:
+            handlers.append(logging.FileHandler(LOG_FILE, encoding="utf-8"))
+        for handler in handlers:
+            handler.setFormatter(formatter)
+
+        self.rate_limit = RateLimitFilter()
+        self.handler = NonBlockingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+        self.handler.addFilter(self.rate_limit)
+        self.listener = logging.handlers.QueueListener(self.handler.queue, *handlers, respect_handler_level=True)
+
+    def start(self):
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(self.handler)
+        root.setLevel(LOG_LEVEL)
+        self.listener.start()
+        return self
+
+    def stop(self):
+        """送出佇列中剩餘的紀錄後停止背景執行緒"""
+        self.listener.stop()
+
+    def stats(self) -> dict:
+        return {
+            "queued": self.handler.queue.qsize(),
+            "suppressed": self.rate_limit.suppressed,
+            "dropped": self.handler.dropped,
+        }
+
+
+def setup_logging() -> LogPipeline:
+    return LogPipeline().start()
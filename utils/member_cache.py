@@ -0,0 +1,114 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+
+import discord
+
+logger = logging.getLogger("discord")
+
+
+class MemberLookup:
+    """依需求查詢成員：有上限的 LRU + 同一人單一飛行 + 批次查詢
+
+    MEMBER_CACHE_MODE=lru 時 discord.py 不保留成員快取，只有最近用到的成員
+    會留在這裡；查不到時把同一伺服器短時間內的查詢合併成一次
+    guild.query_members(user_ids=...)（每批最多 100 人），仍失敗才逐一 fetch_member。
+    """
+
+    def __init__(self, capacity: int = 2000, ttl: float = 300.0, batch_window: float = 0.05,
+                 batch_size: int = 100):
+        self.capacity = capacity
+        self.ttl = ttl                  # 成員資料（身分組）可能過時，超過就重新查詢
+        self.batch_window = batch_window
+        self.batch_size = batch_size
+        self._lru = OrderedDict()       # (guild_id, member_id) -> (expires_at, Member)
+        self._inflight = {}             # (guild_id, member_id) -> Future
+        self._batches = {}              # guild_id -> [member_id, ...]
+        self.hits = 0
+        self.misses = 0
+        self.lookups = 0                # 實際送出的查詢次數（批次算一次）
+
+    # ---------- 快取 ----------
+    def remember(self, member: discord.Member):
+        key = (member.guild.id, member.id)
+        self._lru.pop(key, None)
+        self._lru[key] = (time.monotonic() + self.ttl, member)
+        while len(self._lru) > self.capacity:
+            self._lru.popitem(last=False)
+
+    def forget(self, guild_id: int, member_id: int):
+        self._lru.pop((guild_id, member_id), None)
+
+    def _cached(self, key):
+        item = self._lru.get(key)
+        if item is None:
+            return None
+        if item[0] < time.monotonic():
+            del self._lru[key]
+            return None
+        self._lru.move_to_end(key)
+        return item[1]
+
+    # ---------- 查詢 ----------
+    async def get(self, guild: discord.Guild, member_id: int):
+        """取得成員，不存在回傳 None"""
+        key = (guild.id, member_id)
+        member = guild.get_member(member_id) or self._cached(key)
+        if member is not None:
+            self.hits += 1
+            return member
+        self.misses += 1
+
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._inflight[key] = future
+            batch = self._batches.setdefault(guild.id, [])
+            batch.append(member_id)
+            if len(batch) == 1:
+                asyncio.get_running_loop().call_later(
+                    self.batch_window, lambda: asyncio.ensure_future(self._flush(guild))
+                )
+            elif len(batch) >= self.batch_size:
+                asyncio.ensure_future(self._flush(guild))
+        return await asyncio.shield(future)
+
+    async def _flush(self, guild: discord.Guild):
+        member_ids = self._batches.pop(guild.id, [])
+        for i in range(0, len(member_ids), self.batch_size):
+            await self._lookup(guild, member_ids[i:i + self.batch_size])
+
+    async def _lookup(self, guild: discord.Guild, member_ids):
+        found = {}
+        try:
+            self.lookups += 1
+            members = await guild.query_members(user_ids=member_ids, limit=len(member_ids), cache=False)
+            found = {m.id: m for m in members}
+        except Exception as e:
+            logger.warning(f"⚠️ 批次查詢成員失敗，改用逐一查詢: {e}")
+            for member_id in member_ids:
+                try:
+                    self.lookups += 1
+                    found[member_id] = await guild.fetch_member(member_id)
+                except discord.HTTPException:
+                    pass
+
+        for member_id in member_ids:
+            member = found.get(member_id)
+            if member is not None:
+                self.remember(member)
+            future = self._inflight.pop((guild.id, member_id), None)
+            if future is not None and not future.done():
+                future.set_result(member)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._lru),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "lookups": self.lookups,
+        }
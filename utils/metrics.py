@@ -0,0 +1,226 @@
+import asyncio
+import bisect
+import logging
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import discord
+
+logger = logging.getLogger("discord")
+
+# Prometheus 風格的預設 bucket（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+# 地震發生到訊息送出的延遲：氣象署報告通常數分鐘後才發布
+QUAKE_LATENCY_BUCKETS = (30, 60, 120, 180, 240, 300, 420, 600, 900, 1800)
+SAMPLE_WINDOW = 1024  # 計算 p50/p95/p99 時保留最近幾筆
+
+
+def _label_text(labels: dict) -> str:
+    if not labels:
+        return ""
+    inner = ",".join(f'{k}="{v}"' for k, v in sorted(labels.items()))
+    return "{" + inner + "}"
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+
+class Histogram:
+    """累積 bucket（供 Prometheus 匯出）+ 最近 N 筆樣本（供百分位數）"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.samples = deque(maxlen=SAMPLE_WINDOW)
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        self.samples.append(value)
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.bucket_counts):
+            self.bucket_counts[index] += 1
+
+    def percentile(self, q: float):
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+class Metrics:
+    """全 Bot 共用的指標登錄處（bot.metrics）
+
+    - metrics.inc("polls_total", source="earthquake")
+    - metrics.observe("http_request_seconds", 0.12, host="opendata.cwa.gov.tw")
+    - with metrics.timer("loop_seconds", loop="news"): ...
+    """
+
+    def __init__(self):
+        self.counters = {}    # (name, labels) -> Counter
+        self.histograms = {}  # (name, labels) -> Histogram
+        self.started = time.time()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def counter(self, name, **labels) -> Counter:
+        key = self._key(name, labels)
+        counter = self.counters.get(key)
+        if counter is None:
+            counter = self.counters[key] = Counter()
+        return counter
+
+    def histogram(self, name, buckets=DEFAULT_BUCKETS, **labels) -> Histogram:
+        """buckets 只在第一次建立時生效"""
+        key = self._key(name, labels)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram(buckets)
+        return histogram
+
+    def inc(self, name, amount=1, **labels):
+        self.counter(name, **labels).inc(amount)
+
+    def observe(self, name, value, buckets=DEFAULT_BUCKETS, **labels):
+        self.histogram(name, buckets, **labels).observe(value)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    async def send(self, channel, lane, *args, **kwargs):
+        """channel.send 並記錄耗時與失敗（lane：quake / news / countdown ...）"""
+        start = time.perf_counter()
+        try:
+            return await channel.send(*args, **kwargs)
+        except discord.HTTPException as e:
+            self.inc("discord_send_errors_total", lane=lane, status=e.status)
+            raise
+        finally:
+            self.observe("discord_send_seconds", time.perf_counter() - start, lane=lane)
+
+    # ---------- 輸出 ----------
+    def summary(self, prefix=""):
+        """回傳 [(名稱, 標籤, count, p50, p95, p99)]，給 !stats 使用"""
+        rows = []
+        for (name, labels), h in sorted(self.histograms.items()):
+            if not name.startswith(prefix) or not h.count:
+                continue
+            rows.append((name, dict(labels), h.count, h.percentile(0.5), h.percentile(0.95), h.percentile(0.99)))
+        return rows
+
+    def counter_values(self, prefix=""):
+        return {
+            (name, labels): c.value
+            for (name, labels), c in sorted(self.counters.items())
+            if name.startswith(prefix)
+        }
+
+    def prometheus_text(self) -> str:
+        lines = []
+        seen_types = set()
+        for (name, labels), counter in sorted(self.counters.items()):
+            metric = f"ffbot_{name}"
+            if metric not in seen_types:
+                lines.append(f"# TYPE {metric} counter")
+                seen_types.add(metric)
+            lines.append(f"{metric}{_label_text(dict(labels))} {counter.value}")
+        for (name, labels), h in sorted(self.histograms.items()):
+            metric = f"ffbot_{name}"
+            if metric not in seen_types:
+                lines.append(f"# TYPE {metric} histogram")
+                seen_types.add(metric)
+            labels = dict(labels)
+            cumulative = 0
+            for bound, count in zip(h.buckets, h.bucket_counts):
+                cumulative += count
+                lines.append(f"{metric}_bucket{_label_text({**labels, 'le': bound})} {cumulative}")
+            lines.append(f"{metric}_bucket{_label_text({**labels, 'le': '+Inf'})} {h.count}")
+            lines.append(f"{metric}_sum{_label_text(labels)} {h.sum}")
+            lines.append(f"{metric}_count{_label_text(labels)} {h.count}")
+        lines.append(f"ffbot_uptime_seconds {time.time() - self.started:.0f}")
+        return "\n".join(lines) + "\n"
+
+
+class RateLimitCounter(logging.Handler):
+    """discord.py 內部會自動重試 429，只留下警告日誌；從 discord.http 的日誌計數"""
+
+    def __init__(self, metrics: Metrics):
+        super().__init__(level=logging.WARNING)
+        self.metrics = metrics
+
+    def emit(self, record):
+        if "429" in str(record.msg):
+            self.metrics.inc("discord_ratelimited_total")
+
+    def install(self):
+        logging.getLogger("discord.http").addHandler(self)
+        return self
+
+
+# ---------- 匯出 ----------
+METRICS_FILE = os.getenv("METRICS_FILE")                     # 例如 /var/lib/node_exporter/ffbot.prom
+METRICS_FILE_INTERVAL = float(os.getenv("METRICS_FILE_INTERVAL", "15"))
+METRICS_PORT = int(os.getenv("METRICS_PORT") or 0)           # 例如 9108，0 = 不開 HTTP 端點
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+
+
+def _write_text_file(path: str, text: str):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+async def _file_exporter(metrics: Metrics):
+    while True:
+        await asyncio.sleep(METRICS_FILE_INTERVAL)
+        try:
+            await asyncio.to_thread(_write_text_file, METRICS_FILE, metrics.prometheus_text())
+        except Exception as e:
+            logger.error(f"❌ 寫入指標檔失敗: {e}")
+
+
+async def start_exporters(metrics: Metrics):
+    """依環境變數啟動 Prometheus 文字檔 / 本機 HTTP 端點，回傳需要在關閉時清理的物件"""
+    from aiohttp import web
+
+    handles = []
+    if METRICS_FILE:
+        handles.append(asyncio.create_task(_file_exporter(metrics)))
+        logger.info(f"📈 指標將每 {METRICS_FILE_INTERVAL:.0f}s 寫入 {METRICS_FILE}")
+    if METRICS_PORT:
+        async def handle_metrics(request):
+            return web.Response(text=metrics.prometheus_text(), content_type="text/plain", charset="utf-8")
+
+        app = web.Application()
+        app.router.add_get("/metrics", handle_metrics)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, METRICS_HOST, METRICS_PORT).start()
+        handles.append(runner)
+        logger.info(f"📈 指標端點 http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+    return handles
+
+
+async def stop_exporters(handles):
+    for handle in handles:
+        if isinstance(handle, asyncio.Task):
+            handle.cancel()
+        else:
+            await handle.cleanup()
@@ -0,0 +1,172 @@
+import logging
+import os
+import re
+import time
+
+from utils.sqlite_store import SqliteStore
+
+logger = logging.getLogger("discord")
+
+NEWS_ARCHIVE_FILE = os.getenv("NEWS_ARCHIVE_FILE", "news_archive.db")
+EXCERPT_CHARS = 40  # 內文摘錄：關鍵字前後各取幾個字
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS news (
+    id              INTEGER PRIMARY KEY,
+    url             TEXT NOT NULL UNIQUE,
+    title           TEXT NOT NULL,
+    first_seen      TEXT NOT NULL,          -- "YYYY-MM-DD hh:mm:ss"（臺灣時間）
+    body            TEXT,
+    body_fetched_at TEXT,
+    body_attempts   INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS news_first_seen ON news (first_seen);
+CREATE INDEX IF NOT EXISTS news_body_pending ON news (body_attempts, id) WHERE body_fetched_at IS NULL;
+
+-- 全文索引存的是 ngram_text() 轉換後的文字（rowid = news.id），原文在 news 表
+CREATE VIRTUAL TABLE IF NOT EXISTS news_fts USING fts5 (title, body, tokenize = 'unicode61 remove_diacritics 2');
+"""
+
+# 中日韓文字一段一段切出來做 bigram；英數字維持整個字，交給 unicode61 斷詞
+CJK_RUN = "[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af]+"
+TOKEN_PATTERN = re.compile(f"({CJK_RUN})|[0-9A-Za-z\u00c0-\u024f]+")
+TITLE_WEIGHT, BODY_WEIGHT = 10.0, 1.0
+
+
+def ngram_tokens(text: str) -> list:
+    """中文連續字串 → 重疊的兩字詞（"臨時維護" → 臨時 時維 維護）；單獨一個字保留原樣"""
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(text or ""):
+        word = match.group(0)
+        if match.group(1) and len(word) > 1:
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+        else:
+            tokens.append(word)
+    return tokens
+
+
+def ngram_text(text: str) -> str:
+    return " ".join(ngram_tokens(text))
+
+
+def match_query(keywords: str):
+    """使用者關鍵字 → FTS5 MATCH 語法；每個關鍵字是一個片語（相鄰的兩字詞），多個關鍵字須同時符合
+
+    只有一個中文字的關鍵字用前綴比對（符合以該字開頭的兩字詞）。沒有可搜尋的字回傳 None。
+    """
+    phrases = []
+    for keyword in keywords.split():
+        tokens = ngram_tokens(keyword)
+        if not tokens:
+            continue
+        if len(tokens) == 1 and len(tokens[0]) == 1:
+            phrases.append(f"{tokens[0]}*")
+        else:
+            phrases.append('"' + " ".join(tokens) + '"')
+    return " AND ".join(phrases) or None
+
+
+def excerpt(body, keywords, width=EXCERPT_CHARS):
+    """內文中第一個關鍵字出現處的前後文字"""
+    if not body:
+        return None
+    for keyword in keywords.split():
+        index = body.lower().find(keyword.lower())
+        if index >= 0:
+            start = max(index - width, 0)
+            prefix = "…" if start else ""
+            suffix = "…" if index + len(keyword) + width < len(body) else ""
+            return prefix + body[start:index + len(keyword) + width] + suffix
+    return None
+
+
+class NewsArchive(SqliteStore):
+    """公告歷史資料庫（SQLite，NEWS_ARCHIVE_FILE）
+
+    - 首頁看過的每則公告都記錄標題、網址、第一次看到的時間，內文之後背景補抓
+    - 標題與內文以兩字詞（bigram）建 FTS5 全文索引，中文兩個字的關鍵字也能搜尋，依 bm25 排序（標題權重較高）
+    """
+
+    schema = SCHEMA
+
+    def __init__(self, path: str = NEWS_ARCHIVE_FILE):
+        super().__init__(path, "news-archive")
+
+    # ---------- 寫入 ----------
+    def add_many(self, items, seen_at: str) -> int:
+        """寫入 [(title, url), ...]，已存在的網址略過；回傳新增筆數"""
+        added = 0
+        with self.conn:
+            for title, url in items:
+                cursor = self.conn.execute(
+                    "INSERT OR IGNORE INTO news (url, title, first_seen) VALUES (?, ?, ?)", (url, title, seen_at)
+                )
+                if cursor.rowcount:
+                    added += 1
+                    self.conn.execute(
+                        "INSERT INTO news_fts (rowid, title, body) VALUES (?, ?, '')",
+                        (cursor.lastrowid, ngram_text(title)),
+                    )
+        return added
+
+    def pending_bodies(self, limit: int, max_attempts: int) -> list:
+        """還沒抓到內文的公告 [(id, url), ...]，失敗次數少的先抓"""
+        rows = self.conn.execute(
+            "SELECT id, url FROM news WHERE body_fetched_at IS NULL AND body_attempts < ? "
+            "ORDER BY body_attempts, id DESC LIMIT ?",
+            (max_attempts, limit),
+        ).fetchall()
+        return [(row["id"], row["url"]) for row in rows]
+
+    def set_body(self, news_id: int, body: str, fetched_at: str):
+        with self.conn:
+            self.conn.execute(
+                "UPDATE news SET body = ?, body_fetched_at = ?, body_attempts = body_attempts + 1 WHERE id = ?",
+                (body, fetched_at, news_id),
+            )
+            self.conn.execute("UPDATE news_fts SET body = ? WHERE rowid = ?", (ngram_text(body), news_id))
+
+    def record_body_failure(self, news_id: int):
+        with self.conn:
+            self.conn.execute("UPDATE news SET body_attempts = body_attempts + 1 WHERE id = ?", (news_id,))
+
+    async def add(self, items, seen_at: str) -> int:
+        return await self._call(self.add_many, list(items), seen_at)
+
+    async def pending(self, limit: int, max_attempts: int) -> list:
+        return await self._call(self.pending_bodies, limit, max_attempts)
+
+    async def store_body(self, news_id: int, body: str, fetched_at: str):
+        await self._call(self.set_body, news_id, body, fetched_at)
+
+    async def body_failed(self, news_id: int):
+        await self._call(self.record_body_failure, news_id)
+
+    # ---------- 查詢 ----------
+    def search(self, keywords: str, limit: int = 10):
+        """回傳 (符合總數, 依相關度排序的前 limit 筆)；每筆附上內文摘錄 excerpt"""
+        query = match_query(keywords)
+        if query is None:
+            return 0, []
+        total = self.conn.execute("SELECT COUNT(*) FROM news_fts WHERE news_fts MATCH ?", (query,)).fetchone()[0]
+        rows = self.conn.execute(
+            "SELECT n.id, n.url, n.title, n.first_seen, n.body FROM news_fts f JOIN news n ON n.id = f.rowid "
+            f"WHERE news_fts MATCH ? ORDER BY bm25(news_fts, {TITLE_WEIGHT}, {BODY_WEIGHT}), n.first_seen DESC "
+            "LIMIT ?",
+            (query, limit),
+        ).fetchall()
+        results = []
+        for row in rows:
+            result = dict(row)
+            result["excerpt"] = excerpt(result.pop("body"), keywords)
+            results.append(result)
+        return total, results
+
+    async def query(self, keywords: str, limit: int = 10):
+        """非同步查詢，回傳 (符合總數, 列, 查詢秒數)"""
+        start = time.perf_counter()
+        total, rows = await self._call(self.search, keywords, limit)
+        return total, rows, time.perf_counter() - start
+
+    def count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM news").fetchone()[0]
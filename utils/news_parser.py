@@ -0,0 +1,102 @@
+import hashlib
+import importlib.util
+
+NEWS_BASE_URL = "https://www.ffxiv.com.tw"
+NEWS_SELECTOR = ".nav_news .sub_nav ul li a p"
+NEWS_MARKER = "nav_news"
+
+# 只檢查是否安裝 lxml，不在 import 階段載入（bs4 / lxml 都延遲到第一次解析才載入）
+PARSER = "lxml" if importlib.util.find_spec("lxml") else "html.parser"
+
+
+def body_hash(body: bytes) -> str:
+    """首頁內容雜湊，內容沒變就不用再解析"""
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def _to_result(item, base_url=NEWS_BASE_URL):
+    if item is None:
+        return None, None
+    link = item.parent.get("href", "")
+    title = item.get_text(strip=True)
+    if link.startswith("/"):
+        link = base_url + link
+    return title, link
+
+
+def _news_fragment(html: str):
+    """只切出 nav_news 區塊（從該標籤開頭到 sub_nav 的第一個 </ul>）"""
+    marker = html.find(NEWS_MARKER)
+    if marker < 0:
+        return None
+    start = html.rfind("<", 0, marker)
+    sub_nav = html.find("sub_nav", marker)
+    if start < 0 or sub_nav < 0:
+        return None
+    end = html.find("</ul>", sub_nav)
+    if end < 0:
+        return None
+    return html[start:end + len("</ul>")]
+
+
+def extract_news_list(html: str, base_url: str = NEWS_BASE_URL):
+    """從首頁取出公告清單 [(title, link), ...]，順序與網頁相同（新 → 舊）
+
+    先只解析 nav_news 區塊的 HTML 片段；片段解析不到時退回
+    SoupStrainer 部分解析（只建立 nav_news 底下的節點）。相對連結以 base_url 補成完整網址。
+    """
+    from bs4 import BeautifulSoup, SoupStrainer
+
+    fragment = _news_fragment(html)
+    if fragment:
+        items = BeautifulSoup(fragment, PARSER).select(NEWS_SELECTOR)
+        if items:
+            return [_to_result(item, base_url) for item in items]
+
+    strainer = SoupStrainer(class_=NEWS_MARKER)
+    soup = BeautifulSoup(html, PARSER, parse_only=strainer)
+    return [_to_result(item, base_url) for item in soup.select(NEWS_SELECTOR)]
+
+
+def parse_news_page(body: bytes, charset: str = "utf-8", base_url: str = NEWS_BASE_URL):
+    """首頁原始內容 → 有連結的公告清單；在解析工作池中執行（bot.parse_pool），連解碼一起移出 event loop"""
+    html = body.decode(charset, errors="replace")
+    return [(title, link) for title, link in extract_news_list(html, base_url) if link]
+
+
+def extract_latest_news(html: str):
+    """從首頁取出最新公告 (title, link)"""
+    items = extract_news_list(html)
+    return items[0] if items else (None, None)
+
+
+def extract_latest_news_full(html: str):
+    """舊版做法：完整解析整個首頁（保留給 benchmark 比較用）"""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    return _to_result(soup.select_one(NEWS_SELECTOR))
+
+
+ARTICLE_SELECTORS = (".news_content", ".article_content", ".article", "article", "main")
+ARTICLE_MAX_CHARS = 20000
+
+
+def extract_article_text(body: bytes, charset: str = "utf-8", max_chars: int = ARTICLE_MAX_CHARS) -> str:
+    """公告內文頁 → 純文字（去掉 script / style / 導覽列），在解析工作池中執行
+
+    依序嘗試常見的內文容器，都找不到時退回整個 <body>。
+    """
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(body.decode(charset, errors="replace"), PARSER)
+    for tag in soup(["script", "style", "noscript", "nav", "header", "footer"]):
+        tag.decompose()
+    container = None
+    for selector in ARTICLE_SELECTORS:
+        container = soup.select_one(selector)
+        if container is not None:
+            break
+    container = container or soup.body or soup
+    text = " ".join(container.get_text(" ", strip=True).split())
+    return text[:max_chars]
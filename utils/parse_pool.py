@@ -0,0 +1,92 @@
+import asyncio
+import concurrent.futures
+import logging
+import os
+import time
+
+logger = logging.getLogger("discord")
+
+# thread：同行程執行緒（預設，啟動快，lxml 解析時會釋放 GIL）
+# process：獨立行程，可用滿多核心，適合之後加入更多需要爬的來源
+PARSE_POOL_MODE = os.getenv("PARSE_POOL_MODE", "thread").lower()
+PARSE_POOL_WORKERS = int(os.getenv("PARSE_POOL_WORKERS") or min(4, os.cpu_count() or 1))
+PARSE_TIMEOUT = float(os.getenv("PARSE_TIMEOUT", "10"))                   # 單次解析逾時秒數
+PARSE_MAX_BYTES = int(os.getenv("PARSE_MAX_BYTES", str(4 * 1024 * 1024)))  # 輸入超過此大小直接拒絕
+
+
+class ParseError(Exception):
+    """解析被拒絕（輸入過大 / 逾時）或解析函式本身拋出例外"""
+
+    def __init__(self, name, reason, detail=""):
+        self.name = name
+        self.reason = reason
+        super().__init__(f"{name} 解析失敗（{reason}）{detail}")
+
+
+class ParsePool:
+    """全 Bot 共用的解析工作池（bot.parse_pool）
+
+    HTML / JSON 的解析與擷取都丟到這裡，event loop 只負責等待結果，
+    解析再久也不會卡住 gateway 心跳、reaction 事件與地震訊息派送。
+    process 模式下傳入的函式與參數必須可以 pickle（模組層級函式、bytes / str）。
+    逾時只是放棄等待：執行中的工作無法中斷，會在背景跑完後被丟棄。
+    """
+
+    def __init__(self, metrics, mode: str = PARSE_POOL_MODE, workers: int = PARSE_POOL_WORKERS,
+                 timeout: float = PARSE_TIMEOUT, max_bytes: int = PARSE_MAX_BYTES):
+        self.metrics = metrics
+        self.mode = mode if mode in ("thread", "process") else "thread"
+        self.workers = workers
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        if self.mode == "process":
+            self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+        else:
+            self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="parse")
+        logger.info(f"🧮 解析工作池已建立（{self.mode} × {workers}，逾時 {timeout:g}s，上限 {max_bytes} bytes）")
+
+    async def run(self, name: str, func, data, *args):
+        """在工作池執行 func(data, *args) 並回傳結果；name 用於指標與錯誤訊息"""
+        if isinstance(data, (bytes, bytearray, str)) and len(data) > self.max_bytes:
+            self.rejected += 1
+            self.metrics.inc("parse_errors_total", parser=name, reason="too_large")
+            raise ParseError(name, "too_large", f"：{len(data)} bytes > {self.max_bytes}")
+
+        loop = asyncio.get_running_loop()
+        self.in_flight += 1
+        start = time.perf_counter()
+        try:
+            future = loop.run_in_executor(self.executor, func, data, *args)
+            return await asyncio.wait_for(future, timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            self.metrics.inc("parse_errors_total", parser=name, reason="timeout")
+            raise ParseError(name, "timeout", f"：超過 {self.timeout:g}s") from None
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.metrics.inc("parse_errors_total", parser=name, reason="error")
+            raise ParseError(name, "error", f"：{e}") from e
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+            self.metrics.observe("parse_seconds", time.perf_counter() - start, parser=name)
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "workers": self.workers,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+        }
+
+    def close(self):
+        # 不等待逾時後仍在跑的工作，關機時直接放掉
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        logger.info("🧮 解析工作池已關閉")
@@ -0,0 +1,231 @@
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+
+import discord
+from discord.ext import commands
+
+logger = logging.getLogger("discord")
+
+POLL_CONCURRENCY = int(os.getenv("POLL_CONCURRENCY", "4"))  # 所有輪詢來源同時對外請求的上限
+POLL_STAGGER = float(os.getenv("POLL_STAGGER", "3"))        # 各來源第一次輪詢錯開的秒數
+
+
+class SourceHealth:
+    """單一來源的健康狀態與斷路器
+
+    連續失敗 threshold 次後跳脫（open），cooldown 秒內不再輪詢；
+    冷卻結束先試一次（half_open），成功就恢復，失敗則冷卻時間加倍（上限 max_cooldown）。
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name, threshold=5, cooldown=300.0, max_cooldown=3600.0):
+        self.name = name
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.state = self.CLOSED
+        self.failures = 0          # 連續失敗次數
+        self.total_runs = 0
+        self.total_failures = 0
+        self.trips = 0             # 連續跳脫次數，決定冷卻時間
+        self.open_until = 0.0      # monotonic
+        self.last_error = None
+        self.last_success = None   # time.time()
+
+    def allow(self, now=None) -> bool:
+        if self.state != self.OPEN:
+            return True
+        if (now or time.monotonic()) < self.open_until:
+            return False
+        self.state = self.HALF_OPEN
+        return True
+
+    def remaining(self, now=None) -> float:
+        return max(self.open_until - (now or time.monotonic()), 0.0)
+
+    def record_success(self):
+        self.total_runs += 1
+        self.failures = 0
+        self.last_success = time.time()
+        if self.state != self.CLOSED:
+            logger.info(f"✅ 來源 {self.name} 已恢復")
+        self.state = self.CLOSED
+        self.trips = 0
+
+    def record_failure(self, error):
+        self.total_runs += 1
+        self.total_failures += 1
+        self.failures += 1
+        self.last_error = str(error)
+        if self.state == self.HALF_OPEN or self.failures >= self.threshold:
+            self.trips += 1
+            cooldown = min(self.cooldown * 2 ** (self.trips - 1), self.max_cooldown)
+            self.open_until = time.monotonic() + cooldown
+            self.state = self.OPEN
+            logger.warning(f"⚠️ 來源 {self.name} 連續失敗 {self.failures} 次，暫停 {cooldown:.0f}s: {self.last_error}")
+
+    def status_text(self):
+        icon = {self.CLOSED: "🟢", self.HALF_OPEN: "🟡", self.OPEN: "🔴"}[self.state]
+        text = f"{icon} {self.name}：{self.total_runs - self.total_failures}/{self.total_runs} 次成功"
+        if self.state == self.OPEN:
+            text += f"，暫停中（剩 {self.remaining():.0f}s）"
+        if self.failures and self.last_error:
+            text += f"，最近錯誤：{self.last_error[:80]}"
+        return text
+
+
+class PollScheduler:
+    """全 Bot 共用的輪詢協調（bot.pollers）
+
+    - 依註冊順序錯開各來源的第一次輪詢，避免同一秒一起打出去
+    - 所有來源的對外請求共用 POLL_CONCURRENCY 個名額
+    - 彙整各來源健康狀態給 !stats
+    """
+
+    def __init__(self, metrics, max_concurrency=POLL_CONCURRENCY, stagger=POLL_STAGGER):
+        self.metrics = metrics
+        self.stagger = stagger
+        self.fetch_slots = asyncio.Semaphore(max_concurrency)
+        self.sources = {}  # source -> PollerCog
+
+    def register(self, poller) -> float:
+        """登記來源，回傳第一次輪詢前要等待的秒數"""
+        self.sources.pop(poller.source, None)
+        offset = len(self.sources) * self.stagger
+        self.sources[poller.source] = poller
+        return offset
+
+    def unregister(self, poller):
+        if self.sources.get(poller.source) is poller:
+            del self.sources[poller.source]
+
+    @asynccontextmanager
+    async def fetch_slot(self, source):
+        start = time.perf_counter()
+        async with self.fetch_slots:
+            self.metrics.observe("poll_slot_wait_seconds", time.perf_counter() - start, source=source)
+            yield
+
+    def health(self):
+        return [poller.health for poller in self.sources.values()]
+
+
+class PollerCog(commands.Cog):
+    """輪詢型 cog 的共用基底
+
+    子類別設定 source / poll_interval，實作 poll()（有新資料回傳 True），
+    需要時覆寫 next_interval()；抓取失敗呼叫 mark_failure()，拋出例外也算失敗。
+    基底負責：等待 bot ready、錯開起始時間、不重疊執行、指標、斷路器、頻道快取。
+    """
+
+    source = "poller"
+    poll_interval = 60.0
+    breaker_threshold = 5
+    breaker_cooldown = 300.0
+    breaker_max_cooldown = 3600.0  # 半開試探連續失敗時冷卻時間加倍的上限
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.metrics = bot.metrics
+        self.health = SourceHealth(
+            self.source, self.breaker_threshold, self.breaker_cooldown, self.breaker_max_cooldown
+        )
+        self.current_interval = self.poll_interval
+        self.poll_failed = False
+        self.failure_reason = None
+        self.poll_task = None
+        self._channels = {}
+
+    async def cog_load(self):
+        offset = self.bot.pollers.register(self)
+        self.poll_task = asyncio.create_task(self._run(offset))
+
+    async def cog_unload(self):
+        if self.poll_task and not self.poll_task.done():
+            self.poll_task.cancel()
+            logger.info(f"🛑 {self.__class__.__name__} 輪詢已取消")
+        self.bot.pollers.unregister(self)
+
+    # ---------- 子類別實作 ----------
+    async def poll(self) -> bool:
+        raise NotImplementedError
+
+    def next_interval(self, new_data: bool) -> float:
+        return self.poll_interval
+
+    def mark_failure(self, reason):
+        """抓取失敗但不想中斷整次輪詢時呼叫（計入斷路器）"""
+        self.poll_failed = True
+        self.failure_reason = reason
+
+    def fetch_slot(self):
+        """對外請求要包在 async with self.fetch_slot(): 內"""
+        return self.bot.pollers.fetch_slot(self.source)
+
+    # ---------- 排程 ----------
+    async def _run(self, offset):
+        logger.info(f"🔄 {self.__class__.__name__} 輪詢準備啟動，等待 bot ready...")
+        await self.bot.wait_until_ready()
+        if offset:
+            await asyncio.sleep(offset)
+        logger.info(f"🔄 {self.__class__.__name__} 輪詢已啟動（間隔 {self.current_interval:g}s）")
+        while True:
+            started = time.monotonic()
+            if self.health.allow(started):
+                interval = await self.poll_once()
+            else:
+                self.metrics.inc("polls_skipped_total", loop=self.source, reason="circuit_open")
+                interval = self.health.remaining(started)
+            elapsed = time.monotonic() - started
+            if elapsed > interval:
+                # 這次跑得比間隔還久：不立刻補跑，等滿一個間隔再開始下一次
+                self.metrics.inc("polls_skipped_total", loop=self.source, reason="overrun")
+                await asyncio.sleep(interval)
+            else:
+                await asyncio.sleep(interval - elapsed)
+
+    async def poll_once(self) -> float:
+        """執行一次輪詢並更新健康狀態與指標，回傳下一次間隔"""
+        self.poll_failed = False
+        self.failure_reason = None
+        new_data = False
+        self.metrics.inc("polls_total", loop=self.source)
+        try:
+            with self.metrics.timer("loop_seconds", loop=self.source):
+                new_data = bool(await self.poll())
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"❌ {self.__class__.__name__} 輪詢發生錯誤: {e}")
+            self.metrics.inc("loop_errors_total", loop=self.source)
+            self.mark_failure(e)
+        if self.poll_failed:
+            self.health.record_failure(self.failure_reason)
+        else:
+            self.health.record_success()
+        self.current_interval = self.next_interval(new_data)
+        return self.current_interval
+
+    # ---------- 頻道快取 ----------
+    def get_cached_channel(self, channel_id):
+        channel = self._channels.get(channel_id)
+        if channel is None:
+            channel = self.bot.get_channel(channel_id)
+            if channel is not None:
+                self._channels[channel_id] = channel
+        return channel
+
+    def is_local_guild(self, guild_id):
+        """分片時每個行程只負責自己分片上的伺服器；guild_id 為 None（舊版全域設定）一律視為本地"""
+        return guild_id is None or self.bot.get_guild(guild_id) is not None
+
+    def forget_channel(self, channel_id):
+        self._channels.pop(channel_id, None)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel: discord.abc.GuildChannel):
+        self.forget_channel(channel.id)
@@ -0,0 +1,133 @@
+import json
+import logging
+import os
+import time
+
+from utils.quake_subscriptions import INTENSITY_RANK, normalize_county
+from utils.sqlite_store import SqliteStore
+
+logger = logging.getLogger("discord")
+
+EQ_ARCHIVE_FILE = os.getenv("EQ_ARCHIVE_FILE", "earthquake_archive.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    key          TEXT PRIMARY KEY,   -- QuakeReport.key：編號@OriginTime
+    eq_no        INTEGER,
+    origin_time  TEXT NOT NULL,      -- "YYYY-MM-DD hh:mm:ss"（臺灣時間），字串排序即時間排序
+    magnitude    REAL,
+    depth        REAL,
+    location     TEXT,
+    color        TEXT,
+    web          TEXT,
+    raw          TEXT NOT NULL       -- 報告 JSON（QuakeReport.to_dict，可用 from_dict 讀回）
+);
+CREATE INDEX IF NOT EXISTS reports_origin_time ON reports (origin_time);
+CREATE INDEX IF NOT EXISTS reports_magnitude ON reports (magnitude, origin_time);
+
+-- 每份報告每個縣市一列（該縣市最大震度），origin_time 重複存一份，縣市 + 時間範圍查詢只走這個索引
+CREATE TABLE IF NOT EXISTS county_intensity (
+    county       TEXT NOT NULL,
+    origin_time  TEXT NOT NULL,
+    report_key   TEXT NOT NULL REFERENCES reports (key) ON DELETE CASCADE,
+    intensity    TEXT NOT NULL,
+    rank         INTEGER NOT NULL,
+    PRIMARY KEY (county, origin_time, report_key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS county_intensity_rank ON county_intensity (county, rank, origin_time);
+"""
+
+
+def report_row(eq):
+    """QuakeReport → (reports 列, [county_intensity 列...])"""
+    row = (
+        eq.key,
+        eq.eq_no,
+        eq.origin_time,
+        eq.magnitude,
+        eq.depth,
+        eq.location,
+        eq.color,
+        eq.web,
+        json.dumps(eq.to_dict(), ensure_ascii=False, separators=(",", ":")),
+    )
+    counties = [
+        (county, eq.origin_time, eq.key, intensity, INTENSITY_RANK.get(intensity, -1))
+        for county, intensity in eq.counties.items()
+    ]
+    return row, counties
+
+
+class QuakeArchive(SqliteStore):
+    """地震報告歷史資料庫（SQLite，EQ_ARCHIVE_FILE）
+
+    - 每份處理過的報告寫入一列，另外依縣市展開最大震度，供 !eqhistory 查詢
+    - 索引：發生時間、規模、縣市 + 時間、縣市 + 震度，查詢完全不用呼叫氣象署 API
+    """
+
+    schema = SCHEMA
+
+    def __init__(self, path: str = EQ_ARCHIVE_FILE):
+        super().__init__(path, "eq-archive")
+
+    # ---------- 寫入 ----------
+    def add_many(self, reports) -> int:
+        """寫入 [QuakeReport, ...]，已存在的報告直接略過；回傳新增筆數（同步，匯入工具直接呼叫）"""
+        added = 0
+        with self.conn:
+            for eq in reports:
+                row, counties = report_row(eq)
+                cursor = self.conn.execute("INSERT OR IGNORE INTO reports VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+                if cursor.rowcount:
+                    added += 1
+                    self.conn.executemany("INSERT OR IGNORE INTO county_intensity VALUES (?, ?, ?, ?, ?)", counties)
+        return added
+
+    async def add(self, reports) -> int:
+        return await self._call(self.add_many, list(reports))
+
+    # ---------- 查詢 ----------
+    def search(self, county=None, since=None, magnitude=None, min_rank=None, limit=10):
+        """回傳 (符合總數, 最新 limit 筆)
+
+        since 為 OriginTime 格式字串；magnitude 為 (">" 或 ">=", 規模)；min_rank 為 INTENSITY_RANK 的震度等級
+        """
+        if magnitude is not None and magnitude[0] not in (">", ">="):
+            raise ValueError(f"不支援的規模條件 {magnitude[0]}")
+        where, params = [], []
+        if county:
+            # 有縣市時從 county_intensity 的 (county, origin_time) 索引出發
+            source = "county_intensity c JOIN reports r ON r.key = c.report_key"
+            columns = "r.*, c.intensity AS county_intensity"
+            order = "c.origin_time"
+            where.append("c.county = ?")
+            params.append(normalize_county(county))
+            if min_rank is not None:
+                where.append("c.rank >= ?")
+                params.append(min_rank)
+        else:
+            source = "reports r"
+            columns = "r.*, NULL AS county_intensity"
+            order = "r.origin_time"
+        if since:
+            where.append(f"{order} >= ?")
+            params.append(since)
+        if magnitude is not None:
+            where.append(f"r.magnitude {magnitude[0]} ?")
+            params.append(magnitude[1])
+        clause = f" WHERE {' AND '.join(where)}" if where else ""
+        total = self.conn.execute(f"SELECT COUNT(*) FROM {source}{clause}", params).fetchone()[0]
+        rows = self.conn.execute(
+            f"SELECT {columns} FROM {source}{clause} ORDER BY {order} DESC LIMIT ?", [*params, limit]
+        ).fetchall()
+        return total, [dict(row) for row in rows]
+
+    async def query(self, **filters):
+        """非同步查詢，回傳 (符合總數, 列, 查詢秒數)"""
+        start = time.perf_counter()
+        total, rows = await self._call(lambda: self.search(**filters))
+        return total, rows, time.perf_counter() - start
+
+    def count(self) -> int:
+        """報告總筆數（同步，匯入工具使用）"""
+        return self.conn.execute("SELECT COUNT(*) FROM reports").fetchone()[0]
@@ -0,0 +1,136 @@
+import sys
+from datetime import datetime
+
+import pytz
+
+from utils.quake_subscriptions import intensity_rank, normalize_county
+
+ORIGIN_FORMAT = "%Y-%m-%d %H:%M:%S"
+tz = pytz.timezone("Asia/Taipei")
+
+
+class MalformedReport(ValueError):
+    """報告缺少必要欄位或結構不符"""
+
+
+def _text(value, default=""):
+    return value if isinstance(value, str) else default
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class QuakeReport:
+    """氣象署地震報告中實際用到的欄位（__slots__，一次解碼）
+
+    只保留通知、快取與歷史資料庫需要的欄位，原始的巢狀 dict 解碼完就丟掉；
+    縣市名稱與震度字串都 intern，大量報告時共用同一份字串。
+    """
+
+    __slots__ = (
+        "eq_no", "origin_time", "magnitude", "magnitude_type", "depth",
+        "location", "color", "image", "web", "counties", "key",
+    )
+
+    def __init__(self, eq_no, origin_time, magnitude=None, magnitude_type="", depth=None,
+                 location="", color="", image="", web="", counties=None):
+        self.eq_no = eq_no
+        self.origin_time = origin_time    # "YYYY-MM-DD hh:mm:ss"（臺灣時間），字串排序即時間排序
+        self.magnitude = magnitude        # float 或 None
+        self.magnitude_type = magnitude_type
+        self.depth = depth                # km，float 或 None
+        self.location = location
+        self.color = color                # 綠色 / 黃色 / 紅色
+        self.image = image
+        self.web = web
+        self.counties = counties or {}    # 標準化縣市名稱 → 該縣市最大震度
+        # 小區域報告的 EarthquakeNo 可能重複，需搭配 OriginTime
+        self.key = f"{eq_no}@{origin_time}"
+
+    @classmethod
+    def from_dict(cls, eq):
+        """CWA 報告 dict → QuakeReport；缺少編號 / 發生時間或結構不符時拋出 MalformedReport"""
+        if not isinstance(eq, dict):
+            raise MalformedReport("報告不是物件")
+        info = eq.get("EarthquakeInfo")
+        if not isinstance(info, dict):
+            raise MalformedReport("缺少 EarthquakeInfo")
+        eq_no = eq.get("EarthquakeNo")
+        if eq_no is None or isinstance(eq_no, (dict, list)):
+            raise MalformedReport("缺少 EarthquakeNo")
+        origin_time = info.get("OriginTime")
+        try:
+            datetime.strptime(origin_time, ORIGIN_FORMAT)
+        except (TypeError, ValueError):
+            raise MalformedReport(f"OriginTime 格式錯誤: {origin_time!r}") from None
+
+        magnitude = info.get("EarthquakeMagnitude")
+        epicenter = info.get("Epicenter")
+        intensity = eq.get("Intensity")
+        magnitude = magnitude if isinstance(magnitude, dict) else {}
+        epicenter = epicenter if isinstance(epicenter, dict) else {}
+        areas = intensity.get("ShakingArea") if isinstance(intensity, dict) else None
+
+        counties = {}
+        for area in areas if isinstance(areas, list) else ():
+            if not isinstance(area, dict):
+                continue
+            value = area.get("AreaIntensity")
+            if not isinstance(value, str):
+                continue
+            value = sys.intern(value)
+            rank = intensity_rank(value)
+            for county in _text(area.get("CountyName")).split("、"):
+                county = normalize_county(county)
+                if county and rank >= intensity_rank(counties.get(county)):
+                    counties[sys.intern(county)] = value
+
+        return cls(
+            eq_no=eq_no,
+            origin_time=origin_time,
+            magnitude=_number(magnitude.get("MagnitudeValue")),
+            magnitude_type=sys.intern(_text(magnitude.get("MagnitudeType"))),
+            depth=_number(info.get("FocalDepth")),
+            location=_text(epicenter.get("Location")),
+            color=sys.intern(_text(eq.get("ReportColor"))),
+            image=_text(eq.get("ReportImageURI")),
+            web=_text(eq.get("Web")),
+            counties=counties,
+        )
+
+    @property
+    def origin_at(self):
+        """發生時間（aware datetime）"""
+        return tz.localize(datetime.strptime(self.origin_time, ORIGIN_FORMAT))
+
+    def magnitude_text(self):
+        if self.magnitude is None:
+            return "?"
+        return f"{self.magnitude:.1f} {self.magnitude_type}".strip()
+
+    def to_dict(self) -> dict:
+        """轉回 CWA 報告結構（只含本模型的欄位），from_dict 可以讀回"""
+        return {
+            "EarthquakeNo": self.eq_no,
+            "ReportColor": self.color,
+            "ReportImageURI": self.image,
+            "Web": self.web,
+            "EarthquakeInfo": {
+                "OriginTime": self.origin_time,
+                "FocalDepth": self.depth,
+                "Epicenter": {"Location": self.location},
+                "EarthquakeMagnitude": {"MagnitudeType": self.magnitude_type, "MagnitudeValue": self.magnitude},
+            },
+            "Intensity": {
+                "ShakingArea": [
+                    {"CountyName": county, "AreaIntensity": value} for county, value in self.counties.items()
+                ],
+            },
+        }
+
+    def __repr__(self):
+        return f"<QuakeReport {self.key} M{self.magnitude_text()} {self.location}>"
@@ -0,0 +1,93 @@
+# 中央氣象署震度分級，由小到大
+INTENSITY_LEVELS = ["0級", "1級", "2級", "3級", "4級", "5弱", "5強", "6弱", "6強", "7級"]
+INTENSITY_RANK = {level: rank for rank, level in enumerate(INTENSITY_LEVELS)}
+# 使用者輸入的簡寫，例如 "3" / "5-" / "5+"
+INTENSITY_ALIASES = {
+    **{str(i): f"{i}級" for i in (0, 1, 2, 3, 4, 7)},
+    "5-": "5弱", "5+": "5強", "6-": "6弱", "6+": "6強",
+}
+ALWAYS = "all"  # 不論震度都通知（等同舊版固定頻道的行為）
+
+
+def normalize_county(name: str) -> str:
+    """統一縣市名稱寫法（台 → 臺、去除空白）"""
+    return name.strip().replace("台", "臺")
+
+
+def parse_intensity(text: str):
+    """把使用者輸入轉成標準震度字串，無法辨識回傳 None"""
+    text = text.strip()
+    if text.lower() == ALWAYS:
+        return ALWAYS
+    text = INTENSITY_ALIASES.get(text, text)
+    return text if text in INTENSITY_RANK else None
+
+
+def intensity_rank(text) -> int:
+    return INTENSITY_RANK.get(text, -1)
+
+
+class SubscriptionIndex:
+    """地震訂閱的反向索引：縣市 → 訂閱者
+
+    訂閱格式：{"id", "guild_id", "channel_id", "counties": [...], "min_intensity": "3級" | "all"}
+    - min_intensity 為 "all" 的訂閱每份報告都會收到
+    - 其餘訂閱只有在其任一縣市震度達門檻時才會收到
+    """
+
+    def __init__(self, subscriptions=()):
+        self.subscriptions = {}
+        self.by_county = {}
+        self.always = []
+        self.next_id = 1
+        for sub in subscriptions:
+            self._insert(sub)
+
+    def _insert(self, sub):
+        sub["counties"] = [normalize_county(c) for c in sub["counties"]]
+        self.subscriptions[sub["id"]] = sub
+        self.next_id = max(self.next_id, sub["id"] + 1)
+        if sub["min_intensity"] == ALWAYS:
+            self.always.append(sub)
+            return
+        for county in sub["counties"]:
+            self.by_county.setdefault(county, []).append(sub)
+
+    def add(self, guild_id, channel_id, counties, min_intensity):
+        sub = {
+            "id": self.next_id,
+            "guild_id": guild_id,
+            "channel_id": channel_id,
+            "counties": list(counties),
+            "min_intensity": min_intensity,
+        }
+        self._insert(sub)
+        return sub
+
+    def remove(self, sub_id):
+        sub = self.subscriptions.pop(sub_id, None)
+        if not sub:
+            return None
+        if sub["min_intensity"] == ALWAYS:
+            self.always.remove(sub)
+        else:
+            for county in sub["counties"]:
+                subs = self.by_county.get(county, [])
+                if sub in subs:
+                    subs.remove(sub)
+                if not subs:
+                    self.by_county.pop(county, None)
+        return sub
+
+    def to_list(self):
+        return list(self.subscriptions.values())
+
+    def match(self, county_index: dict):
+        """回傳本報告要通知的訂閱清單，成本為 O(震區縣市 + 命中數)"""
+        matched = {sub["id"]: sub for sub in self.always}
+        for county, intensity in county_index.items():
+            rank = intensity_rank(intensity)
+            for sub in self.by_county.get(county, ()):
+                if rank >= intensity_rank(sub["min_intensity"]):
+                    matched[sub["id"]] = sub
+        return list(matched.values())
@@ -0,0 +1,184 @@
+import asyncio
+import logging
+import time
+
+import discord
+
+from utils.timer_heap import TimerHeap
+
+logger = logging.getLogger("discord")
+
+
+class RoleAssignmentQueue:
+    """合併同一成員短時間內的多次身分組變更，最後只送一次 member.edit(roles=...)
+
+    - 每位成員只記「最後想要的狀態」：role_id -> True(加) / False(移除)
+    - 成員最後一次變更後等 debounce 秒才送出，加 → 移除 → 加 只會剩下最終結果
+    - 固定數量的 worker 消化佇列（並行上限）；一般的 429 由 discord.py 自行等待重試，
+      只有等待過久拋出 RateLimited 時所有 worker 一起暫停
+    - 送不出去的變更放回 pending 退避後重送，超過 max_retries 次才放棄並計數
+    - 成員不在 gateway 快取（lru 模式）時改為逐一 add_roles / remove_roles，避免用過時的身分組清單覆寫
+    """
+
+    def __init__(self, bot, debounce: float = 1.5, workers: int = 2, max_retries: int = 3):
+        self.bot = bot
+        self.debounce = debounce
+        self.max_retries = max_retries
+        self.pending = {}          # (guild_id, member_id) -> {role_id: bool}
+        self.deadlines = TimerHeap()  # (guild_id, member_id) -> monotonic 到期時間
+        self.queue = asyncio.Queue()
+        self.inflight = set()      # 正在套用中的成員，同一成員不會被兩個 worker 同時處理
+        self.paused_until = 0.0    # RateLimited 時所有 worker 一起暫停
+        self.attempts = {}         # (guild_id, member_id) -> 已失敗次數（只在放回 pending 等待重送時存在）
+        self.applied = 0
+        self.coalesced = 0
+        self.dropped = 0           # 重試仍失敗而放棄的變更數
+        self._wake = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(workers)]
+        self._timer = asyncio.create_task(self._timer_loop())
+
+    def request(self, guild_id: int, member_id: int, role_id: int, add: bool):
+        """登記一次變更（同步呼叫，不會送出 REST 請求）"""
+        key = (guild_id, member_id)
+        changes = self.pending.setdefault(key, {})
+        if role_id in changes:
+            self.coalesced += 1
+        changes[role_id] = add
+        self.deadlines.push(key, time.monotonic() + self.debounce)
+        self._wake.set()
+
+    async def _timer_loop(self):
+        """把到期（靜止超過 debounce 秒）的成員交給 worker"""
+        while True:
+            self._wake.clear()
+            for key in self.deadlines.pop_due(time.monotonic()):
+                self.queue.put_nowait(key)
+            top = self.deadlines.peek()
+            if top is None:
+                await self._wake.wait()
+                continue
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=max(top[0] - time.monotonic(), 0))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _worker(self):
+        while True:
+            key = await self.queue.get()
+            if key in self.inflight:
+                # 另一個 worker 還在處理這位成員，稍後再排
+                self.deadlines.push(key, time.monotonic() + self.debounce)
+                self._wake.set()
+                self.queue.task_done()
+                continue
+            self.inflight.add(key)
+            try:
+                await self._apply(key)
+            except Exception as e:
+                logger.error(f"❌ 套用身分組變更失敗 {key}: {e}")
+            finally:
+                self.inflight.discard(key)
+                self.queue.task_done()
+
+    async def _apply(self, key):
+        # 成員仍在 debounce 中（送出前又有新變更）就等下一輪
+        if key in self.deadlines:
+            return
+        changes = self.pending.pop(key, None)
+        attempts = self.attempts.pop(key, 0)
+        if not changes:
+            return
+        guild_id, member_id = key
+        guild = self.bot.get_guild(guild_id)
+        if not guild:
+            return
+        member = await self.bot.member_cache.get(guild, member_id)
+        if member is None or member.bot:
+            return
+
+        if guild.get_member(member_id) is not None:
+            # gateway 快取中的成員會隨事件即時更新，直接算出最終清單一次 edit
+            current = {role.id for role in member.roles if not role.is_default()}
+            desired = set(current)
+            for role_id, add in changes.items():
+                if add:
+                    desired.add(role_id)
+                else:
+                    desired.discard(role_id)
+            if desired == current:
+                return
+            roles = [role for role in (guild.get_role(rid) for rid in desired) if role is not None]
+            added, removed = desired - current, current - desired
+
+            async def send():
+                updated = await member.edit(roles=roles, reason="Reaction roles")
+                if updated is not None:
+                    self.bot.member_cache.remember(updated)
+        else:
+            # 成員來自 MemberLookup（lru 模式，最多 ttl 秒前的資料），用整份清單覆寫會把期間內
+            # 別處加上的身分組拿掉；改成逐一加 / 移除這次要變更的身分組，不依賴快取中的身分組
+            added = [role for role in (guild.get_role(rid) for rid, add in changes.items() if add) if role]
+            removed = [role for role in (guild.get_role(rid) for rid, add in changes.items() if not add) if role]
+            if not added and not removed:
+                return
+
+            async def send():
+                if added:
+                    await member.add_roles(*added, reason="Reaction roles")
+                if removed:
+                    await member.remove_roles(*removed, reason="Reaction roles")
+                self.bot.member_cache.forget(guild_id, member_id)  # 快取中的身分組已過時
+
+        wait = self.paused_until - time.monotonic()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        try:
+            await send()
+        except discord.RateLimited as e:
+            # discord.py 會自行等待並重試 429，等待超過 max_ratelimit_timeout 才拋出這個例外
+            self.paused_until = time.monotonic() + e.retry_after
+            logger.warning(f"⚠️ 身分組更新遇到速率限制，{e.retry_after:.1f}s 後重試")
+            self._retry(key, changes, attempts, e, delay=e.retry_after)
+            return
+        except (discord.NotFound, discord.Forbidden) as e:
+            # 成員已離開或權限不足，重送也不會成功
+            self._drop(key, changes, e)
+            return
+        except Exception as e:
+            self._retry(key, changes, attempts, e)
+            return
+        self.applied += 1
+        logger.info(f"🔁 已更新 {member.display_name} 的身分組 (+{len(added)} / -{len(removed)})")
+
+    def _retry(self, key, changes, attempts, error, delay=None):
+        """把送不出去的變更放回 pending（期間的新請求優先），退避後重送"""
+        attempts += 1
+        if attempts > self.max_retries:
+            self._drop(key, changes, error)
+            return
+        merged = self.pending.setdefault(key, {})
+        for role_id, add in changes.items():
+            merged.setdefault(role_id, add)
+        self.attempts[key] = attempts
+        delay = delay or self.debounce * 2 ** attempts
+        self.deadlines.push(key, time.monotonic() + delay)
+        self._wake.set()
+        logger.warning(f"⚠️ 身分組更新失敗 {key}: {error}，{delay:.1f}s 後重送（第 {attempts} 次）")
+
+    def _drop(self, key, changes, error):
+        self.dropped += len(changes)
+        self.bot.metrics.inc("role_changes_dropped_total", len(changes))
+        logger.error(f"❌ 放棄身分組變更 {key}（{len(changes)} 項）: {error}")
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self.pending),
+            "queued": self.queue.qsize(),
+            "applied": self.applied,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+        }
+
+    def close(self):
+        for task in (*self._tasks, self._timer):
+            task.cancel()
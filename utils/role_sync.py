@@ -0,0 +1,194 @@
+import logging
+import time
+
+import discord
+
+logger = logging.getLogger("discord")
+
+CHECKPOINT_FILE = "reaction_roles_sync.json"
+CHECKPOINT_EVERY = 5      # 每讀幾頁（每頁 100 人）存一次進度
+PROGRESS_INTERVAL = 5.0   # 進度回報最短間隔秒數
+
+
+def emoji_key(emoji):
+    """Reaction.emoji 可能是 str（Unicode）或 Emoji / PartialEmoji"""
+    if isinstance(emoji, str):
+        return emoji, None
+    return emoji.name, emoji.id
+
+
+class RoleReconciler:
+    """離線期間的表情變動補正：比對「有按表情的人」與「有身分組的人」，只補差異
+
+    - 反應者以 reaction.users() 分頁讀取（每頁 100 人），依 user id 遞增，可從 after 續跑
+    - 身分組持有者：成員快取完整時直接用 role.members，否則以 fetch_members 分頁讀一次
+    - 差異透過 RoleAssignmentQueue 送出（合併、限速）
+    - 進度寫入 reaction_roles_sync.json，中斷後 resume 會跳過已完成的表情
+    """
+
+    def __init__(self, bot, role_queue):
+        self.bot = bot
+        self.role_queue = role_queue
+        self.running = False
+        self.checkpoint = None
+
+    # ---------- 進度 ----------
+    def load_checkpoint(self):
+        return self.bot.state.get(CHECKPOINT_FILE, default={"finished": True})
+
+    def save_checkpoint(self):
+        self.bot.state.set(CHECKPOINT_FILE, self.checkpoint)
+
+    def status_text(self):
+        cp = self.checkpoint or self.load_checkpoint()
+        stats = cp.get("stats", {})
+        state = "執行中" if self.running else ("已完成" if cp.get("finished") else "已中斷，可 resume")
+        return (
+            f"🔄 身分組補正{state}：已檢查 {stats.get('scanned', 0)} 人、"
+            f"補發 {stats.get('added', 0)}、移除 {stats.get('removed', 0)}、"
+            f"已正確 {stats.get('ok', 0)}、完成 {len(cp.get('done', []))} 個表情"
+        )
+
+    # ---------- 主流程 ----------
+    async def run(self, index, remove_missing=False, resume=False, progress=None):
+        """index 為 ReactionRoles.index；progress 為 async callback(text)"""
+        if self.running:
+            raise RuntimeError("補正已在執行中")
+        self.running = True
+        previous = self.load_checkpoint()
+        if resume and not previous.get("finished"):
+            self.checkpoint = previous
+        else:
+            self.checkpoint = {
+                "finished": False,
+                "remove_missing": remove_missing,
+                "started_at": int(time.time()),
+                "done": [],
+                "cursor": None,
+                "stats": {"scanned": 0, "added": 0, "removed": 0, "ok": 0},
+            }
+        self._last_progress = 0.0
+        try:
+            holders_by_guild = {}
+            for message_id, entry in index.items():
+                guild = self.bot.get_guild(entry["guild_id"])
+                if guild is None:
+                    logger.warning(f"⚠️ 補正略過訊息 {message_id}：找不到伺服器 {entry['guild_id']}")
+                    continue
+                if guild.id not in holders_by_guild:
+                    holders_by_guild[guild.id] = await self.collect_holders(guild, index)
+                await self.reconcile_message(guild, message_id, entry, holders_by_guild[guild.id], progress)
+            self.checkpoint["finished"] = True
+            self.checkpoint["cursor"] = None
+        finally:
+            self.running = False
+            self.save_checkpoint()
+        self._last_progress = 0.0
+        await self._report(progress)
+        logger.info(self.status_text())
+        return self.checkpoint["stats"]
+
+    async def collect_holders(self, guild, index):
+        """回傳 {role_id: set(member_id)}，只計算有綁定的身分組"""
+        role_ids = {
+            role_id
+            for entry in index.values() if entry["guild_id"] == guild.id
+            for role_id in entry["roles"].values()
+        }
+        holders = {role_id: set() for role_id in role_ids}
+        if guild.chunked:
+            for role_id in role_ids:
+                role = guild.get_role(role_id)
+                if role:
+                    holders[role_id] = {m.id for m in role.members if not m.bot}
+            return holders
+        # 成員快取不完整：分頁讀取成員清單（每頁 1000 人）
+        async for member in guild.fetch_members(limit=None):
+            if member.bot:
+                continue
+            for role in member.roles:
+                if role.id in holders:
+                    holders[role.id].add(member.id)
+        return holders
+
+    async def reconcile_message(self, guild, message_id, entry, holders, progress):
+        channel = guild.get_channel(entry["channel_id"]) or await guild.fetch_channel(entry["channel_id"])
+        try:
+            message = await channel.fetch_message(message_id)
+        except discord.NotFound:
+            logger.warning(f"⚠️ 補正略過訊息 {message_id}：訊息不存在")
+            return
+
+        stats = self.checkpoint["stats"]
+        for reaction in message.reactions:
+            key = emoji_key(reaction.emoji)
+            role_id = entry["roles"].get(key)
+            if role_id is None:
+                continue
+            done_key = f"{message_id}:{key[0]}:{key[1]}"
+            if done_key in self.checkpoint["done"]:
+                continue
+
+            cursor = self.checkpoint.get("cursor")
+            after = None
+            resumed = False
+            if cursor and cursor.get("key") == done_key:
+                after = discord.Object(id=cursor["after"])
+                resumed = True
+
+            role_holders = holders.get(role_id, set())
+            reactors = set()
+            page = []
+            pages = 0
+            async for user in reaction.users(limit=None, after=after):
+                if user.bot:
+                    continue
+                reactors.add(user.id)
+                page.append(user.id)
+                if len(page) >= 100:
+                    pages += 1
+                    self._apply_additions(guild, role_id, page, role_holders, stats)
+                    self.checkpoint["cursor"] = {"key": done_key, "after": page[-1]}
+                    page = []
+                    if pages % CHECKPOINT_EVERY == 0:
+                        self.save_checkpoint()
+                    await self._report(progress)
+            if page:
+                self._apply_additions(guild, role_id, page, role_holders, stats)
+
+            if self.checkpoint.get("remove_missing"):
+                if resumed:
+                    # 續跑時沒有完整反應者名單，無法安全判斷誰該被移除
+                    logger.warning(f"⚠️ {done_key} 為續跑，略過移除步驟")
+                else:
+                    for member_id in role_holders - reactors:
+                        self.role_queue.request(guild.id, member_id, role_id, add=False)
+                        stats["removed"] += 1
+
+            self.checkpoint["done"].append(done_key)
+            self.checkpoint["cursor"] = None
+            self.save_checkpoint()
+            await self._report(progress)
+
+    def _apply_additions(self, guild, role_id, user_ids, role_holders, stats):
+        for user_id in user_ids:
+            if guild.chunked and guild.get_member(user_id) is None:
+                continue  # 已離開伺服器
+            stats["scanned"] += 1
+            if user_id in role_holders:
+                stats["ok"] += 1
+                continue
+            self.role_queue.request(guild.id, user_id, role_id, add=True)
+            stats["added"] += 1
+
+    async def _report(self, progress):
+        if progress is None:
+            return
+        now = time.monotonic()
+        if now - self._last_progress < PROGRESS_INTERVAL:
+            return
+        self._last_progress = now
+        try:
+            await progress(self.status_text())
+        except discord.HTTPException:
+            pass
@@ -0,0 +1,45 @@
+import asyncio
+import concurrent.futures
+import sqlite3
+
+
+class SqliteStore:
+    """SQLite 資料庫的共用基底（地震 / 公告歷史）
+
+    連線只在專屬的單一執行緒使用：非同步方法透過 _call 丟到該執行緒，
+    讀寫都不會卡住 event loop；同步方法給命令列匯入工具直接呼叫。
+    開檔（建立 schema、WAL）也排進該執行緒，建構時不等待，cog 在 event loop 上建立也不會卡住；
+    之後的工作排在開檔之後執行，同步存取 conn 時才等待開檔完成。
+    """
+
+    schema = ""
+
+    def __init__(self, path: str, thread_name: str):
+        self.path = path
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix=thread_name)
+        self._conn = None
+        self._opened = self.executor.submit(self._open)
+
+    @property
+    def conn(self):
+        self._opened.result()  # 開檔失敗時在這裡拋出
+        return self._conn
+
+    def _open(self):
+        # 在開檔工作內不能透過 conn 屬性存取（會等待自己完成）
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        conn.executescript(self.schema)
+        self._conn = conn
+
+    async def _call(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    def close(self):
+        if self._opened.exception() is None and self._conn is not None:
+            self.executor.submit(self._conn.close).result()
+            self._conn = None
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,151 @@
+import asyncio
+import copy
+import json
+import logging
+import os
+import tempfile
+
+logger = logging.getLogger("discord")
+
+STATE_FLUSH_DELAY = float(os.getenv("STATE_FLUSH_DELAY", "2"))  # 寫入合併的等待秒數
+
+
+def _atomic_write(path: str, data) -> int:
+    """寫到暫存檔 → fsync → os.replace，當機時不會留下寫一半的檔案；回傳新的 mtime"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", suffix=".json", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    return os.stat(path).st_mtime_ns
+
+
+class StateStore:
+    """全 Bot 共用的 JSON 狀態儲存
+
+    - 讀取走記憶體，只用 os.stat 比對 mtime，檔案被外部修改時才重新解析
+    - 寫入先標記 dirty，等 STATE_FLUSH_DELAY 秒合併後在背景執行緒寫檔
+    - 採暫存檔 + os.replace 原子寫入，當機不會留下半個 JSON
+    - directory 不為空時狀態檔都放在該目錄（多行程分片各自一份）；目錄中還沒有的檔案
+      第一次讀取時以工作目錄的同名舊檔為初始內容
+    """
+
+    def __init__(self, flush_delay: float = STATE_FLUSH_DELAY, directory: str = ""):
+        self.flush_delay = flush_delay
+        self.directory = directory
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._docs = {}     # path -> dict
+        self._mtimes = {}   # path -> 最後一次讀 / 寫時的 mtime_ns
+        self._dirty = set()
+        self._flush_task = None
+        self._lock = asyncio.Lock()
+
+    def path(self, name: str) -> str:
+        """狀態檔名 → 實際路徑；絕對路徑原樣使用"""
+        return os.path.join(self.directory, name) if self.directory else name
+
+    # ---------- 讀取 ----------
+    def get(self, name: str, default=None) -> dict:
+        """取得文件；檔案不存在時回傳 default（並放進記憶體）"""
+        path = self.path(name)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+
+        if path in self._docs:
+            # 有未寫出的變更時以記憶體為準；否則 mtime 變了代表外部有人改過檔案
+            if path in self._dirty or mtime is None or mtime == self._mtimes.get(path):
+                return self._docs[path]
+            logger.info(f"📝 偵測到 {path} 被外部修改，重新載入")
+
+        source = path
+        if mtime is None and path != name and os.path.exists(name):
+            # 剛改用 STATE_DIR：沿用工作目錄的舊檔內容，並馬上寫一份到新位置
+            logger.info(f"📝 {path} 不存在，以 {name} 為初始內容")
+            source = name
+        if source == path and mtime is None:
+            data = {} if default is None else copy.deepcopy(default)
+        else:
+            try:
+                with open(source, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.error(f"❌ 讀取 {source} 失敗: {e}")
+                data = self._docs.get(path, {} if default is None else copy.deepcopy(default))
+        self._docs[path] = data
+        self._mtimes[path] = mtime
+        if source != path:
+            self._schedule(path)
+        return data
+
+    def exists(self, name: str) -> bool:
+        path = self.path(name)
+        return path in self._docs or os.path.exists(path) or (path != name and os.path.exists(name))
+
+    # ---------- 寫入 ----------
+    def set(self, name: str, data: dict):
+        """取代整份文件並排程寫檔"""
+        path = self.path(name)
+        self._docs[path] = data
+        self._schedule(path)
+
+    def update(self, name: str, **fields):
+        """更新文件中的欄位並排程寫檔"""
+        path = self.path(name)
+        doc = self._docs.get(path)
+        if doc is None:
+            doc = self.get(name)
+        doc.update(fields)
+        self._schedule(path)
+
+    def mark_dirty(self, name: str):
+        """文件內容已在記憶體中修改，排程寫檔（短時間內多次修改只會寫一次）"""
+        self._schedule(self.path(name))
+
+    def _schedule(self, path: str):
+        self._dirty.add(path)
+        if self._flush_task is None or self._flush_task.done():
+            try:
+                self._flush_task = asyncio.get_running_loop().create_task(self._delayed_flush())
+            except RuntimeError:
+                # 沒有 event loop（例如啟動前）就直接寫
+                self._write_now()
+
+    async def _delayed_flush(self):
+        await asyncio.sleep(self.flush_delay)
+        await self.flush()
+
+    async def flush(self):
+        """把所有 dirty 文件寫到磁碟（在背景執行緒執行）"""
+        async with self._lock:
+            while self._dirty:
+                path = self._dirty.pop()
+                snapshot = copy.deepcopy(self._docs[path])
+                try:
+                    self._mtimes[path] = await asyncio.to_thread(_atomic_write, path, snapshot)
+                except Exception as e:
+                    logger.error(f"❌ 寫入 {path} 失敗: {e}")
+
+    def _write_now(self):
+        while self._dirty:
+            path = self._dirty.pop()
+            try:
+                self._mtimes[path] = _atomic_write(path, self._docs[path])
+            except Exception as e:
+                logger.error(f"❌ 寫入 {path} 失敗: {e}")
+
+    async def close(self):
+        if self._flush_task and not self._flush_task.done():
+            self._flush_task.cancel()
+        await self.flush()
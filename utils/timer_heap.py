@@ -0,0 +1,65 @@
+import heapq
+import itertools
+
+_REMOVED = object()
+
+
+class TimerHeap:
+    """依到期時間排序的計時器（heapq + 延遲刪除）
+
+    push / cancel 都是 O(log n) 以內，取最早到期項目為 O(1)；
+    取消的項目只做標記，等浮到堆頂時才真正丟掉。
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._entries = {}  # key -> [when, seq, key]
+        self._counter = itertools.count()
+
+    def push(self, key, when):
+        """新增或改期（同一個 key 只會保留最新的時間）"""
+        self.cancel(key)
+        entry = [when, next(self._counter), key]
+        self._entries[key] = entry
+        heapq.heappush(self._heap, entry)
+
+    def cancel(self, key) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        entry[2] = _REMOVED
+        # 已取消的項目過多時整理一次，避免堆積無限長大
+        if len(self._heap) > 64 and len(self._heap) > 2 * len(self._entries):
+            self._heap = [e for e in self._heap if e[2] is not _REMOVED]
+            heapq.heapify(self._heap)
+        return True
+
+    def peek(self):
+        """回傳 (when, key)，沒有項目時回傳 None"""
+        while self._heap and self._heap[0][2] is _REMOVED:
+            heapq.heappop(self._heap)
+        if not self._heap:
+            return None
+        when, _, key = self._heap[0]
+        return when, key
+
+    def pop_due(self, now):
+        """取出所有 when <= now 的 key（依到期時間排序）"""
+        due = []
+        while True:
+            top = self.peek()
+            if top is None or top[0] > now:
+                return due
+            heapq.heappop(self._heap)
+            self._entries.pop(top[1], None)
+            due.append(top[1])
+
+    def clear(self):
+        self._heap.clear()
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries